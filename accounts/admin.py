@@ -1,11 +1,25 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.admin import AdminSite
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
-from .models import User, Website, UserSession, SocialAccount, EmailVerificationToken, PasswordResetToken, MFADevice, SSOToken, APIRequestLog
+from .models import User, Website, UserSession, SocialAccount, EmailVerificationToken, PasswordResetToken, MFADevice, SSOToken, APIRequestLog, APIRequestRollup, JWTSigningKey
 from .admin_mfa import AdminMFAAuthenticationForm
 
 
+def related_count(model, field):
+    """
+    Anzahl der model-Zeilen mit field = Primärschlüssel der äußeren Zeile,
+    als Subquery für annotate() - ein Query für die ganze Changelist statt
+    eines COUNT pro Zeile.
+    """
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 class MFAAdminSite(AdminSite):
     """Custom Admin Site with MFA support"""
     site_header = "🔐 PalmDynamicX Auth Service Administration (MFA-geschützt)"
@@ -125,9 +139,13 @@ class UserAdmin(BaseUserAdmin):
     
     readonly_fields = ('lexware_contact_id', 'lexware_customer_number')
     
+    def get_queryset(self, request):
+        from permissions_system.models import UserRole
+        return super().get_queryset(request).annotate(roles_count=related_count(UserRole, 'user'))
+    
     def get_roles_count(self, obj):
         """Zeigt Anzahl der zugewiesenen Rollen"""
-        count = obj.user_roles.count()
+        count = obj.roles_count
         if count > 0:
             return f"✅ {count} Rolle(n)"
         return "❌ Keine Rollen"
@@ -270,7 +288,7 @@ class WebsiteAdmin(admin.ModelAdmin):
                     'description': '⚠️ Diese Credentials werden automatisch generiert. API Secret nur einmal kopieren!'
                 }),
                 ('⚙️ Einstellungen', {
-                    'fields': ('is_active', 'auto_register_users', 'require_email_verification')
+                    'fields': ('is_active', 'auto_register_users', 'require_email_verification', 'embed_permission_claims')
                 }),
                 ('📝 Pflichtfelder bei Registrierung', {
                     'fields': ('require_first_name', 'require_last_name', 'require_phone',
@@ -289,7 +307,7 @@ class WebsiteAdmin(admin.ModelAdmin):
                     'description': '✨ API Credentials (api_key, api_secret, client_id, client_secret) werden automatisch generiert!'
                 }),
                 ('⚙️ Einstellungen', {
-                    'fields': ('is_active', 'auto_register_users', 'require_email_verification')
+                    'fields': ('is_active', 'auto_register_users', 'require_email_verification', 'embed_permission_claims')
                 }),
                 ('📝 Pflichtfelder bei Registrierung', {
                     'fields': ('require_first_name', 'require_last_name', 'require_phone',
@@ -298,9 +316,17 @@ class WebsiteAdmin(admin.ModelAdmin):
                 }),
             )
     
+    def get_queryset(self, request):
+        from permissions_system.models import Permission, UserRole
+        return super().get_queryset(request).annotate(
+            users_count=related_count(User.allowed_websites.through, 'website'),
+            roles_count=related_count(UserRole, 'website'),
+            permissions_count=related_count(Permission, 'website'),
+        )
+    
     def get_users_count(self, obj):
         """Anzahl Benutzer mit Zugriff auf diese Website"""
-        count = obj.users.count()
+        count = obj.users_count
         if count > 0:
             return f"👥 {count}"
         return "—"
@@ -308,8 +334,7 @@ class WebsiteAdmin(admin.ModelAdmin):
     
     def get_roles_count(self, obj):
         """Anzahl lokaler Rollen für diese Website"""
-        # UserRole hat related_name='user_role_assignments', nicht 'roles'
-        count = obj.user_role_assignments.count()
+        count = obj.roles_count
         if count > 0:
             return f"🎭 {count}"
         return "—"
@@ -317,7 +342,7 @@ class WebsiteAdmin(admin.ModelAdmin):
     
     def get_permissions_count(self, obj):
         """Anzahl lokaler Berechtigungen für diese Website"""
-        count = obj.permissions.count()
+        count = obj.permissions_count
         if count > 0:
             return f"🔑 {count}"
         return "—"
@@ -461,6 +486,23 @@ class MFADeviceAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(JWTSigningKey)
+class JWTSigningKeyAdmin(admin.ModelAdmin):
+    """Schlüsselring der JWT-Signatur (Rotation: python manage.py rotate_jwt_signing_key)"""
+    list_display = ('kid', 'algorithm', 'status', 'created_at', 'activated_at', 'retired_at')
+    list_filter = ('status', 'algorithm')
+    search_fields = ('kid',)
+    fields = ('kid', 'algorithm', 'status', 'public_key', 'created_at', 'activated_at', 'retired_at')
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        """Schlüssel werden nur über rotate_jwt_signing_key erzeugt."""
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(PasswordResetToken)
 class PasswordResetTokenAdmin(admin.ModelAdmin):
     list_display = ('user', 'token_preview', 'created_at', 'expires_at', 'is_used', 'is_token_valid')
@@ -497,6 +539,7 @@ class APIRequestLogAdmin(admin.ModelAdmin):
         'user_email',
         'ip_address',
         'duration_ms',
+        'query_count',
         'is_error_display'
     )
     list_filter = (
@@ -526,6 +569,9 @@ class APIRequestLogAdmin(admin.ModelAdmin):
         'headers',
         'referer',
         'duration',
+        'query_count',
+        'db_duration',
+        'timings',
         'timestamp',
         'formatted_request',
         'formatted_response',
@@ -538,7 +584,8 @@ class APIRequestLogAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('📊 Übersicht', {
-            'fields': ('id', 'timestamp', 'duration', 'get_duration_ms_display', 'status_code')
+            'fields': ('id', 'timestamp', 'duration', 'get_duration_ms_display', 'status_code',
+                       'query_count', 'db_duration', 'timings')
         }),
         ('🔗 Request', {
             'fields': ('method', 'path', 'query_params', 'user', 'ip_address', 'user_agent', 'referer')
@@ -565,6 +612,65 @@ class APIRequestLogAdmin(admin.ModelAdmin):
         """Logs cannot be edited"""
         return False
     
+    def get_urls(self):
+        from django.urls import path
+        urls = super().get_urls()
+        custom_urls = [
+            path('archive/', self.admin_site.admin_view(self.archive_view), name='accounts_apirequestlog_archive'),
+        ]
+        return custom_urls + urls
+    
+    def archive_view(self, request):
+        """Archivierte Logs (siehe archive_api_logs) durchsuchen"""
+        from datetime import date
+        from django.core.exceptions import PermissionDenied
+        from django.template.response import TemplateResponse
+        from .log_archive import archived_days, read_archived_logs
+        
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        
+        limit = 500
+        days = archived_days()
+        filters = {key: request.GET.get(key, '').strip() for key in ('method', 'status', 'path', 'ip', 'q')}
+        
+        selected_day = None
+        try:
+            selected_day = date.fromisoformat(request.GET['date'])
+        except (KeyError, ValueError):
+            if days:
+                selected_day = days[-1]
+        
+        entries = []
+        truncated = False
+        if selected_day:
+            status_code = int(filters['status']) if filters['status'].isdigit() else None
+            for entry in read_archived_logs(
+                selected_day,
+                method=filters['method'] or None,
+                status_code=status_code,
+                path_prefix=filters['path'] or None,
+                ip_address=filters['ip'] or None,
+                search=filters['q'] or None,
+            ):
+                if len(entries) >= limit:
+                    truncated = True
+                    break
+                entries.append(entry)
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'API Request Logs - Archiv',
+            'days': days,
+            'selected_day': selected_day,
+            'filters': filters,
+            'entries': entries,
+            'truncated': truncated,
+            'limit': limit,
+        }
+        return TemplateResponse(request, 'admin/accounts/apirequestlog/archive.html', context)
+    
     def path_short(self, obj):
         """Shortened path for list view"""
         if not obj or not obj.path:
@@ -679,3 +785,89 @@ class APIRequestLogAdmin(admin.ModelAdmin):
                 return format_html('<pre style="background: #f5f5f5; padding: 10px; border-radius: 5px;">{}</pre>', obj.headers)
             return format_html('<span style="color: #999;">— Nicht darstellbar —</span>')
     formatted_headers.short_description = 'Headers (formatiert)'
+
+
+@admin.register(APIRequestRollup)
+class APIRequestRollupAdmin(admin.ModelAdmin):
+    """Dashboard für API-Latenz und Fehlerraten (liest nur die Rollups)"""
+    
+    # Zeitfenster -> (Minuten, Auflösung der Zeitleiste in Minuten)
+    WINDOWS = {
+        '15m': (15, 1),
+        '1h': (60, 1),
+        '6h': (360, 5),
+        '24h': (1440, 15),
+    }
+    DEFAULT_WINDOW = '1h'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def changelist_view(self, request, extra_context=None):
+        """Dashboard statt Liste: Endpoints mit Anzahl, Fehlerrate und p50/p95/p99"""
+        from datetime import timedelta
+        from django.core.exceptions import PermissionDenied
+        from django.template.response import TemplateResponse
+        from django.utils import timezone
+        from .rollups import SUM_FIELDS, bucket_start, summarize
+        
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+        
+        window = request.GET.get('window', self.DEFAULT_WINDOW)
+        if window not in self.WINDOWS:
+            window = self.DEFAULT_WINDOW
+        minutes, resolution = self.WINDOWS[window]
+        endpoint_filter = request.GET.get('endpoint', '').strip()
+        
+        since = timezone.now() - timedelta(minutes=minutes)
+        queryset = APIRequestRollup.objects.filter(bucket__gte=since)
+        if endpoint_filter:
+            queryset = queryset.filter(endpoint__startswith=endpoint_filter)
+        rows = list(queryset.values(
+            'bucket', 'method', 'endpoint', 'duration_max', 'histogram', *SUM_FIELDS,
+        ))
+        
+        # Pro Endpoint
+        by_endpoint = {}
+        for row in rows:
+            by_endpoint.setdefault((row['method'], row['endpoint']), []).append(row)
+        endpoints = [
+            {'method': method, 'endpoint': endpoint, **summarize(endpoint_rows)}
+            for (method, endpoint), endpoint_rows in by_endpoint.items()
+        ]
+        endpoints.sort(key=lambda item: item['count'], reverse=True)
+        
+        # Zeitleiste
+        step = resolution * 60
+        by_slot = {}
+        for row in rows:
+            slot = int(row['bucket'].timestamp()) // step * step
+            by_slot.setdefault(slot, []).append(row)
+        timeline = []
+        for slot in sorted(by_slot):
+            timeline.append({
+                'time': timezone.localtime(bucket_start(slot)),
+                **summarize(by_slot[slot]),
+            })
+        peak = max((item['count'] for item in timeline), default=0)
+        for item in timeline:
+            item['bar'] = round(item['count'] * 100 / peak) if peak else 0
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'API Dashboard',
+            'windows': list(self.WINDOWS),
+            'window': window,
+            'endpoint_filter': endpoint_filter,
+            'resolution': resolution,
+            'totals': summarize(rows),
+            'endpoints': endpoints,
+            'timeline': timeline,
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/accounts/apirequestrollup/dashboard.html', context)
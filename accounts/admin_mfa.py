@@ -9,6 +9,7 @@ from django.contrib import messages
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from .hashing import PasswordHashingOverloaded
 from .models import MFADevice
 
 
@@ -37,7 +38,13 @@ class AdminMFAAuthenticationForm(AuthenticationForm):
         
         if username is not None and password:
             # First, authenticate with username and password
-            self.user_cache = self.get_user_from_credentials(username, password)
+            try:
+                self.user_cache = self.get_user_from_credentials(username, password)
+            except PasswordHashingOverloaded:
+                raise ValidationError(
+                    _("Der Server ist gerade ausgelastet. Bitte versuchen Sie es in Kürze erneut."),
+                    code='overloaded',
+                )
             
             if self.user_cache is None:
                 raise self.get_invalid_login_error()
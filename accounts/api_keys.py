@@ -0,0 +1,140 @@
+"""
+API-Key-Authentifizierung mit In-Process-Cache
+
+Alle Permission-Klassen in accounts/permissions.py lösen den X-API-Key über
+dieses Modul auf. Aktive Websites werden pro Prozess in einem TTL/LRU-Cache
+gehalten (Schlüssel: SHA-256 des API-Keys, der Klartext-Key wird nicht als
+Cache-Schlüssel verwendet). Speichern oder Löschen einer Website
+(auch regenerate_credentials()) erhöht eine Generation im gemeinsamen
+Django-Cache, wodurch alle Worker ihre Einträge verwerfen.
+
+Pro Request wird der Key nur einmal aufgelöst; das Ergebnis liegt am
+HttpRequest und wird von allen Permission-Klassen wiederverwendet.
+"""
+import copy
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .instrumentation import timer
+from .metrics import record_cache
+from .models import Website
+
+
+GENERATION_KEY = 'api_keys:generation'
+
+# Fehlermeldungen (vom Aufrufer an die jeweilige Permission-Klasse angepasst)
+MISSING_KEY = 'missing'
+INVALID_KEY = 'invalid'
+INVALID_SECRET = 'invalid_secret'
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+_REQUEST_ATTR = '_api_key_result'
+
+
+def get_cache_ttl():
+    """Lebensdauer eines Cache-Eintrags in Sekunden."""
+    return getattr(settings, 'API_KEY_CACHE_TTL', 60)
+
+
+def get_cache_size():
+    """Maximale Anzahl gecachter API-Keys pro Prozess."""
+    return getattr(settings, 'API_KEY_CACHE_SIZE', 1024)
+
+
+def _digest(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def _get_generation():
+    return cache.get(GENERATION_KEY, 0)
+
+
+def invalidate():
+    """Verwirft gecachte Websites in allen Prozessen."""
+    with _lock:
+        _entries.clear()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+
+
+def get_website_for_key(api_key):
+    """
+    Liefert die aktive Website zu einem API-Key oder None.
+
+    Unbekannte Keys werden ebenfalls (kurz) gecacht, damit Anfragen mit
+    falschen Keys die Datenbank nicht belasten.
+    """
+    digest = _digest(api_key)
+    generation = _get_generation()
+    now = time.monotonic()
+
+    with _lock:
+        entry = _entries.get(digest)
+        if entry is not None:
+            expires, entry_generation, website = entry
+            if expires > now and entry_generation == generation:
+                _entries.move_to_end(digest)
+                record_cache('api_key', True)
+                # Kopie, damit ein Request die gecachte Instanz nicht verändert
+                return copy.copy(website)
+            del _entries[digest]
+
+    record_cache('api_key', False)
+    website = Website.objects.filter(api_key=api_key, is_active=True).first()
+
+    with _lock:
+        _entries[digest] = (now + get_cache_ttl(), generation, website)
+        _entries.move_to_end(digest)
+        while len(_entries) > get_cache_size():
+            _entries.popitem(last=False)
+
+    return copy.copy(website)
+
+
+def _secrets_match(given, expected):
+    return hmac.compare_digest(given.encode('utf-8'), expected.encode('utf-8'))
+
+
+def resolve_api_key(request):
+    """
+    Löst den API-Key eines Requests auf (einmal pro Request).
+
+    Args:
+        request: DRF Request oder Django HttpRequest
+
+    Returns:
+        tuple: (Website oder None, Fehlercode oder None)
+    """
+    http_request = getattr(request, '_request', request)
+    result = getattr(http_request, _REQUEST_ATTR, None)
+    if result is not None:
+        return result
+
+    api_key = request.headers.get('X-API-Key') or request.headers.get('X-Api-Key')
+
+    if not api_key:
+        result = (None, MISSING_KEY)
+    else:
+        with timer('auth'):
+            website = get_website_for_key(api_key)
+        if website is None:
+            result = (None, INVALID_KEY)
+        else:
+            # Optional: Prüfe auch API-Secret falls vorhanden (konstante Laufzeit)
+            api_secret = request.headers.get('X-API-Secret') or request.headers.get('X-Api-Secret')
+            if api_secret and website.api_secret and not _secrets_match(api_secret, website.api_secret):
+                result = (None, INVALID_SECRET)
+            else:
+                result = (website, None)
+
+    setattr(http_request, _REQUEST_ATTR, result)
+    return result
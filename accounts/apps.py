@@ -5,3 +5,11 @@ class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
     verbose_name = 'Accounts'
+    
+    def ready(self):
+        # Signal-Handler registrieren (API-Key-Cache)
+        from . import signals  # noqa: F401
+        
+        # JWT-Signatur mit dem Schlüsselring (accounts/jwt_keys.py)
+        from .jwt_keys import install_token_backend
+        install_token_backend()
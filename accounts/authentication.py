@@ -0,0 +1,108 @@
+"""
+DRF-Authentifizierungsklassen des Auth-Service
+
+Entsprechen den Standardklassen von SimpleJWT, django-oauth-toolkit und
+DRF, erfassen aber ihre Laufzeit als Phase 'auth' (siehe
+accounts/instrumentation.py).
+
+Beide Token-Arten kommen als "Bearer": JWTAuthentication überlässt Tokens,
+die kein JWT sind, OAuth2Authentication. Deren Prüfung ist gecacht
+(accounts/oauth2.py).
+
+Lese-Endpunkte, die vom Benutzer nur ID, E-Mail und Flags brauchen,
+verwenden READ_AUTHENTICATION_CLASSES: StatelessJWTAuthentication löst den
+Benutzer aus dem Token über den Benutzer-Cache auf (accounts/user_cache.py)
+statt mit einem Query pro Request.
+"""
+from drf_spectacular.authentication import SessionScheme
+from drf_spectacular.contrib.django_oauth_toolkit import DjangoOAuthToolkitScheme
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication as BaseOAuth2Authentication
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import SessionAuthentication as BaseSessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import user_cache
+from .instrumentation import timer
+
+
+class TimedAuthenticationMixin:
+    """Misst authenticate() als Phase 'auth'."""
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
+
+
+class JWTAuthentication(TimedAuthenticationMixin, BaseJWTAuthentication):
+
+    def get_raw_token(self, header):
+        raw_token = super().get_raw_token(header)
+        # Kein JWT (z.B. OAuth2 Access Token): OAuth2Authentication prüfen lassen
+        if raw_token is not None and raw_token.count(b'.') != 2:
+            return None
+        return raw_token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication ohne Benutzer-Query pro Request.
+
+    Der Benutzer kommt aus dem Benutzer-Cache, der bei jedem Speichern des
+    Benutzers (Passwort, is_active, Profil) in allen Workern verworfen wird.
+    Nur für Endpunkte, die den Benutzer lesen und nicht speichern.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class OAuth2Authentication(TimedAuthenticationMixin, BaseOAuth2Authentication):
+    pass
+
+
+class SessionAuthentication(TimedAuthenticationMixin, BaseSessionAuthentication):
+    pass
+
+
+# Für Lese-Endpunkte (@authentication_classes(READ_AUTHENTICATION_CLASSES))
+READ_AUTHENTICATION_CLASSES = [
+    StatelessJWTAuthentication,
+    OAuth2Authentication,
+    SessionAuthentication,
+]
+
+
+# OpenAPI-Schema: dieselben Security-Schemes wie für die Basisklassen
+
+class JWTAuthenticationScheme(SimpleJWTScheme):
+    target_class = 'accounts.authentication.JWTAuthentication'
+
+
+class StatelessJWTAuthenticationScheme(SimpleJWTScheme):
+    target_class = 'accounts.authentication.StatelessJWTAuthentication'
+
+
+class OAuth2AuthenticationScheme(DjangoOAuthToolkitScheme):
+    target_class = 'accounts.authentication.OAuth2Authentication'
+
+
+class SessionAuthenticationScheme(SessionScheme):
+    target_class = 'accounts.authentication.SessionAuthentication'
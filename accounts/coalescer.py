@@ -0,0 +1,318 @@
+"""
+Write-Behind für Zeitstempel-Spalten
+
+Einige häufige Pfade schreiben eine Zeile nur, um einen Zeitstempel
+fortzuschreiben:
+
+    User.last_login                    bei jeder Token-Ausgabe (UPDATE_LAST_LOGIN)
+    MFADevice.last_used                bei jeder erfolgreichen TOTP-Prüfung
+    UserSession.last_activity/         bei jedem verify_access
+    UserSession.expires_at
+
+Diese Updates landen in einem Puffer pro Prozess. Ein eigener
+Hintergrund-Thread (gestartet im Gunicorn post_fork Hook) schreibt sie
+gesammelt - ein UPDATE (CASE WHEN pro
+Zeile) je Modell und Feldmenge - und jede Zeile höchstens einmal pro
+TIMESTAMP_WRITE_INTERVAL Sekunden. Weitere Updates derselben Zeile im
+Intervall ersetzen nur den gepufferten Wert. Ist der gespeicherte
+Zeitstempel jünger als das Intervall, entfällt das Update ganz.
+
+Beim Beenden des Workers (worker_exit bzw. atexit) wird der Puffer noch
+geschrieben; bei einem Absturz
+fehlen höchstens die Zeitstempel eines Intervalls. TIMESTAMP_WRITE_INTERVAL=0
+schreibt wie bisher sofort, ebenso jeder Prozess ohne Flush-Thread
+(runserver, Management Commands, Tests).
+"""
+import atexit
+import functools
+import logging
+import operator
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class TimestampCoalescer:
+    """Puffert Zeitstempel-Updates und schreibt sie gebündelt."""
+
+    def __init__(self, interval=60.0, batch_size=200, flush_interval=5.0):
+        self.interval = interval
+        self.batch_size = batch_size
+        # Wie oft der Thread nach fälligen Updates sieht
+        self.flush_interval = min(flush_interval, interval) if interval > 0 else flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counters = {
+            'deferred': 0,
+            'coalesced': 0,
+            'skipped': 0,
+            'written': 0,
+            'failed': 0,
+        }
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        """Neuer Zustand für den aktuellen Prozess (auch nach einem Fork)."""
+        self._pid = os.getpid()
+        # (Modell, Lookup) -> (fällig ab, {Feld: Wert})
+        self._pending = {}
+        # (Modell, Lookup) -> Zeitpunkt des letzten Schreibens
+        self._written = {}
+        # (Modell, Lookup) -> (Zeitpunkt, Fingerprint) synchroner Writes, siehe synced()
+        self._synced = {}
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # Geforkter Worker: Puffer des Elternprozesses nicht doppelt schreiben,
+            # der Flush-Thread des Elternprozesses existiert hier nicht
+            self._reset()
+            self._stop = threading.Event()
+            self._thread = None
+
+    def is_running(self):
+        """True, wenn dieser Prozess einen Flush-Thread hat (sonst wird sofort geschrieben)."""
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Startet den Flush-Thread dieses Prozesses (nach einem Fork neu)."""
+        if self.interval <= 0:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            self._check_pid()
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='timestamp-coalescer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._pending:
+                close_old_connections()
+                self.flush(force=False)
+        connection.close()
+
+    def shutdown(self, timeout=5.0):
+        """Stoppt den Flush-Thread und schreibt den restlichen Puffer."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush(force=True)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        """Zähler und aktuelle Puffergröße dieses Prozesses."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters['pending'] = len(self._pending)
+        return counters
+
+    def clear(self):
+        """Verwirft Puffer und Schreibzeitpunkte dieses Prozesses."""
+        with self._lock:
+            self._reset()
+
+    @staticmethod
+    def _key(model, lookup):
+        return model, tuple(sorted(lookup.items()))
+
+    def is_recent(self, value):
+        """True, wenn ein gespeicherter Zeitstempel jünger als das Intervall ist."""
+        if value is None or self.interval <= 0:
+            return False
+        return (timezone.now() - value).total_seconds() < self.interval
+
+    def synced(self, model, lookup, fingerprint=None):
+        """
+        True, wenn dieser Prozess die Zeile innerhalb des Intervalls selbst
+        synchron geschrieben hat (mit gleichem Fingerprint, z.B. IP und User
+        Agent). Dann reicht es, nur die Zeitstempel verzögert nachzuziehen.
+        """
+        if self.interval <= 0:
+            return False
+        with self._lock:
+            self._check_pid()
+            entry = self._synced.get(self._key(model, lookup))
+        return (
+            entry is not None
+            and time.monotonic() - entry[0] < self.interval
+            and entry[1] == fingerprint
+        )
+
+    def mark_synced(self, model, lookup, fingerprint=None):
+        """Merkt sich einen synchronen Write der Zeile (siehe synced())."""
+        if self.interval <= 0:
+            return
+        key = self._key(model, lookup)
+        now = time.monotonic()
+        with self._lock:
+            self._check_pid()
+            self._synced[key] = (now, fingerprint)
+            self._written[key] = now
+
+    def defer(self, model, lookup, **values):
+        """
+        Puffert ein Update der Zeile(n), die lookup trifft.
+
+        Die Zeile wird frühestens ein Intervall nach ihrem letzten Write
+        geschrieben; bis dahin gewinnt der jeweils letzte Wert.
+        """
+        key = self._key(model, lookup)
+        if self.interval <= 0 or not self.is_running():
+            self._save({key: values})
+            self._count('written')
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._check_pid()
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[1].update(values)
+                self._counters['coalesced'] += 1
+                return
+            written = self._written.get(key)
+            due = written + self.interval if written is not None else now
+            self._pending[key] = (due, dict(values))
+            self._counters['deferred'] += 1
+
+    def touch(self, instance, field):
+        """
+        Setzt instance.<field> auf jetzt und schreibt den Wert verzögert -
+        oder gar nicht, wenn der gespeicherte Wert jung genug ist.
+        """
+        current = getattr(instance, field)
+        now = timezone.now()
+        setattr(instance, field, now)
+        if self.is_recent(current):
+            self._count('skipped')
+            return
+        self.defer(type(instance), {'pk': instance.pk}, **{field: now})
+
+    def flush(self, force=True):
+        """
+        Schreibt fällige Updates (force=True: alle). Wird vom Flush-Thread
+        aufgerufen.
+        """
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._check_pid()
+                    return 0
+                due = {
+                    key: values
+                    for key, (due_at, values) in self._pending.items()
+                    if force or due_at <= now
+                }
+                for key in due:
+                    del self._pending[key]
+                # Schreibzeitpunkte älter als ein Intervall spielen keine Rolle mehr
+                self._written = {
+                    key: written for key, written in self._written.items()
+                    if now - written < self.interval
+                }
+                self._synced = {
+                    key: entry for key, entry in self._synced.items()
+                    if now - entry[0] < self.interval
+                }
+
+            if not due:
+                return 0
+
+            try:
+                self._save(due)
+            except Exception as e:
+                # Werte nicht verlieren, beim nächsten Flush erneut versuchen
+                logger.warning('Zeitstempel konnten nicht gespeichert werden: %s', e)
+                with self._lock:
+                    self._counters['failed'] += len(due)
+                    for key, values in due.items():
+                        entry = self._pending.get(key)
+                        if entry is None:
+                            self._pending[key] = (now, values)
+                        else:
+                            # Neuere Werte aus dem Puffer haben Vorrang
+                            self._pending[key] = (entry[0], {**values, **entry[1]})
+                return 0
+
+            with self._lock:
+                self._counters['written'] += len(due)
+                for key in due:
+                    self._written[key] = now
+            return len(due)
+
+    def _save(self, due):
+        """Ein UPDATE pro Modell, Feldmenge und batch_size Zeilen."""
+        groups = {}
+        for (model, lookup), values in due.items():
+            groups.setdefault((model, tuple(sorted(values))), []).append((Q(**dict(lookup)), values))
+
+        for (model, fields), rows in groups.items():
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                model._default_manager.filter(
+                    functools.reduce(operator.or_, (condition for condition, _ in chunk))
+                ).update(**{
+                    field: Case(
+                        *(
+                            When(condition, then=Value(values[field], output_field=model._meta.get_field(field)))
+                            for condition, values in chunk
+                        ),
+                        default=F(field),
+                    )
+                    for field in fields
+                })
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    """
+    Prozessweiter Coalescer, konfiguriert über TIMESTAMP_WRITE_INTERVAL.
+    Gepuffert wird erst, wenn start_coalescer() den Flush-Thread gestartet hat.
+    """
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = TimestampCoalescer(
+                    interval=getattr(settings, 'TIMESTAMP_WRITE_INTERVAL', 60.0),
+                )
+                atexit.register(shutdown_coalescer)
+    return _coalescer
+
+
+def start_coalescer():
+    """Für den Gunicorn post_fork Hook."""
+    get_coalescer().start()
+
+
+def shutdown_coalescer():
+    """Für atexit und den Gunicorn worker_exit Hook."""
+    if _coalescer is not None:
+        _coalescer.shutdown()
+
+
+def touch(instance, field):
+    """Kurzform für get_coalescer().touch(instance, field)."""
+    get_coalescer().touch(instance, field)
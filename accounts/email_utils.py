@@ -6,7 +6,10 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils.html import strip_tags
 
+from .metrics import track_outbound
 
+
+@track_outbound('email')
 def send_verification_email(user, token):
     """
     Send email verification email to user.
@@ -69,6 +72,7 @@ def send_verification_email(user, token):
     )
 
 
+@track_outbound('email')
 def send_password_reset_email(user, token):
     """
     Send password reset email to user.
@@ -137,6 +141,7 @@ def send_password_reset_email(user, token):
     )
 
 
+@track_outbound('email')
 def send_test_email(recipient_email):
     """
     Send a test email to verify SMTP configuration.
@@ -191,6 +196,7 @@ def send_test_email(recipient_email):
     )
 
 
+@track_outbound('email')
 def send_password_changed_notification(user):
     """
     Send notification email when password is changed successfully.
@@ -21,6 +21,7 @@ from .email_utils import (
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .permissions import HasValidAPIKey, HasValidAPIKeyOrIsAuthenticated
+from .ratelimit import PasswordResetRateThrottle, VerificationEmailRateThrottle
 
 User = get_user_model()
 
@@ -56,6 +57,7 @@ class ResendVerificationEmailView(APIView):
     }
     """
     permission_classes = [HasValidAPIKey]
+    throttle_classes = [VerificationEmailRateThrottle]
     
     def post(self, request):
         email = request.data.get('email')
@@ -376,6 +378,7 @@ class RequestPasswordResetView(APIView):
     }
     """
     permission_classes = [HasValidAPIKey]
+    throttle_classes = [PasswordResetRateThrottle]
     
     def post(self, request):
         email = request.data.get('email')
@@ -894,13 +897,15 @@ class ResetPasswordView(APIView):
                 'error': 'Token ist abgelaufen oder wurde bereits verwendet.'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Hash zuerst berechnen: lehnt der Hashing-Pool ab (503), bleibt der Token gültig
+        user = token.user
+        user.set_password(new_password)
+        
         # Mark token as used
         token.is_used = True
         token.save()
         
         # Reset password
-        user = token.user
-        user.set_password(new_password)
         user.save()
         
         # Send notification email
@@ -914,7 +919,6 @@ class ResetPasswordView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-@api_view(['POST'])
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def test_smtp_configuration(request):
@@ -0,0 +1,158 @@
+"""
+Passwort-Hasher des Auth-Service
+
+Dieselben Algorithmen wie Djangos Standard-Hasher (bestehende Hashes bleiben
+gültig), aber
+
+- encode()/verify() laufen im begrenzten Hashing-Pool aus accounts/hashing.py,
+- die Kostenparameter (Iterationen, time_cost, rounds, work_factor) kommen
+  aus settings.PASSWORD_HASH_WORK_FACTORS bzw. der Kalibrierung in
+  PASSWORD_HASH_CALIBRATION_FILE (python manage.py calibrate_password_hashers),
+  sonst gelten Djangos Standardwerte.
+
+Passt ein gespeicherter Hash nicht mehr zu Algorithmus oder Parametern,
+wird er nach dem nächsten erfolgreichen Login im Hintergrund neu berechnet
+(User.check_password -> schedule_hash_upgrade), die Response wartet nicht
+darauf.
+"""
+import json
+import logging
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+
+from . import hashing
+
+
+logger = logging.getLogger(__name__)
+
+# Algorithmus -> einstellbarer Kostenparameter
+WORK_FACTORS = {
+    'pbkdf2_sha256': 'iterations',
+    'pbkdf2_sha1': 'iterations',
+    'argon2': 'time_cost',
+    'bcrypt_sha256': 'rounds',
+    'scrypt': 'work_factor',
+}
+
+
+@lru_cache(maxsize=None)
+def get_work_factors():
+    """
+    Kostenparameter je Algorithmus, z.B. {'pbkdf2_sha256': {'iterations': 870000}}.
+    settings.PASSWORD_HASH_WORK_FACTORS hat Vorrang vor der Kalibrierungsdatei.
+    """
+    factors = {}
+    path = getattr(settings, 'PASSWORD_HASH_CALIBRATION_FILE', '')
+    if path:
+        try:
+            with open(path, encoding='utf-8') as fh:
+                factors = json.load(fh).get('work_factors', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error('Kalibrierung %s nicht lesbar: %s', path, e)
+
+    for algorithm, params in getattr(settings, 'PASSWORD_HASH_WORK_FACTORS', {}).items():
+        factors.setdefault(algorithm, {}).update(params)
+    return factors
+
+
+@receiver(setting_changed)
+def _reset_work_factors(setting, **kwargs):
+    if setting in ('PASSWORD_HASH_WORK_FACTORS', 'PASSWORD_HASH_CALIBRATION_FILE'):
+        get_work_factors.cache_clear()
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
+
+
+class WorkFactorMixin:
+    """Übernimmt die konfigurierten Kostenparameter als Instanzattribute."""
+
+    def __init__(self):
+        super().__init__()
+        for name, value in get_work_factors().get(self.algorithm, {}).items():
+            setattr(self, name, value)
+
+
+class BoundedHasherMixin:
+    """Führt die teuren Hasher-Methoden über hashing.run() aus."""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return hashing.run('encode', super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return hashing.run('verify', super().verify, password, encoded)
+
+    def harden_runtime(self, password, encoded):
+        return hashing.run('harden', super().harden_runtime, password, encoded)
+
+
+class PBKDF2PasswordHasher(WorkFactorMixin, BoundedHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
+
+
+class PBKDF2SHA1PasswordHasher(WorkFactorMixin, BoundedHasherMixin, hashers.PBKDF2SHA1PasswordHasher):
+    pass
+
+
+class Argon2PasswordHasher(WorkFactorMixin, BoundedHasherMixin, hashers.Argon2PasswordHasher):
+    pass
+
+
+class BCryptSHA256PasswordHasher(WorkFactorMixin, BoundedHasherMixin, hashers.BCryptSHA256PasswordHasher):
+    pass
+
+
+class ScryptPasswordHasher(WorkFactorMixin, BoundedHasherMixin, hashers.ScryptPasswordHasher):
+    pass
+
+
+def measure(hasher, repeat=3, password='Kalibrierung-2024!'):
+    """
+    Dauer eines Hashes mit den aktuellen Parametern des Hashers in Sekunden
+    (bester von `repeat` Läufen).
+    """
+    salt = hasher.salt()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.encode(password, salt)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def schedule_hash_upgrade(user, raw_password):
+    """
+    Berechnet den Hash eines Benutzers nach erfolgreichem Login neu (anderer
+    Algorithmus oder Kostenparameter), ohne die Response zu verzögern. Ist der
+    Hashing-Pool voll, entfällt das Upgrade - der nächste Login versucht es
+    erneut.
+    """
+    if not getattr(settings, 'PASSWORD_HASH_UPGRADE', True):
+        return
+    if hashing.get_max_workers() <= 0:
+        _upgrade_hash(user.pk, raw_password, user.password)
+        return
+    hashing.submit('upgrade', _upgrade_hash, user.pk, raw_password, user.password)
+
+
+def _upgrade_hash(user_pk, raw_password, old_encoded):
+    from django.contrib.auth import get_user_model
+
+    try:
+        # Nur ersetzen, wenn das Passwort inzwischen nicht geändert wurde
+        get_user_model().objects.filter(pk=user_pk, password=old_encoded).update(
+            password=hashers.make_password(raw_password)
+        )
+    except Exception:
+        logger.exception('Passwort-Hash von %s konnte nicht aktualisiert werden', user_pk)
+    finally:
+        if hashing.in_worker():
+            # Eigene DB-Verbindung des Pool-Threads nicht offen halten
+            connection.close()
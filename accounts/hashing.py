@@ -0,0 +1,177 @@
+"""
+Begrenzter Executor für Passwort-Hashing
+
+Passwort-Hashes (PBKDF2, Argon2, bcrypt, scrypt) kosten pro Aufruf zig bis
+hunderte Millisekunden CPU. Ohne Begrenzung belegt eine Login-Welle alle
+gthread-Threads eines Workers, und auch günstige Endpunkte (Berechtigungs-
+prüfungen, Token-Refresh) warten.
+
+Die Hasher in accounts/hashers.py führen encode()/verify() deshalb in einem
+kleinen Thread-Pool pro Worker aus: höchstens PASSWORD_HASH_WORKERS Hashes
+laufen gleichzeitig, PASSWORD_HASH_QUEUE_SIZE weitere dürfen warten. Ist
+auch die Warteschlange voll, wird die Anfrage sofort mit 503 und
+Retry-After abgelehnt (PasswordHashingOverloaded), statt einen weiteren
+Request-Thread zu blockieren. Das gilt für alle Aufrufer von
+authenticate(), check_password() und set_password() (LoginView,
+AdminMFABackend, ChangePasswordView, Registrierung, Passwort-Reset).
+
+Metriken: authservice_password_hash_queue_seconds (Wartezeit),
+authservice_password_hash_duration_seconds, authservice_password_hash_rejected_total
+und authservice_password_hash_pending; pro Request zusätzlich die Phase
+'hash' im Server-Timing Header.
+
+PASSWORD_HASH_WORKERS=0 hasht wie bisher direkt im Request-Thread.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+from .instrumentation import timer
+
+
+class PasswordHashingOverloaded(APIException):
+    """Alle Hashing-Plätze belegt - Anfrage wird abgelehnt (503 mit Retry-After)."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Der Server ist gerade ausgelastet. Bitte versuchen Sie es in Kürze erneut.'
+    default_code = 'password_hashing_overloaded'
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+_executor = None
+_pid = None
+_pending = 0
+_lock = threading.Lock()
+_worker = threading.local()
+
+
+def get_max_workers():
+    """Gleichzeitige Hashes pro Prozess (0 = im Request-Thread)."""
+    return getattr(settings, 'PASSWORD_HASH_WORKERS', 1)
+
+
+def get_queue_size():
+    """Wartende Hashes pro Prozess, bevor mit 503 abgelehnt wird."""
+    return getattr(settings, 'PASSWORD_HASH_QUEUE_SIZE', 1)
+
+
+def get_retry_after():
+    """Retry-After in Sekunden für abgelehnte Anfragen."""
+    return getattr(settings, 'PASSWORD_HASH_RETRY_AFTER', 1)
+
+
+def _get_executor():
+    global _executor, _pid
+    if _executor is None or _pid != os.getpid():
+        with _lock:
+            if _executor is None or _pid != os.getpid():
+                # Nach einem Fork (Gunicorn --preload) existieren die Threads des Elternprozesses nicht
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_max_workers(),
+                    thread_name_prefix='password-hash',
+                )
+                _pid = os.getpid()
+    return _executor
+
+
+def pending():
+    """Laufende und wartende Hashes dieses Prozesses."""
+    return _pending
+
+
+def _release(_future):
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def in_worker():
+    """True im Thread des Hashing-Pools."""
+    return getattr(_worker, 'active', False)
+
+
+def _reserve():
+    """Reserviert einen Platz (Thread oder Warteschlange); False wenn alle belegt sind."""
+    global _pending
+    with _lock:
+        if _pending >= get_max_workers() + get_queue_size():
+            return False
+        _pending += 1
+        return True
+
+
+def _submit(operation, func, args, kwargs):
+    submitted = time.perf_counter()
+
+    def task():
+        started = time.perf_counter()
+        metrics.PASSWORD_HASH_QUEUE_SECONDS.observe(started - submitted, operation=operation)
+        _worker.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _worker.active = False
+            metrics.PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+    try:
+        future = _get_executor().submit(task)
+    except RuntimeError:
+        # Pool beendet (Interpreter fährt herunter)
+        _release(None)
+        return None
+    future.add_done_callback(_release)
+    return future
+
+
+def run(operation, func, *args, **kwargs):
+    """
+    Führt func im Hashing-Pool aus und wartet auf das Ergebnis.
+
+    Args:
+        operation: 'encode', 'verify' oder 'harden' (Label der Metriken)
+        func: die eigentliche Hasher-Methode
+
+    Raises:
+        PasswordHashingOverloaded: wenn alle Plätze (Threads + Warteschlange) belegt sind
+    """
+    # Verschachtelte Aufrufe (verify() ruft encode()) laufen im selben Pool-Thread
+    if get_max_workers() <= 0 or in_worker():
+        return func(*args, **kwargs)
+
+    if not _reserve():
+        metrics.PASSWORD_HASH_REJECTED.inc(operation=operation)
+        raise PasswordHashingOverloaded(get_retry_after())
+
+    with timer('hash'):
+        future = _submit(operation, func, args, kwargs)
+        if future is None:
+            return func(*args, **kwargs)
+        return future.result()
+
+
+def submit(operation, func, *args, **kwargs):
+    """
+    Startet func im Hashing-Pool, ohne auf das Ergebnis zu warten.
+
+    Returns:
+        Future oder None, wenn der Pool voll (bzw. abgeschaltet) ist - die
+        Arbeit entfällt dann
+    """
+    if get_max_workers() <= 0 or not _reserve():
+        return None
+    return _submit(operation, func, args, kwargs)
+
+
+def _collect_pending():
+    metrics.PASSWORD_HASH_PENDING.set(_pending)
+
+
+metrics.register_collector(_collect_pending)
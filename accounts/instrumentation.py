@@ -0,0 +1,123 @@
+"""
+Instrumentierung pro Request: SQL-Queries, DB-Zeit und Phasen
+
+RequestInstrumentationMiddleware startet für jeden Request eine Messung.
+Alle Queries über die Default-Verbindung laufen durch einen
+connection.execute_wrapper (Anzahl und Dauer), einzelne Phasen werden mit
+timer() gemessen:
+
+    auth  - DRF-Authentifizierung und API-Key (accounts/authentication.py, api_keys.py)
+    perm  - Berechtigungsauflösung (PermissionChecker)
+    hash  - Passwort-Hashing inkl. Wartezeit auf den Hashing-Pool (accounts/hashing.py)
+    ser   - Rendering der Response (TimedJSONRenderer)
+
+Das Ergebnis landet als Server-Timing-Header in der Response, im
+APIRequestLog (query_count, db_duration, timings) und in den Rollups.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+
+PHASES = ('auth', 'perm', 'hash', 'ser')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Messwerte eines Requests (Zeiten in Sekunden)."""
+
+    __slots__ = ('started', 'query_count', 'db_duration', 'phases', '_active')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_duration = 0.0
+        self.phases = {}
+        self._active = set()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.db_duration += time.perf_counter() - start
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        """Phasen für APIRequestLog.timings (Sekunden, gerundet)."""
+        return {phase: round(seconds, 6) for phase, seconds in self.phases.items()}
+
+    def server_timing(self):
+        """Wert für den Server-Timing-Header (Millisekunden)."""
+        entries = [f'db;dur={self.db_duration * 1000:.2f};desc="{self.query_count} queries"']
+        for phase in PHASES:
+            if phase in self.phases:
+                entries.append(f'{phase};dur={self.phases[phase] * 1000:.2f}')
+        entries.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(entries)
+
+
+def current():
+    """Messung des laufenden Requests oder None."""
+    return _current.get()
+
+
+@contextmanager
+def instrument():
+    """
+    Startet eine Messung für den aktuellen Request. Läuft bereits eine, wird
+    sie wiederverwendet (z.B. MetricsMiddleware innerhalb der
+    RequestInstrumentationMiddleware).
+    """
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with connection.execute_wrapper(timings.execute_wrapper):
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timer(phase):
+    """Misst eine Phase; verschachtelte Aufrufe derselben Phase zählen einmal."""
+    timings = _current.get()
+    if timings is None or phase in timings._active:
+        yield
+        return
+
+    timings._active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(phase)
+        timings.add(phase, time.perf_counter() - start)
+
+
+def server_timing_enabled():
+    return getattr(settings, 'API_SERVER_TIMING', True)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer, der seine Laufzeit als Phase 'ser' erfasst."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('ser'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,215 @@
+"""
+Token-Introspection nach RFC 7662
+
+Backend-Dienste, die Tokens nicht selbst prüfen können, fragen
+POST /api/accounts/introspect/ statt verify_access oder
+check_user_permissions. Die Introspection hat keine Nebenwirkungen: keine
+UserSession, kein last_login, keine Berechtigungsauflösung.
+
+Unterstützt werden SimpleJWT Access Tokens (Signatur und Ablauf wie bei
+JWTAuthentication, Benutzer muss aktiv sein) und Access Tokens von
+django-oauth-toolkit.
+
+Aktive Ergebnisse liegen im gemeinsamen Cache (Schlüssel: SHA-256 des
+Tokens), höchstens USER_CACHE_TTL Sekunden und nie über den Ablauf des
+Tokens hinaus. Jeder Eintrag trägt die Version des Benutzers aus
+accounts/user_cache.py, gelesen vor der Prüfung in der Datenbank (wie in
+user_cache.get_user); wird der Benutzer gespeichert (z.B. deaktiviert)
+oder gelöscht, passt sie nicht mehr und das Token wird neu geprüft. Den
+Benutzer eines OAuth2-Tokens kennt erst die Datenbank: der erste Aufruf
+merkt sich nur ihn, gecacht wird das Ergebnis ab dem zweiten.
+Geänderte oder widerrufene OAuth2-Tokens werden per Signal aus dem Cache
+entfernt; JWT Access Tokens bleiben - wie bei der lokalen Prüfung über
+/.well-known/jwks.json - bis zum Ablauf gültig, solange der Benutzer aktiv
+ist. Inaktive Ergebnisse werden nicht gecacht. Die Berechtigungs-
+Versionen (permission_version, wie 'ver' im Berechtigungs-Claim) werden
+bei jedem Aufruf frisch gelesen.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from oauth2_provider.models import get_access_token_model
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import user_cache
+from .metrics import record_cache
+from .tokens import WEBSITE_CLAIM
+
+
+CACHE_KEY = 'introspection:v3:{digest}'
+
+
+def get_batch_size():
+    """Maximale Anzahl Tokens pro Batch-Anfrage."""
+    return getattr(settings, 'INTROSPECTION_BATCH_SIZE', 100)
+
+
+def get_cache_ttl():
+    """Höchste Lebensdauer eines gecachten Ergebnisses (wie der Benutzer-Cache)."""
+    return user_cache.get_cache_ttl()
+
+
+def cache_key(token):
+    return CACHE_KEY.format(digest=hashlib.sha256(token.encode('utf-8')).hexdigest())
+
+
+def invalidate(token):
+    """Entfernt das gecachte Ergebnis eines Tokens."""
+    cache.delete(cache_key(token))
+
+
+def _is_jwt(token):
+    return token.count('.') == 2
+
+
+def _decode_jwts(tokens):
+    """Signatur und Ablauf prüfen (ohne Datenbank)."""
+    payloads = {}
+    for token in tokens:
+        try:
+            payloads[token] = AccessToken(token).payload
+        except TokenError:
+            continue
+    return payloads
+
+
+def _introspect_jwts(payloads):
+    if not payloads:
+        return {}
+
+    user_ids = {payload.get(api_settings.USER_ID_CLAIM) for payload in payloads.values()}
+    users = {
+        str(pk): username
+        for pk, username in get_user_model().objects.filter(
+            **{f'{api_settings.USER_ID_FIELD}__in': user_ids, 'is_active': True}
+        ).values_list(api_settings.USER_ID_FIELD, 'username')
+    }
+
+    results = {}
+    for token, payload in payloads.items():
+        user_id = str(payload.get(api_settings.USER_ID_CLAIM))
+        if user_id not in users:
+            continue
+        result = {
+            'active': True,
+            'token_type': 'Bearer',
+            'sub': user_id,
+            'username': users[user_id],
+            'exp': payload['exp'],
+            'iat': payload.get('iat'),
+            'jti': payload.get(api_settings.JTI_CLAIM),
+        }
+        if payload.get(WEBSITE_CLAIM):
+            result['website_id'] = payload[WEBSITE_CLAIM]
+        results[token] = result
+    return results
+
+
+def _introspect_oauth2(tokens):
+    results = {}
+    access_tokens = get_access_token_model().objects.select_related('user', 'application').filter(token__in=tokens)
+    for access_token in access_tokens:
+        if access_token.is_expired():
+            continue
+        user = access_token.user
+        if user is not None and not user.is_active:
+            continue
+
+        result = {
+            'active': True,
+            'token_type': 'Bearer',
+            'scope': access_token.scope,
+            'exp': int(access_token.expires.timestamp()),
+            'iat': int(access_token.created.timestamp()),
+        }
+        if access_token.application is not None:
+            result['client_id'] = access_token.application.client_id
+        if user is not None:
+            result['sub'] = str(user.pk)
+            result['username'] = user.username
+        results[access_token.token] = result
+    return results
+
+
+def _add_permission_versions(results):
+    from permissions_system.cache import get_versions_many
+
+    user_ids = {result['sub'] for result in results if result.get('sub')}
+    if not user_ids:
+        return
+    versions = get_versions_many(user_ids)
+    for result in results:
+        if result.get('sub'):
+            global_version, user_version = versions[result['sub']]
+            result['permission_version'] = [global_version or 0, user_version or 0]
+
+
+def introspect(tokens):
+    """
+    Prüft Tokens ohne Nebenwirkungen.
+
+    Args:
+        tokens: Liste von Token-Strings (JWT oder OAuth2)
+
+    Returns:
+        list: Ergebnis je Token in gleicher Reihenfolge, {'active': False}
+        für ungültige, abgelaufene oder unbekannte Tokens
+    """
+    keys = {token: cache_key(token) for token in tokens}
+    cached = cache.get_many(list(set(keys.values())))
+    # Einträge gelten nur mit unveränderter Benutzer-Version
+    versions = user_cache.get_versions({entry['sub'] for entry in cached.values() if entry['sub']})
+
+    found = {}
+    missing = set()
+    for token, key in keys.items():
+        entry = cached.get(key)
+        if entry is not None and entry['result'] is not None and entry['user_version'] == versions.get(entry['sub']):
+            found[token] = entry['result']
+            record_cache('introspection', True)
+        else:
+            missing.add(token)
+            record_cache('introspection', False)
+
+    if missing:
+        payloads = _decode_jwts([token for token in missing if _is_jwt(token)])
+        # Benutzer, die schon vor der Datenbank bekannt sind (JWT bzw. gemerkter
+        # Benutzer eines OAuth2-Tokens), und ihre Versionen - vor der Prüfung lesen
+        known = {token: str(payload.get(api_settings.USER_ID_CLAIM)) for token, payload in payloads.items()}
+        for token in missing - set(payloads):
+            entry = cached.get(keys[token])
+            if entry is not None and entry['sub']:
+                known[token] = entry['sub']
+        versions.update(user_cache.get_versions(set(known.values()) - set(versions)))
+
+        fresh = _introspect_jwts(payloads)
+        fresh.update(_introspect_oauth2([token for token in missing if not _is_jwt(token)]))
+
+        ttl = get_cache_ttl()
+        if ttl > 0:
+            now = time.time()
+            entries = {}
+            for token, result in fresh.items():
+                timeout = min(int(result['exp'] - now), ttl)
+                if timeout <= 0:
+                    continue
+                sub = result.get('sub')
+                if sub is None or known.get(token) == sub:
+                    entry = {'sub': sub, 'result': result, 'user_version': versions.get(sub)}
+                else:
+                    # Version vor der Prüfung unbekannt: nur den Benutzer merken
+                    entry = {'sub': sub, 'result': None, 'user_version': None}
+                entries.setdefault(timeout, {})[keys[token]] = entry
+            for timeout, values in entries.items():
+                cache.set_many(values, timeout)
+        found.update(fresh)
+
+    # Kopien, damit permission_version nicht im Cache landet
+    results = [dict(found[token]) if token in found else {'active': False} for token in tokens]
+    _add_permission_versions(results)
+    return results
@@ -0,0 +1,126 @@
+"""
+Token-Introspection Views (RFC 7662)
+Side-effect-free token validation for backend services, see accounts/introspection.py.
+"""
+from rest_framework import status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema
+
+from .introspection import get_batch_size, introspect
+from .permissions import HasValidAPIKeyAndSecret
+
+
+@extend_schema(
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'token': {
+                    'type': 'string',
+                    'description': 'JWT Access Token oder OAuth2 Access Token',
+                },
+                'token_type_hint': {
+                    'type': 'string',
+                    'description': 'Optional, wird ignoriert (RFC 7662)',
+                    'example': 'access_token',
+                },
+            },
+            'required': ['token'],
+        }
+    },
+    responses={
+        200: {'description': 'Introspection-Ergebnis ({"active": false} bei ungültigem Token)'},
+        400: {'description': 'Token fehlt'},
+        403: {'description': 'API-Key oder API-Secret fehlt bzw. ungültig'},
+    },
+    description='Prüft einen Token ohne Nebenwirkungen (RFC 7662). Erfordert X-API-Key und X-API-Secret.'
+)
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([HasValidAPIKeyAndSecret])
+def introspect_token(request):
+    """
+    🔍 Token-Introspection (RFC 7662)
+
+    POST /api/accounts/introspect/
+    Body (JSON oder Formular): {"token": "...", "token_type_hint": "access_token"}
+
+    **Response (200 OK):**
+    ```json
+    {
+      "active": true,
+      "token_type": "Bearer",
+      "sub": "uuid",
+      "username": "max",
+      "exp": 1735689600,
+      "iat": 1735686000,
+      "permission_version": [12, 3]
+    }
+    ```
+
+    Ungültige, abgelaufene oder unbekannte Tokens: `{"active": false}`
+    """
+    token = request.data.get('token')
+    if not token or not isinstance(token, str):
+        return Response({
+            'error': 'token ist erforderlich.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(introspect([token])[0], status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request={
+        'application/json': {
+            'type': 'object',
+            'properties': {
+                'tokens': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'description': 'Bis zu INTROSPECTION_BATCH_SIZE Tokens',
+                },
+            },
+            'required': ['tokens'],
+        }
+    },
+    responses={
+        200: {'description': 'Ergebnisse in der Reihenfolge der Tokens'},
+        400: {'description': 'tokens fehlt, ist keine Liste oder zu lang'},
+        403: {'description': 'API-Key oder API-Secret fehlt bzw. ungültig'},
+    },
+    description='Prüft mehrere Tokens in einem Aufruf (Batch-Variante von /introspect/).'
+)
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([HasValidAPIKeyAndSecret])
+def introspect_tokens_batch(request):
+    """
+    🔍 Token-Introspection für mehrere Tokens
+
+    POST /api/accounts/introspect/batch/
+    Body: {"tokens": ["...", "..."]}
+
+    **Response (200 OK):**
+    ```json
+    {
+      "results": [
+        {"active": true, "sub": "uuid", "exp": 1735689600, "permission_version": [12, 3]},
+        {"active": false}
+      ]
+    }
+    ```
+    """
+    tokens = request.data.get('tokens')
+    if not isinstance(tokens, list) or not tokens or not all(isinstance(token, str) for token in tokens):
+        return Response({
+            'error': 'tokens muss eine nicht leere Liste von Tokens sein.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    batch_size = get_batch_size()
+    if len(tokens) > batch_size:
+        return Response({
+            'error': f'Höchstens {batch_size} Tokens pro Anfrage.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'results': introspect(tokens)}, status=status.HTTP_200_OK)
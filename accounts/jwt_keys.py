@@ -0,0 +1,295 @@
+"""
+Asymmetrische JWT-Signatur mit Schlüsselring und JWKS
+
+Access und Refresh Tokens werden mit dem aktiven JWTSigningKey signiert
+(RS256 oder EdDSA/Ed25519), der JWT-Header trägt dessen `kid`. Websites
+prüfen Access Tokens lokal mit den öffentlichen Schlüsseln unter
+/.well-known/jwks.json, ohne verify_access oder die Berechtigungs-Endpunkte
+aufzurufen, und brauchen dafür kein gemeinsames Secret.
+
+Lebenszyklus eines Schlüssels (python manage.py rotate_jwt_signing_key):
+
+    pending  veröffentlicht im JWKS, signiert noch nicht
+    active   signiert neue Tokens (höchstens einer)
+    retired  nur noch zur Prüfung veröffentlicht, bis alle damit signierten
+             Tokens abgelaufen sind (REFRESH_TOKEN_LIFETIME), dann gelöscht
+
+Ein Schlüssel wird erst aktiv, nachdem er JWKS_MAX_AGE im JWKS stand -
+Websites mit gecachtem JWKS kennen ihn dann bereits.
+
+Solange kein Schlüssel aktiv ist, signiert SimpleJWT wie bisher mit
+SIMPLE_JWT['ALGORITHM'] und SIGNING_KEY. Tokens ohne kid werden so lange
+akzeptiert, wie JWT_ACCEPT_LEGACY_TOKENS gesetzt ist (Umstellungsphase).
+
+Der Schlüsselring liegt pro Prozess im Speicher und wird nach
+JWT_KEY_RING_TTL Sekunden neu geladen; ein unbekannter kid lädt ihn
+sofort neu (höchstens alle JWT_KEY_RING_MIN_RELOAD Sekunden).
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import namedtuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.http import require_safe
+from jwt import InvalidAlgorithmError, InvalidTokenError
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+
+from .metrics import record_cache
+from .models import JWTSigningKey
+
+
+ALGORITHMS = ('RS256', 'EdDSA')
+RSA_KEY_SIZE = 2048
+
+# Pflichtfelder des JWK-Thumbprints (RFC 7638)
+THUMBPRINT_MEMBERS = {
+    'RSA': ('e', 'kty', 'n'),
+    'OKP': ('crv', 'kty', 'x'),
+}
+
+SigningKey = namedtuple('SigningKey', 'kid algorithm key')
+VerifyingKey = namedtuple('VerifyingKey', 'kid algorithm key')
+KeyRing = namedtuple('KeyRing', 'signing verifying jwks etag loaded')
+
+_ring = None
+_last_reload = 0.0
+_lock = threading.Lock()
+
+
+def get_ring_ttl():
+    """Sekunden, nach denen ein Prozess den Schlüsselring neu lädt."""
+    return getattr(settings, 'JWT_KEY_RING_TTL', 60)
+
+
+def get_min_reload_interval():
+    """Mindestabstand zwischen Neuladen wegen unbekannter kids."""
+    return getattr(settings, 'JWT_KEY_RING_MIN_RELOAD', 5)
+
+
+def get_jwks_max_age():
+    """Cache-Control max-age des JWKS (und Mindest-Vorlauf neuer Schlüssel)."""
+    return getattr(settings, 'JWKS_MAX_AGE', 3600)
+
+
+def accepts_legacy_tokens():
+    """Tokens ohne kid (SIMPLE_JWT SIGNING_KEY) weiterhin akzeptieren."""
+    return getattr(settings, 'JWT_ACCEPT_LEGACY_TOKENS', True)
+
+
+def _password():
+    password = getattr(settings, 'JWT_PRIVATE_KEY_PASSWORD', '')
+    return password.encode('utf-8') if password else None
+
+
+def public_jwk(public_key):
+    """Öffentlicher Schlüssel als JWK-Dict (ohne kid/alg/use)."""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return RSAAlgorithm.to_jwk(public_key, as_dict=True)
+    return OKPAlgorithm.to_jwk(public_key, as_dict=True)
+
+
+def thumbprint(jwk):
+    """JWK-Thumbprint nach RFC 7638 (base64url, SHA-256)."""
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk['kty']]}
+    canonical = json.dumps(members, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(canonical.encode('utf-8')).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def generate_key(algorithm):
+    """
+    Erzeugt ein neues Schlüsselpaar (nicht gespeichert, Status pending).
+
+    Args:
+        algorithm: 'RS256' oder 'EdDSA'
+
+    Returns:
+        JWTSigningKey
+    """
+    if algorithm == 'RS256':
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=RSA_KEY_SIZE)
+    elif algorithm == 'EdDSA':
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f'Nicht unterstützter Algorithmus: {algorithm}')
+
+    password = _password()
+    encryption = (
+        serialization.BestAvailableEncryption(password) if password else serialization.NoEncryption()
+    )
+    public_key = private_key.public_key()
+
+    return JWTSigningKey(
+        kid=thumbprint(public_jwk(public_key)),
+        algorithm=algorithm,
+        private_key=private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption,
+        ).decode('ascii'),
+        public_key=public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode('ascii'),
+    )
+
+
+def _load_ring():
+    signing = None
+    verifying = {}
+    jwks = []
+
+    for key in JWTSigningKey.objects.order_by('created_at'):
+        public_key = serialization.load_pem_public_key(key.public_key.encode('ascii'))
+        verifying[key.kid] = VerifyingKey(key.kid, key.algorithm, public_key)
+        jwks.append({**public_jwk(public_key), 'kid': key.kid, 'alg': key.algorithm, 'use': 'sig'})
+
+        if key.status == JWTSigningKey.STATUS_ACTIVE:
+            private_key = serialization.load_pem_private_key(
+                key.private_key.encode('ascii'), password=_password(),
+            )
+            signing = SigningKey(key.kid, key.algorithm, private_key)
+
+    body = json.dumps({'keys': jwks}, separators=(',', ':')).encode('utf-8')
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return KeyRing(signing, verifying, body, etag, time.monotonic())
+
+
+def get_key_ring(force=False):
+    """Schlüsselring dieses Prozesses (lädt nach JWT_KEY_RING_TTL neu)."""
+    global _ring, _last_reload
+    ring = _ring
+    now = time.monotonic()
+    if not force and ring is not None and now - ring.loaded < get_ring_ttl():
+        return ring
+
+    with _lock:
+        if _ring is not None and _ring is not ring:
+            # Ein anderer Thread hat gerade neu geladen
+            return _ring
+        if force and ring is not None and now - _last_reload < get_min_reload_interval():
+            return ring
+        _ring = _load_ring()
+        _last_reload = now
+        return _ring
+
+
+def invalidate():
+    """Verwirft den Schlüsselring dieses Prozesses (andere Prozesse: nach TTL)."""
+    global _ring
+    with _lock:
+        _ring = None
+
+
+def find_verifying_key(kid):
+    """Öffentlicher Schlüssel zu einem kid oder None."""
+    key = get_key_ring().verifying.get(kid)
+    record_cache('jwt_key', key is not None)
+    if key is None:
+        # Evtl. in einem anderen Prozess gerade erzeugt
+        key = get_key_ring(force=True).verifying.get(kid)
+    return key
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    TokenBackend von SimpleJWT, das mit dem aktiven JWTSigningKey signiert
+    und Tokens anhand ihres kid prüft. Ohne aktiven Schlüssel bzw. für
+    Tokens ohne kid gilt das Verhalten des Basis-Backends.
+    """
+
+    def encode(self, payload):
+        signing = get_key_ring().signing
+        if signing is None:
+            return super().encode(payload)
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            signing.key,
+            algorithm=signing.algorithm,
+            headers={'kid': signing.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+        except InvalidTokenError as ex:
+            raise TokenBackendError(_('Token is invalid or expired')) from ex
+
+        if kid is None:
+            if verify and not accepts_legacy_tokens():
+                raise TokenBackendError(_('Token is invalid or expired'))
+            return super().decode(token, verify=verify)
+
+        key = find_verifying_key(kid) if verify else None
+        if verify and key is None:
+            raise TokenBackendError(_('Token is invalid or expired'))
+
+        try:
+            return jwt.decode(
+                token,
+                key.key if key else None,
+                algorithms=[key.algorithm] if key else list(ALGORITHMS),
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except InvalidAlgorithmError as ex:
+            raise TokenBackendError(_('Invalid algorithm specified')) from ex
+        except InvalidTokenError as ex:
+            raise TokenBackendError(_('Token is invalid or expired')) from ex
+
+
+def install_token_backend():
+    """Ersetzt rest_framework_simplejwt.state.token_backend (AccountsConfig.ready)."""
+    from rest_framework_simplejwt import state
+    from rest_framework_simplejwt.settings import api_settings
+
+    state.token_backend = KeyRingTokenBackend(
+        api_settings.ALGORITHM,
+        api_settings.SIGNING_KEY,
+        api_settings.VERIFYING_KEY,
+        api_settings.AUDIENCE,
+        api_settings.ISSUER,
+        api_settings.JWK_URL,
+        api_settings.LEEWAY,
+        api_settings.JSON_ENCODER,
+    )
+
+
+@require_safe
+def jwks_view(request):
+    """
+    🔑 JWKS - öffentliche Schlüssel zur lokalen Prüfung von Access Tokens
+
+    GET /.well-known/jwks.json
+
+    Cachebar (Cache-Control: public, max-age=JWKS_MAX_AGE), mit ETag;
+    If-None-Match liefert 304 ohne Body.
+    """
+    ring = get_key_ring()
+    response = get_conditional_response(request, etag=ring.etag)
+    if response is None:
+        response = HttpResponse(ring.jwks, content_type='application/jwk-set+json')
+    response['ETag'] = ring.etag
+    patch_cache_control(response, public=True, max_age=get_jwks_max_age())
+    return response
@@ -9,6 +9,8 @@ import time
 from django.conf import settings
 from typing import Optional, Dict, Any
 
+from .metrics import track_outbound
+
 logger = logging.getLogger(__name__)
 
 # Gültige ISO-3166-1 Alpha-2 Country Codes für Lexware
@@ -110,6 +112,7 @@ class LexwareIntegration:
             'Accept': 'application/json'
         }
     
+    @track_outbound('lexware')
     def _make_request(
         self, 
         method: str, 
@@ -0,0 +1,211 @@
+"""
+Aufbewahrung und Archivierung von APIRequestLog
+
+Einträge älter als API_LOG_RETENTION_DAYS werden tageweise in komprimierte
+JSONL-Dateien geschrieben und danach in kleinen Chunks gelöscht:
+
+    <API_LOG_ARCHIVE_DIR>/2025/01/api-requests-2025-01-31.jsonl.gz
+
+Jeder Chunk wird als eigenes gzip-Member angehängt und auf die Platte
+gebracht, bevor die Zeilen gelöscht werden. Bricht ein Lauf ab, kann er
+einfach wiederholt werden (im schlimmsten Fall steht ein Chunk doppelt im
+Archiv; der Reader entfernt Duplikate anhand der ID).
+
+Gelöscht wird per Primärschlüssel in kurzen Transaktionen, damit die
+Tabelle nie länger gesperrt ist.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import APIRequestLog
+
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'user_id', 'method', 'path', 'query_params',
+    'request_body', 'response_body', 'status_code', 'ip_address',
+    'user_agent', 'headers', 'referer', 'duration',
+    'query_count', 'db_duration', 'timings',
+)
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'API_LOG_ARCHIVE_DIR', settings.BASE_DIR / 'log_archive'))
+
+
+def get_retention_days():
+    return getattr(settings, 'API_LOG_RETENTION_DAYS', 30)
+
+
+def archive_path(day, base_dir=None):
+    """Archivdatei eines Tages."""
+    base_dir = Path(base_dir) if base_dir else get_archive_dir()
+    return base_dir / f'{day:%Y}' / f'{day:%m}' / f'api-requests-{day:%Y-%m-%d}.jsonl.gz'
+
+
+def _day_bounds(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, dt_time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def _serialize(row):
+    values = dict(zip(ARCHIVE_FIELDS, row))
+    values['id'] = str(values['id'])
+    values['timestamp'] = values['timestamp'].isoformat()
+    if values['user_id'] is not None:
+        values['user_id'] = str(values['user_id'])
+    return json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+
+
+def _append_chunk(path, lines, compresslevel):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab', compresslevel=compresslevel) as gz:
+            gz.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_logs(before=None, queryset=None, chunk_size=5000, delete=True,
+                 base_dir=None, compresslevel=6, pause=0.0, progress=None):
+    """
+    Archiviert (und löscht) alle Einträge vor `before`.
+
+    Args:
+        before: Stichtag (datetime); Standard: jetzt - API_LOG_RETENTION_DAYS
+        queryset: Einschränkung der Einträge (Standard: alle)
+        chunk_size: Zeilen pro Lese-/Schreib-/Lösch-Schritt
+        delete: False = nur exportieren
+        base_dir: Zielverzeichnis (Standard: API_LOG_ARCHIVE_DIR)
+        compresslevel: gzip-Level (1 = schnell, 9 = klein)
+        pause: Sekunden Pause nach jedem Lösch-Chunk (entlastet die Datenbank)
+        progress: Callback(day, rows_of_day) nach jedem Tag
+
+    Returns:
+        dict: {'rows': Anzahl, 'days': Anzahl, 'files': [Pfade]}
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=get_retention_days())
+    if queryset is None:
+        queryset = APIRequestLog.objects.all()
+    queryset = queryset.filter(timestamp__lt=before)
+
+    stats = {'rows': 0, 'days': 0, 'files': []}
+
+    while True:
+        oldest = queryset.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            break
+
+        day = timezone.localtime(oldest).date()
+        start, end = _day_bounds(day)
+        path = archive_path(day, base_dir)
+        day_rows = _archive_day(
+            queryset.filter(timestamp__gte=start, timestamp__lt=end),
+            path, chunk_size, delete, compresslevel, pause,
+        )
+
+        stats['rows'] += day_rows
+        stats['days'] += 1
+        stats['files'].append(path)
+        if progress:
+            progress(day, day_rows)
+
+        if not delete:
+            # Ohne Löschen würde der nächste Durchlauf denselben Tag finden
+            queryset = queryset.filter(timestamp__gte=end)
+
+    return stats
+
+
+def _archive_day(queryset, path, chunk_size, delete, compresslevel, pause):
+    rows = 0
+    last = None
+    queryset = queryset.order_by('timestamp', 'id')
+
+    while True:
+        chunk = queryset
+        if last is not None:
+            # Keyset-Pagination statt OFFSET
+            chunk = chunk.filter(
+                Q(timestamp__gt=last[0]) | Q(timestamp=last[0], id__gt=last[1])
+            )
+        chunk = list(chunk.values_list(*ARCHIVE_FIELDS)[:chunk_size])
+        if not chunk:
+            return rows
+
+        _append_chunk(path, [_serialize(row) for row in chunk], compresslevel)
+
+        if delete:
+            ids = [row[0] for row in chunk]
+            with transaction.atomic():
+                APIRequestLog.objects.filter(pk__in=ids).delete()
+            if pause:
+                time.sleep(pause)
+
+        rows += len(chunk)
+        last = (chunk[-1][1], chunk[-1][0])
+
+
+def archived_days(base_dir=None):
+    """Alle archivierten Tage (aufsteigend)."""
+    base_dir = Path(base_dir) if base_dir else get_archive_dir()
+    days = []
+    for path in base_dir.glob('*/*/api-requests-*.jsonl.gz'):
+        try:
+            days.append(date.fromisoformat(path.name[len('api-requests-'):-len('.jsonl.gz')]))
+        except ValueError:
+            continue
+    return sorted(days)
+
+
+def read_archived_logs(day, until=None, base_dir=None, method=None, status_code=None,
+                       status_class=None, path_prefix=None, user_id=None,
+                       ip_address=None, search=None):
+    """
+    Liest archivierte Einträge eines Tages (oder Zeitraums) mit optionalen Filtern.
+
+    Yields:
+        dict: Log-Eintrag (Felder wie ARCHIVE_FIELDS)
+    """
+    until = until or day
+    current = day
+    while current <= until:
+        path = archive_path(current, base_dir)
+        current += timedelta(days=1)
+        if not path.exists():
+            continue
+
+        seen = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                # Schneller Textfilter vor dem Parsen
+                if search and search not in line:
+                    continue
+                entry = json.loads(line)
+                if entry['id'] in seen:
+                    continue
+                seen.add(entry['id'])
+
+                if method and entry['method'] != method.upper():
+                    continue
+                if status_code and entry['status_code'] != status_code:
+                    continue
+                if status_class and entry['status_code'] // 100 != status_class:
+                    continue
+                if path_prefix and not entry['path'].startswith(path_prefix):
+                    continue
+                if user_id and entry['user_id'] != str(user_id):
+                    continue
+                if ip_address and entry['ip_address'] != ip_address:
+                    continue
+                yield entry
@@ -0,0 +1,132 @@
+"""
+Sampling- und Capture-Policy für das API Request Logging
+
+Die Policy wird in den Settings deklariert und von der Logging-Middleware
+ausgewertet, bevor Request- oder Response-Body gelesen werden:
+
+    API_LOG_POLICIES = [
+        # Permission-Checks: 10 % Stichprobe, nur Metadaten
+        {'path': '/api/permissions/check', 'status': ['2xx'],
+         'sample_rate': 0.1, 'capture': 'metadata'},
+        # Token-Refresh: alle loggen, aber ohne Bodies
+        {'path': '/api/accounts/token/refresh/', 'methods': ['POST'],
+         'capture': 'headers'},
+    ]
+
+Regeln werden in Reihenfolge geprüft, die erste passende gewinnt. Ohne
+passende Regel gilt API_LOG_DEFAULT_POLICY. Alle Schlüssel einer Regel sind
+optional:
+
+    path         Pfad-Präfix
+    methods      Liste von HTTP-Methoden
+    status       Liste von Statusklassen ('2xx') oder Statuscodes (204)
+    sample_rate  Anteil der geloggten Requests (0.0 - 1.0)
+    capture      'full'     - Bodies und Headers
+                 'headers'  - Headers, keine Bodies
+                 'metadata' - weder Bodies noch Headers
+
+Fehler (4xx/5xx) und langsame Requests (>= API_LOG_SLOW_REQUEST_SECONDS)
+werden immer vollständig geloggt.
+"""
+import random
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+CAPTURE_LEVELS = ('full', 'headers', 'metadata')
+
+LogDecision = namedtuple('LogDecision', ['capture_bodies', 'capture_headers'])
+
+FULL = LogDecision(capture_bodies=True, capture_headers=True)
+_DECISIONS = {
+    'full': FULL,
+    'headers': LogDecision(capture_bodies=False, capture_headers=True),
+    'metadata': LogDecision(capture_bodies=False, capture_headers=False),
+}
+
+
+class LogRule:
+    """Eine kompilierte Regel aus API_LOG_POLICIES."""
+
+    def __init__(self, path=None, methods=None, status=None, sample_rate=1.0, capture='full'):
+        if capture not in CAPTURE_LEVELS:
+            raise ImproperlyConfigured(
+                f"API_LOG_POLICIES: capture muss einer von {CAPTURE_LEVELS} sein, nicht {capture!r}."
+            )
+        if not 0.0 <= float(sample_rate) <= 1.0:
+            raise ImproperlyConfigured('API_LOG_POLICIES: sample_rate muss zwischen 0 und 1 liegen.')
+
+        self.path = path
+        self.methods = {method.upper() for method in methods} if methods else None
+        self.status_codes = set()
+        self.status_classes = set()
+        for value in status or ():
+            if isinstance(value, int):
+                self.status_codes.add(value)
+            elif isinstance(value, str) and len(value) == 3 and value[1:].lower() == 'xx':
+                self.status_classes.add(int(value[0]))
+            else:
+                raise ImproperlyConfigured(
+                    f"API_LOG_POLICIES: ungültiger Status {value!r} (erwartet z.B. '2xx' oder 204)."
+                )
+        self.sample_rate = float(sample_rate)
+        self.decision = _DECISIONS[capture]
+
+    def matches(self, method, path, status_code):
+        if self.path and not path.startswith(self.path):
+            return False
+        if self.methods and method not in self.methods:
+            return False
+        if self.status_codes or self.status_classes:
+            if status_code not in self.status_codes and status_code // 100 not in self.status_classes:
+                return False
+        return True
+
+
+class LogPolicy:
+    """Entscheidet pro Request, ob und in welchem Umfang geloggt wird."""
+
+    def __init__(self, rules=(), default=None, slow_request_seconds=1.0):
+        self.rules = [LogRule(**rule) for rule in rules]
+        self.default = LogRule(**(default or {}))
+        self.slow_request_seconds = slow_request_seconds
+
+    def decide(self, method, path, status_code, duration=None):
+        """
+        Returns:
+            LogDecision oder None, wenn der Request nicht geloggt wird
+        """
+        # Fehler und langsame Requests immer vollständig
+        if status_code >= 400:
+            return FULL
+        if duration is not None and self.slow_request_seconds is not None \
+                and duration >= self.slow_request_seconds:
+            return FULL
+
+        rule = next(
+            (rule for rule in self.rules if rule.matches(method, path, status_code)),
+            self.default
+        )
+        if rule.sample_rate < 1.0 and random.random() >= rule.sample_rate:
+            return None
+        return rule.decision
+
+
+_policy = None
+_policy_source = None
+
+
+def get_log_policy():
+    """Policy aus den Settings (neu kompiliert, wenn sich die Settings ändern)."""
+    global _policy, _policy_source
+    source = (
+        getattr(settings, 'API_LOG_POLICIES', ()),
+        getattr(settings, 'API_LOG_DEFAULT_POLICY', None),
+        getattr(settings, 'API_LOG_SLOW_REQUEST_SECONDS', 1.0),
+    )
+    if _policy is None or _policy_source != source:
+        _policy = LogPolicy(*source)
+        _policy_source = source
+    return _policy
@@ -0,0 +1,248 @@
+"""
+Asynchroner Batch-Writer für APIRequestLog
+
+Die Logging-Middleware legt Log-Einträge nur noch in eine begrenzte
+In-Process-Queue. Ein Hintergrund-Thread pro (Gunicorn-)Worker schreibt sie
+gesammelt per bulk_create - sobald API_LOG_BATCH_SIZE Einträge vorliegen oder
+spätestens nach API_LOG_FLUSH_INTERVAL Sekunden.
+
+Überlauf-Verhalten (API_LOG_OVERFLOW_POLICY):
+    'drop'   - ist die Queue voll, wird der neue Eintrag verworfen
+    'sample' - ab halb voller Queue wird nur noch ein Anteil von
+               API_LOG_SAMPLE_RATE übernommen (Fehler-Responses immer),
+               bei voller Queue wird verworfen
+
+Verworfene Einträge werden gezählt (siehe get_log_writer().stats()).
+Beim Beenden des Workers (atexit / Gunicorn worker_exit) wird die Queue
+noch geschrieben.
+
+Über add_flush_hook() können weitere Puffer (z.B. die Rollups aus
+accounts/rollups.py) im selben Thread regelmäßig geschrieben werden.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class APIRequestLogWriter:
+    """Sammelt APIRequestLog-Instanzen und schreibt sie im Hintergrund."""
+
+    def __init__(self, queue_size=10000, batch_size=200, flush_interval=2.0,
+                 overflow_policy='drop', sample_rate=0.1, asynchronous=True):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+        self.asynchronous = asynchronous
+
+        self._lock = threading.Lock()
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped_overflow': 0,
+            'dropped_sampled': 0,
+            'failed': 0,
+        }
+        self._flush_hooks = []
+        self._reset()
+
+    def _reset(self):
+        """Neuer Zustand für den aktuellen Prozess (auch nach einem Fork)."""
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        """Zähler und aktuelle Queue-Länge dieses Prozesses."""
+        with self._lock:
+            counters = dict(self._counters)
+        counters['queued'] = self._queue.qsize()
+        return counters
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Geforkter Worker (preload_app): Thread des Masters existiert hier nicht
+                self._reset()
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='api-request-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def add_flush_hook(self, hook):
+        """
+        Registriert hook(force) - wird nach jedem Durchlauf des Writers mit
+        force=False und beim Beenden mit force=True aufgerufen.
+        """
+        with self._lock:
+            if hook not in self._flush_hooks:
+                self._flush_hooks.append(hook)
+
+    def _run_flush_hooks(self, force=False):
+        for hook in list(self._flush_hooks):
+            try:
+                hook(force=force)
+            except Exception as e:
+                logger.warning('Flush-Hook %r fehlgeschlagen: %s', hook, e)
+
+    def tick(self):
+        """
+        Für Requests, die nichts in die Queue legen: hält den Thread am Laufen
+        bzw. führt im synchronen Modus fällige Flush-Hooks aus.
+        """
+        if self.asynchronous:
+            self._ensure_started()
+        elif self._flush_hooks:
+            self._run_flush_hooks()
+
+    def _accept(self, log):
+        """Überlauf-Policy: True, wenn der Eintrag in die Queue darf."""
+        if self.overflow_policy != 'sample':
+            return True
+        if self._queue.qsize() < self.queue_size // 2:
+            return True
+        # Fehler sind für die Analyse wichtiger als erfolgreiche Requests
+        if log.status_code >= 400:
+            return True
+        return random.random() < self.sample_rate
+
+    def submit(self, log):
+        """
+        Übernimmt einen ungespeicherten APIRequestLog.
+        Blockiert nie - bei voller Queue wird der Eintrag verworfen.
+        """
+        if not self.asynchronous:
+            self._write([log])
+            return
+
+        self._ensure_started()
+
+        if not self._accept(log):
+            self._count('dropped_sampled')
+            return
+
+        try:
+            self._queue.put_nowait(log)
+        except queue.Full:
+            self._count('dropped_overflow')
+            dropped = self._counters['dropped_overflow']
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning('API-Log-Queue voll, %s Einträge verworfen', dropped)
+            return
+
+        self._count('enqueued')
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+                except queue.Empty:
+                    continue
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            if batch:
+                self._write(batch)
+            self._run_flush_hooks()
+        connection.close()
+
+    def _write(self, batch):
+        from .models import APIRequestLog
+
+        close_old_connections()
+        try:
+            APIRequestLog.objects.bulk_create(batch)
+            self._count('written', len(batch))
+            return
+        except Exception as e:
+            logger.warning('Batch-Insert für API-Logs fehlgeschlagen: %s', e)
+
+        # Einzeln nachschreiben, damit ein fehlerhafter Eintrag (z.B. inzwischen
+        # gelöschter Benutzer) nicht den ganzen Batch kostet
+        for log in batch:
+            try:
+                log.save(force_insert=True)
+                self._count('written')
+            except Exception:
+                self._count('failed')
+
+    def flush(self):
+        """Schreibt alle wartenden Einträge im aufrufenden Thread."""
+        if self._pid != os.getpid():
+            return
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Stoppt den Hintergrund-Thread und schreibt die restliche Queue."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+        self._run_flush_hooks(force=True)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """Prozessweiter Writer, konfiguriert über die API_LOG_* Settings."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = APIRequestLogWriter(
+                    queue_size=getattr(settings, 'API_LOG_QUEUE_SIZE', 10000),
+                    batch_size=getattr(settings, 'API_LOG_BATCH_SIZE', 200),
+                    flush_interval=getattr(settings, 'API_LOG_FLUSH_INTERVAL', 2.0),
+                    overflow_policy=getattr(settings, 'API_LOG_OVERFLOW_POLICY', 'drop'),
+                    sample_rate=getattr(settings, 'API_LOG_SAMPLE_RATE', 0.1),
+                    asynchronous=getattr(settings, 'API_LOG_ASYNC', True),
+                )
+                atexit.register(shutdown_log_writer)
+    return _writer
+
+
+def shutdown_log_writer():
+    """Für atexit und den Gunicorn worker_exit Hook."""
+    if _writer is not None:
+        _writer.shutdown()
@@ -0,0 +1,83 @@
+"""
+Django Management Command zum Archivieren alter API Request Logs.
+Schreibt Einträge älter als die Aufbewahrungsfrist in komprimierte
+Tagesdateien (JSONL, gzip) und löscht sie danach in kleinen Chunks.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.log_archive import archive_logs, get_archive_dir, get_retention_days
+from accounts.models import APIRequestLog
+
+
+class Command(BaseCommand):
+    help = 'Archiviert API Request Logs älter als API_LOG_RETENTION_DAYS (gzip JSONL) und löscht sie'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Aufbewahrungsfrist in Tagen (Standard: API_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Zeilen pro Lese-/Lösch-Schritt (Standard: 5000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Pause in Sekunden nach jedem Lösch-Chunk',
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            help='Zielverzeichnis (Standard: API_LOG_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--no-delete',
+            action='store_true',
+            help='Nur exportieren, nichts löschen',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Zeigt nur an, wie viele Einträge betroffen wären',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_days()
+        before = timezone.now() - timedelta(days=days)
+        output_dir = options.get('output_dir') or get_archive_dir()
+
+        if options['dry_run']:
+            count = APIRequestLog.objects.filter(timestamp__lt=before).count()
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] {count} Einträge älter als {days} Tage würden nach {output_dir} archiviert.'
+            ))
+            return
+
+        self.stdout.write(f'Archiviere Einträge vor {timezone.localtime(before):%Y-%m-%d %H:%M} nach {output_dir} ...')
+
+        def progress(day, rows):
+            self.stdout.write(f'  {day:%Y-%m-%d}: {rows} Einträge')
+
+        started = timezone.now()
+        stats = archive_logs(
+            before=before,
+            chunk_size=options['chunk_size'],
+            delete=not options['no_delete'],
+            base_dir=output_dir,
+            pause=options['pause'],
+            progress=progress,
+        )
+        elapsed = (timezone.now() - started).total_seconds()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ {stats["rows"]} Einträge aus {stats["days"]} Tagen archiviert ({elapsed:.1f} s)'
+        ))
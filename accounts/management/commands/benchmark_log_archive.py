@@ -0,0 +1,113 @@
+"""
+Django Management Command: Benchmark der Log-Archivierung.
+Füllt die Tabelle mit synthetischen Einträgen (markiert über einen eigenen
+Pfad-Präfix), archiviert sie in ein temporäres Verzeichnis und misst den
+Durchsatz. Die Benchmark-Einträge werden anschließend entfernt.
+
+Achtung: schreibt in die konfigurierte Datenbank - nicht auf Produktion ausführen.
+"""
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.log_archive import archive_logs, read_archived_logs
+from accounts.models import APIRequestLog
+
+
+BENCHMARK_PATH = '/api/__archive_benchmark__/'
+
+REQUEST_BODY = '{"username":"max.mustermann@example.com","password":"***MASKED***"}'
+RESPONSE_BODY = (
+    '{"user_id":"9f1c2b1e-1111-4444-8888-123456789abc","permission_codename":"create_article",'
+    '"website_id":null,"has_permission":true}'
+)
+HEADERS = '{"HTTP_HOST":"auth.example.com","HTTP_ACCEPT":"application/json","HTTP_X_API_KEY":"[REDACTED]"}'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: Archivierungsdurchsatz auf einer mit Millionen Einträgen gefüllten Log-Tabelle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000000, help='Anzahl Einträge (Standard: 2.000.000)')
+        parser.add_argument('--days', type=int, default=30, help='Über so viele Tage verteilen (Standard: 30)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Chunkgröße der Archivierung')
+        parser.add_argument('--compresslevel', type=int, default=6, help='gzip-Level (Standard: 6)')
+        parser.add_argument('--keep-files', action='store_true', help='Archivdateien nicht löschen')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        days = options['days']
+        output_dir = Path(tempfile.mkdtemp(prefix='api-log-archive-'))
+
+        try:
+            self.stdout.write(f'Erzeuge {rows} Einträge über {days} Tage ...')
+            started = time.perf_counter()
+            self._seed(rows, days)
+            seed_time = time.perf_counter() - started
+            self.stdout.write(f'  {rows / seed_time:,.0f} Zeilen/s ({seed_time:.1f} s)')
+
+            self.stdout.write('Archiviere und lösche ...')
+            started = time.perf_counter()
+            stats = archive_logs(
+                before=timezone.now(),
+                queryset=APIRequestLog.objects.filter(path__startswith=BENCHMARK_PATH),
+                chunk_size=options['chunk_size'],
+                base_dir=output_dir,
+                compresslevel=options['compresslevel'],
+            )
+            archive_time = time.perf_counter() - started
+
+            size = sum(path.stat().st_size for path in set(stats['files']))
+            self.stdout.write(
+                f'  {stats["rows"] / archive_time:,.0f} Zeilen/s ({archive_time:.1f} s), '
+                f'{stats["days"]} Dateien, {size / 1024 / 1024:.1f} MB komprimiert '
+                f'({size / max(stats["rows"], 1):.0f} Bytes/Zeile)'
+            )
+
+            self.stdout.write('Lese einen archivierten Tag ...')
+            first_day = timezone.localtime(timezone.now() - timedelta(days=days)).date()
+            started = time.perf_counter()
+            read = sum(1 for _ in read_archived_logs(first_day, base_dir=output_dir))
+            read_time = time.perf_counter() - started
+            self.stdout.write(f'  {read:,} Einträge, {read / max(read_time, 1e-9):,.0f} Zeilen/s')
+
+            remaining = APIRequestLog.objects.filter(path__startswith=BENCHMARK_PATH).count()
+            if remaining:
+                self.stdout.write(self.style.ERROR(f'{remaining} Einträge wurden nicht archiviert!'))
+            else:
+                self.stdout.write(self.style.SUCCESS('\nBenchmark abgeschlossen.'))
+        finally:
+            APIRequestLog.objects.filter(path__startswith=BENCHMARK_PATH).delete()
+            if options['keep_files']:
+                self.stdout.write(f'Archivdateien: {output_dir}')
+            else:
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+    def _seed(self, rows, days, batch_size=10000):
+        now = timezone.now()
+        span = timedelta(days=days).total_seconds()
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, rows)):
+                batch.append(APIRequestLog(
+                    id=uuid.uuid4(),
+                    method='POST' if i % 3 == 0 else 'GET',
+                    path=f'{BENCHMARK_PATH}{i % 50}/',
+                    request_body=REQUEST_BODY if i % 3 == 0 else None,
+                    response_body=RESPONSE_BODY,
+                    status_code=401 if i % 20 == 0 else 200,
+                    ip_address=f'10.0.{i % 256}.{i % 199}',
+                    user_agent='Mozilla/5.0 (X11; Linux x86_64) Benchmark',
+                    headers=HEADERS,
+                    duration=0.012 + (i % 100) / 1000,
+                    timestamp=now - timedelta(seconds=span * (1 - i / rows)),
+                ))
+            with transaction.atomic():
+                APIRequestLog.objects.bulk_create(batch)
@@ -0,0 +1,137 @@
+"""
+Django Management Command: Micro-Benchmark der Log-Maskierung.
+Vergleicht die bisherige Maskierung (json.loads + Walk + json.dumps mit indent=2)
+mit accounts/masking.py für typische Login- und Permission-Check-Payloads.
+"""
+import json
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from accounts.masking import DEFAULT_LIMIT, MASK, mask_payload
+
+
+LEGACY_SENSITIVE_FIELDS = [
+    'password', 'password2', 'password_confirm',
+    'old_password', 'new_password', 'new_password2', 'new_password_confirm',
+    'access', 'refresh', 'token', 'access_token', 'refresh_token',
+    'api_key', 'api_secret', 'client_secret',
+    'authorization'
+]
+
+
+def legacy_mask(data, limit=DEFAULT_LIMIT):
+    """Bisheriger Weg aus APIRequestLoggingMiddleware (dekodieren, maskieren, kürzen)."""
+    text = data.decode('utf-8')
+    try:
+        parsed = json.loads(text)
+
+        def mask_dict(d):
+            if isinstance(d, dict):
+                for key, value in d.items():
+                    if key.lower() in LEGACY_SENSITIVE_FIELDS:
+                        d[key] = '***MASKED***'
+                    elif isinstance(value, dict):
+                        mask_dict(value)
+                    elif isinstance(value, list):
+                        for item in value:
+                            if isinstance(item, dict):
+                                mask_dict(item)
+            return d
+
+        text = json.dumps(mask_dict(parsed), ensure_ascii=False, indent=2)
+    except (json.JSONDecodeError, TypeError):
+        pass
+    if len(text) > limit:
+        text = text[:limit] + '... (truncated)'
+    return text
+
+
+FAKE_JWT = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.' + 'eyJ1c2VyX2lkIjoiMTIzIn0' * 8 + '.c2lnbmF0dXJl'
+
+
+def _payloads():
+    def encode(data):
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    codenames = [f'app.permission_{i}' for i in range(40)]
+    return {
+        'login request': encode({
+            'username': 'max.mustermann@example.com',
+            'password': 'SehrGeheim123!',
+            'mfa_token': '123456',
+        }),
+        'login response': encode({
+            'refresh': FAKE_JWT,
+            'access': FAKE_JWT,
+            'user': {
+                'id': '9f1c2b1e-1111-4444-8888-123456789abc',
+                'email': 'max.mustermann@example.com',
+                'username': 'max',
+                'first_name': 'Max',
+                'last_name': 'Mustermann',
+            },
+            'permissions': {'global': codenames[:20], 'local': {'site': codenames[20:]}},
+            'direct_permissions': [],
+        }),
+        'check/me response': encode({
+            'user_id': '9f1c2b1e-1111-4444-8888-123456789abc',
+            'user_email': 'max.mustermann@example.com',
+            'website_id': None,
+            'website_name': None,
+            'global_permissions': codenames,
+            'local_permissions': [],
+            'roles': ['Redakteur', 'Support'],
+        }),
+        'check-permission response': encode({
+            'user_id': '9f1c2b1e-1111-4444-8888-123456789abc',
+            'user_email': 'max.mustermann@example.com',
+            'permission_codename': 'create_article',
+            'website_id': None,
+            'has_permission': True,
+        }),
+        'check-bulk response (groß)': encode({
+            'results': {
+                f'user-{u}': {f'site-{w}': {c: (u + w) % 2 == 0 for c in codenames} for w in range(5)}
+                for u in range(10)
+            }
+        }),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Micro-Benchmark: bisherige vs. neue Maskierung sensibler Daten im API-Logging'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=2000,
+            help='Aufrufe pro Messung (Standard: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+
+        self.stdout.write(f'\n{"Payload":<30} {"Bytes":>7} {"bisher µs":>10} {"neu µs":>9} {"Faktor":>7}')
+        self.stdout.write('-' * 67)
+
+        for name, payload in _payloads().items():
+            # Sicherstellen, dass beide Wege dieselben Geheimnisse entfernen
+            masked = mask_payload(payload)
+            if FAKE_JWT in masked or 'SehrGeheim123!' in masked:
+                self.stdout.write(self.style.ERROR(f'{name}: Geheimnis nicht maskiert!'))
+                return
+            if ('SehrGeheim123!' in str(payload) or FAKE_JWT in str(payload)) and MASK not in masked:
+                self.stdout.write(self.style.ERROR(f'{name}: keine Maskierung erfolgt!'))
+                return
+
+            legacy = min(timeit.repeat(lambda: legacy_mask(payload), number=number, repeat=3)) / number
+            current = min(timeit.repeat(lambda: mask_payload(payload), number=number, repeat=3)) / number
+
+            self.stdout.write(
+                f'{name:<30} {len(payload):>7} {legacy * 1e6:>10.2f} {current * 1e6:>9.2f} '
+                f'{legacy / current:>6.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark abgeschlossen.'))
@@ -0,0 +1,107 @@
+"""
+Django Management Command: Benchmark der Passwort-Hasher.
+
+Misst für jeden Hasher aus PASSWORD_HASHERS mit den aktuell gültigen
+Kostenparametern (Kalibrierung bzw. PASSWORD_HASH_WORK_FACTORS):
+
+- die Dauer eines Hashes im Request-Thread und über den Hashing-Pool,
+- die daraus folgende Obergrenze an Logins pro Sekunde und Worker,
+- einen Login mit veraltetem Hash: mit sofortigem Upgrade (Django-Standard,
+  die Response wartet auf den zweiten Hash) und mit Upgrade im Hintergrund.
+
+    python manage.py benchmark_password_hashers
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers as django_hashers
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from accounts import hashing
+from accounts.hashers import WORK_FACTORS, measure
+
+
+PASSWORD = 'Benchmark-2024!'
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: Kosten der Passwort-Hasher und Login mit veraltetem Hash (sofortiges vs. Hintergrund-Upgrade)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Messungen pro Hasher, gewertet wird die schnellste (Standard: 3)',
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+        workers = max(hashing.get_max_workers(), 1)
+
+        self.stdout.write(
+            f'\n{"Algorithmus":<15} {"Parameter":<22} {"direkt ms":>10} {"Pool ms":>9} {"Logins/s":>9}'
+        )
+        self.stdout.write('-' * 69)
+
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                if hasher.library:
+                    hasher._load_library()
+            except ValueError:
+                self.stdout.write(f'{hasher.algorithm:<15} (Bibliothek nicht installiert)')
+                continue
+
+            param = WORK_FACTORS.get(hasher.algorithm)
+            setting = f'{param}={getattr(hasher, param)}' if param else '-'
+            pooled = measure(hasher, repeat)
+
+            # Direkt im aufrufenden Thread, wie ohne Hashing-Pool
+            hashing._worker.active = True
+            try:
+                direct = measure(hasher, repeat)
+            finally:
+                hashing._worker.active = False
+
+            self.stdout.write(
+                f'{hasher.algorithm:<15} {setting:<22} {direct * 1000:>10.1f} {pooled * 1000:>9.1f} '
+                f'{workers / pooled:>9.1f}'
+            )
+
+        self._benchmark_upgrade()
+        self.stdout.write(self.style.SUCCESS('\nBenchmark abgeschlossen.'))
+
+    def _benchmark_upgrade(self):
+        hasher = django_hashers.get_hasher()
+        if not hasher.algorithm.startswith('pbkdf2'):
+            return
+
+        # Hash mit halber Iterationszahl: gilt als veraltet (must_update)
+        outdated = hasher.encode(PASSWORD, hasher.salt(), hasher.iterations // 2)
+
+        def sync_upgrade():
+            django_hashers.check_password(PASSWORD, outdated, setter=django_hashers.make_password)
+
+        def deferred_upgrade():
+            django_hashers.check_password(
+                PASSWORD, outdated,
+                setter=lambda raw: hashing.submit('upgrade', django_hashers.make_password, raw),
+            )
+
+        sync = _timed(sync_upgrade)
+        deferred = _timed(deferred_upgrade)
+        # Hintergrund-Upgrade abwarten, damit es die nächste Messung nicht verfälscht
+        while hashing.pending():
+            time.sleep(0.01)
+
+        self.stdout.write(f'\nLogin mit veraltetem {hasher.algorithm}-Hash (iterations={hasher.iterations // 2}):')
+        self.stdout.write(f'  Upgrade im Request (Django-Standard): {sync * 1000:>8.1f} ms')
+        self.stdout.write(f'  Upgrade im Hintergrund:               {deferred * 1000:>8.1f} ms')
@@ -0,0 +1,139 @@
+"""
+Django Management Command: Benchmark des Rate Limitings für /api/accounts/login/.
+
+Vergleicht eine vom Rate Limit abgelehnte Login-Anfrage (429) mit einem
+Fehl-Login, der bis zum Passwort-Hashing kommt (401), jeweils über den
+vollständigen Request-Pfad (Middlewares, API-Key-Prüfung, DRF). Zusätzlich
+wird ein einzelner Bucket-Check (accounts/ratelimit.py) gemessen.
+
+Gemessen wird gegen den konfigurierten Cache (Redis in Produktion). Die
+Testdaten werden in einer Transaktion angelegt und zurückgerollt.
+
+    python manage.py benchmark_rate_limit
+    python manage.py benchmark_rate_limit --number 500
+"""
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from accounts import ratelimit
+from accounts.models import Website
+
+
+User = get_user_model()
+
+PASSWORD = 'Benchmark-2024!'
+
+# Middlewares, die im Betrieb außerhalb des Requests schreiben
+EXCLUDED_MIDDLEWARE = (
+    'accounts.middleware.MetricsMiddleware',
+    'accounts.middleware.APIRequestLoggingMiddleware',
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark: vom Rate Limit abgelehnte Login-Anfragen vs. Fehl-Logins mit Passwort-Hashing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=200,
+            help='Abgelehnte Anfragen pro Messung (Standard: 200, Fehl-Logins: ein Vierzigstel)',
+        )
+
+    def handle(self, *args, **options):
+        number = max(options['number'], 10)
+        middleware = [m for m in settings.MIDDLEWARE if m not in EXCLUDED_MIDDLEWARE]
+
+        setup_test_environment()
+        logging.disable(logging.WARNING)
+        try:
+            with override_settings(MIDDLEWARE=middleware):
+                try:
+                    with transaction.atomic():
+                        rows = self._run(number)
+                        raise _Rollback
+                except _Rollback:
+                    pass
+        finally:
+            logging.disable(logging.NOTSET)
+            teardown_test_environment()
+
+        self.stdout.write(f'\n{"Szenario":<42} {"µs/Request":>11} {"SQL":>5} {"Status":>7}')
+        self.stdout.write('-' * 68)
+        for name, seconds, queries, status_code in rows:
+            self.stdout.write(f'{name:<42} {seconds * 1e6:>11.1f} {queries:>5} {status_code:>7}')
+
+        hashed, rejected = rows[0][1], rows[1][1]
+        self.stdout.write(f'\nAbgelehnte Anfrage {hashed / rejected:.0f}x günstiger als ein Fehl-Login.')
+        self.stdout.write(self.style.SUCCESS('Benchmark abgeschlossen.'))
+
+    def _run(self, number):
+        suffix = uuid.uuid4().hex[:8]
+        website = Website.objects.create(
+            name=f'Benchmark {suffix}',
+            domain=f'{suffix}.benchmark.test',
+            callback_url=f'https://{suffix}.benchmark.test/callback',
+        )
+        user = User.objects.create_user(
+            email=f'{suffix}@benchmark.test', username=f'benchmark_{suffix}', password=PASSWORD,
+        )
+        url = reverse('accounts:login')
+        data = {'username': user.email, 'password': PASSWORD + 'x'}
+        # Eigene IP pro Lauf, damit Buckets früherer Läufe nicht mitzählen
+        client = Client(REMOTE_ADDR=f'198.18.{int(suffix[:2], 16)}.{int(suffix[2:4], 16)}')
+
+        def post():
+            return client.post(url, data, content_type='application/json', HTTP_X_API_KEY=website.api_key)
+
+        rows = []
+
+        # 1. Fehl-Login ohne Rate Limit: authenticate() hasht das Passwort
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            post()
+            rows.append(('Fehl-Login (401, Passwort-Hash)',) + self._measure(post, max(number // 40, 3), 401))
+
+        # 2. Bucket leeren, danach wird jede Anfrage vor der View abgelehnt
+        for _ in range(1000):
+            response = post()
+            if response.status_code == 429:
+                break
+        if response.status_code != 429:
+            raise RuntimeError('Rate Limit greift nicht - RATE_LIMITS prüfen.')
+        if not response.get('Retry-After') or not response.get('RateLimit-Limit'):
+            raise RuntimeError('Retry-After/RateLimit-* Header fehlen.')
+        rows.append(('Abgelehnt vom Rate Limit (429)',) + self._measure(post, number, 429))
+
+        # 3. Nur der Bucket-Check (ohne HTTP/DRF)
+        limit = ratelimit.Limit(1, 3600)
+        key = ratelimit.BUCKET_KEY.format(scope='benchmark', kind='ip', ident=suffix)
+        ratelimit.hit(key, limit)
+        start = time.perf_counter()
+        for _ in range(number):
+            ratelimit.hit(key, limit)
+        rows.append(('ratelimit.hit() abgelehnt', (time.perf_counter() - start) / number, 0, 429))
+
+        return rows
+
+    def _measure(self, call, number, expected_status):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(number):
+                response = call()
+            seconds = (time.perf_counter() - start) / number
+        if response.status_code != expected_status:
+            raise RuntimeError(f'Status {response.status_code}, erwartet {expected_status}')
+        return seconds, len(queries) // number, response.status_code
@@ -0,0 +1,171 @@
+"""
+Django Management Command: Passwort-Hasher auf diesem Host kalibrieren.
+
+Misst für jeden Hasher aus PASSWORD_HASHERS die Dauer eines Hashes und
+skaliert seinen Kostenparameter (accounts.hashers.WORK_FACTORS), bis ein
+Hash etwa PASSWORD_HASH_TARGET_MS dauert:
+
+    pbkdf2_*       iterations    linear
+    argon2         time_cost     linear (memory_cost bleibt)
+    bcrypt_sha256  rounds        log2
+    scrypt         work_factor   Zweierpotenz (maxmem wird mitgeführt)
+
+Ohne --allow-weaker werden Djangos Standardwerte nicht unterschritten.
+Mit --write landen die Parameter in PASSWORD_HASH_CALIBRATION_FILE und
+gelten nach einem Neustart der Worker; bestehende Hashes werden beim
+nächsten Login im Hintergrund angepasst.
+
+    python manage.py calibrate_password_hashers
+    python manage.py calibrate_password_hashers --target-ms 300 --write
+"""
+import json
+import math
+import os
+import socket
+
+from django.conf import settings
+from django.contrib.auth import hashers as django_hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.hashers import WORK_FACTORS, measure
+
+
+# hashlib.scrypt erlaubt ohne maxmem höchstens 32 MiB
+SCRYPT_DEFAULT_MAXMEM = 32 * 1024 * 1024
+
+
+def _django_default(hasher, param):
+    base = next(cls for cls in type(hasher).__mro__ if cls.__module__ == django_hashers.__name__)
+    return getattr(base, param)
+
+
+def _scale(algorithm, value, factor):
+    """Neuer Kostenparameter für Dauer * factor."""
+    if algorithm.startswith('pbkdf2'):
+        return max(1000, round(value * factor / 1000) * 1000)
+    if algorithm == 'argon2':
+        return max(1, round(value * factor))
+    if algorithm == 'bcrypt_sha256':
+        return min(31, max(4, value + round(math.log2(factor))))
+    if algorithm == 'scrypt':
+        return max(2, 2 ** round(math.log2(value * factor)))
+    raise ValueError(algorithm)
+
+
+def _apply(hasher, param, value):
+    """Setzt den Parameter am Hasher und gibt die zu speichernden Werte zurück."""
+    setattr(hasher, param, value)
+    params = {param: value}
+    if param == 'work_factor':
+        needed = 128 * value * hasher.block_size * hasher.parallelism
+        hasher.maxmem = 2 * needed if needed >= SCRYPT_DEFAULT_MAXMEM // 2 else 0
+        if hasher.maxmem:
+            params['maxmem'] = hasher.maxmem
+    return params
+
+
+class Command(BaseCommand):
+    help = 'Misst die Passwort-Hasher auf diesem Host und wählt Kostenparameter für eine Ziel-Dauer pro Hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms',
+            type=int,
+            default=None,
+            help='Ziel-Dauer eines Hashes in Millisekunden (Standard: PASSWORD_HASH_TARGET_MS)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Messungen pro Einstellung, gewertet wird die schnellste (Standard: 3)',
+        )
+        parser.add_argument(
+            '--allow-weaker',
+            action='store_true',
+            help='Djangos Standardwerte dürfen unterschritten werden',
+        )
+        parser.add_argument(
+            '--write',
+            action='store_true',
+            help='Ergebnis in PASSWORD_HASH_CALIBRATION_FILE speichern',
+        )
+
+    def handle(self, *args, **options):
+        target_ms = options['target_ms'] or getattr(settings, 'PASSWORD_HASH_TARGET_MS', 250)
+        if target_ms <= 0:
+            raise CommandError('--target-ms muss größer als 0 sein.')
+        target = target_ms / 1000
+        repeat = max(options['repeat'], 1)
+        workers = max(getattr(settings, 'PASSWORD_HASH_WORKERS', 1), 1)
+
+        self.stdout.write(f'\nZiel: {target_ms} ms pro Hash, {workers} Hashing-Thread(s) pro Worker\n')
+        self.stdout.write(
+            f'{"Algorithmus":<15} {"Parameter":<12} {"bisher":>10} {"ms":>8} {"neu":>10} {"ms":>8} {"Logins/s":>9}'
+        )
+        self.stdout.write('-' * 78)
+
+        factors = {}
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            algorithm = hasher.algorithm
+            param = WORK_FACTORS.get(algorithm)
+            if param is None:
+                self.stdout.write(f'{algorithm:<15} (nicht einstellbar)')
+                continue
+            try:
+                if hasher.library:
+                    hasher._load_library()
+            except ValueError:
+                self.stdout.write(f'{algorithm:<15} (Bibliothek nicht installiert)')
+                continue
+
+            current = getattr(hasher, param)
+            current_seconds = measure(hasher, repeat)
+            floor = None if options['allow_weaker'] else _django_default(hasher, param)
+
+            value, seconds, params = current, current_seconds, {param: current}
+            for _ in range(4):
+                new = _scale(algorithm, value, target / seconds)
+                if floor is not None:
+                    new = max(new, floor)
+                if new == value:
+                    break
+                params = _apply(hasher, param, new)
+                value, seconds = new, measure(hasher, repeat)
+
+            factors[algorithm] = params
+            self.stdout.write(
+                f'{algorithm:<15} {param:<12} {current:>10} {current_seconds * 1000:>8.1f} '
+                f'{value:>10} {seconds * 1000:>8.1f} {workers / seconds:>9.1f}'
+            )
+
+        primary = import_string(settings.PASSWORD_HASHERS[0])().algorithm
+        self.stdout.write(f'\nNeue Hashes verwenden {primary}; Logins/s = obere Grenze je Gunicorn-Worker.')
+
+        if not options['write']:
+            self.stdout.write('Nichts gespeichert (--write zum Übernehmen).')
+            return
+
+        path = settings.PASSWORD_HASH_CALIBRATION_FILE
+        data = {
+            'target_ms': target_ms,
+            'host': socket.gethostname(),
+            'calibrated_at': timezone.now().isoformat(),
+            'work_factors': factors,
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, indent=2)
+        os.replace(tmp_path, path)
+
+        overrides = getattr(settings, 'PASSWORD_HASH_WORK_FACTORS', {})
+        if overrides:
+            self.stdout.write(self.style.WARNING(
+                f'PASSWORD_HASH_WORK_FACTORS überschreibt: {", ".join(sorted(overrides))}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Gespeichert in {path} - gilt nach dem Neustart der Worker.'
+        ))
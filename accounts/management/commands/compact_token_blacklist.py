@@ -0,0 +1,73 @@
+"""
+Django Management Command: abgelaufene Refresh Tokens aus der Blacklist entfernen.
+
+Jeder Login legt eine OutstandingToken-Zeile an, jeder Refresh und Logout
+zusätzlich eine BlacklistedToken-Zeile. Abgelaufene Tokens werden ohnehin
+abgelehnt, ihre Zeilen werden hier in kleinen Chunks gelöscht (kurze
+Transaktionen statt eines großen DELETE wie bei flushexpiredtokens).
+
+    python manage.py compact_token_blacklist
+    python manage.py compact_token_blacklist --chunk-size 2000 --pause 0.1
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from accounts.revocation import compact
+
+
+class Command(BaseCommand):
+    help = 'Löscht abgelaufene OutstandingToken- und BlacklistedToken-Zeilen in Chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Zeilen pro Lösch-Schritt (Standard: 5000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Pause in Sekunden nach jedem Lösch-Chunk',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Zeigt nur an, wie viele Zeilen betroffen wären',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options['dry_run']:
+            outstanding = OutstandingToken.objects.filter(expires_at__lte=now).count()
+            blacklisted = BlacklistedToken.objects.filter(token__expires_at__lte=now).count()
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] {outstanding} abgelaufene Tokens, davon {blacklisted} gesperrt, würden gelöscht.'
+            ))
+            return
+
+        verbosity = options['verbosity']
+        chunks = 0
+
+        def progress(outstanding, blacklisted):
+            nonlocal chunks
+            chunks += 1
+            if verbosity >= 2:
+                self.stdout.write(f'  Chunk {chunks}: {outstanding} Tokens, {blacklisted} gesperrt')
+
+        started = timezone.now()
+        stats = compact(
+            before=now,
+            chunk_size=max(options['chunk_size'], 1),
+            pause=options['pause'],
+            progress=progress,
+        )
+        elapsed = (timezone.now() - started).total_seconds()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {stats["outstanding"]} abgelaufene Tokens, davon {stats["blacklisted"]} gesperrt, '
+            f'in {chunks} Chunks gelöscht ({elapsed:.1f} s)'
+        ))
@@ -0,0 +1,66 @@
+"""
+Django Management Command zum Durchsuchen archivierter API Request Logs.
+"""
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.log_archive import archived_days, get_archive_dir, read_archived_logs
+
+
+class Command(BaseCommand):
+    help = 'Durchsucht archivierte API Request Logs (Ausgabe als JSONL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='Archivierte Tage auflisten')
+        parser.add_argument('--date', type=str, help='Tag (YYYY-MM-DD)')
+        parser.add_argument('--until', type=str, help='Letzter Tag eines Zeitraums (YYYY-MM-DD)')
+        parser.add_argument('--method', type=str, help='HTTP Methode')
+        parser.add_argument('--status', type=int, help='Status Code (z.B. 401)')
+        parser.add_argument('--status-class', type=int, help='Statusklasse (z.B. 5 für 5xx)')
+        parser.add_argument('--path', type=str, help='Pfad-Präfix')
+        parser.add_argument('--user', type=str, help='Benutzer-ID')
+        parser.add_argument('--ip', type=str, help='IP-Adresse')
+        parser.add_argument('--search', type=str, help='Freitext (Body, Header, ...)')
+        parser.add_argument('--limit', type=int, default=100, help='Maximale Anzahl Einträge (Standard: 100)')
+        parser.add_argument('--input-dir', type=str, help='Archivverzeichnis (Standard: API_LOG_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        base_dir = options.get('input_dir') or get_archive_dir()
+
+        if options['list']:
+            for day in archived_days(base_dir):
+                self.stdout.write(f'{day:%Y-%m-%d}')
+            return
+
+        if not options.get('date'):
+            raise CommandError('Bitte --date angeben (oder --list für verfügbare Tage).')
+
+        try:
+            day = date.fromisoformat(options['date'])
+            until = date.fromisoformat(options['until']) if options.get('until') else None
+        except ValueError:
+            raise CommandError('Datum muss im Format YYYY-MM-DD angegeben werden.')
+
+        entries = read_archived_logs(
+            day,
+            until=until,
+            base_dir=base_dir,
+            method=options.get('method'),
+            status_code=options.get('status'),
+            status_class=options.get('status_class'),
+            path_prefix=options.get('path'),
+            user_id=options.get('user'),
+            ip_address=options.get('ip'),
+            search=options.get('search'),
+        )
+
+        count = 0
+        for entry in entries:
+            if count >= options['limit']:
+                break
+            self.stdout.write(json.dumps(entry, ensure_ascii=False))
+            count += 1
+
+        self.stderr.write(f'{count} Einträge')
@@ -0,0 +1,75 @@
+"""
+Django Management Command zum (Neu-)Berechnen der API-Rollups aus
+APIRequestLog, z.B. für Zeiträume vor der Einführung der Rollups.
+Optional werden alte Rollups gelöscht.
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import APIRequestRollup
+from accounts.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Berechnet API-Rollups (pro Minute und Endpoint) aus den API Request Logs neu'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            help='Zeitraum der letzten N Stunden (Standard: 24, ohne Zeitraum mit --prune-days nur bereinigen)',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Beginn (YYYY-MM-DD oder YYYY-MM-DDTHH:MM), überschreibt --hours',
+        )
+        parser.add_argument(
+            '--until',
+            type=str,
+            help='Ende (YYYY-MM-DD oder YYYY-MM-DDTHH:MM, Standard: jetzt)',
+        )
+        parser.add_argument(
+            '--prune-days',
+            type=int,
+            help='Rollups älter als N Tage löschen',
+        )
+
+    def rebuild(self, options):
+        until = self._parse(options['until']) if options.get('until') else timezone.now()
+        if options.get('since'):
+            since = self._parse(options['since'])
+        else:
+            since = until - timedelta(hours=options['hours'] if options['hours'] is not None else 24)
+
+        if since >= until:
+            raise CommandError('--since muss vor --until liegen.')
+
+        rows = rebuild_rollups(since, until)
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Rollups für {since:%Y-%m-%d %H:%M} - {until:%Y-%m-%d %H:%M} aus {rows} Log-Einträgen berechnet'
+        ))
+        self.stdout.write(self.style.WARNING(
+            '  Hinweis: per Sampling/Policy nicht geloggte Requests sind darin nicht enthalten.'
+        ))
+
+    def _parse(self, value):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Ungültiges Datum: {value}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def handle(self, *args, **options):
+        rebuild = options.get('since') or options['hours'] is not None or options.get('prune_days') is None
+        if rebuild:
+            self.rebuild(options)
+
+        if options.get('prune_days') is not None:
+            cutoff = timezone.now() - timedelta(days=options['prune_days'])
+            deleted, _ = APIRequestRollup.objects.filter(bucket__lt=cutoff).delete()
+            self.stdout.write(self.style.SUCCESS(f'✓ {deleted} Rollups vor {cutoff:%Y-%m-%d} gelöscht'))
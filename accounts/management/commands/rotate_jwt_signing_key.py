@@ -0,0 +1,128 @@
+"""
+Django Management Command: Schlüssel der JWT-Signatur rotieren.
+
+Jeder Lauf (z.B. wöchentlich per Cron):
+
+1. löscht ausgemusterte Schlüssel, deren Tokens abgelaufen sind
+   (REFRESH_TOKEN_LIFETIME + JWT_KEY_RING_TTL nach dem Ausmustern),
+2. aktiviert den wartenden Schlüssel, sofern er mindestens JWKS_MAX_AGE
+   (+ JWT_KEY_RING_TTL) veröffentlicht ist; der bisher aktive wird
+   ausgemustert und bleibt zur Prüfung im JWKS,
+3. erzeugt einen neuen wartenden Schlüssel, falls keiner mehr wartet.
+
+Der erste Lauf veröffentlicht also nur einen Schlüssel, signiert wird ab
+dem zweiten. --now aktiviert ohne Wartezeit (Ersteinrichtung ohne
+Websites mit gecachtem JWKS), --revoke entfernt einen (kompromittierten)
+Schlüssel sofort; damit signierte Tokens werden ungültig.
+
+    python manage.py rotate_jwt_signing_key
+    python manage.py rotate_jwt_signing_key --algorithm EdDSA --now
+    python manage.py rotate_jwt_signing_key --revoke <kid>
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts import jwt_keys
+from accounts.models import JWTSigningKey
+
+
+class Command(BaseCommand):
+    help = 'Rotiert den Schlüssel der JWT-Signatur (veröffentlichen, aktivieren, ausmustern, löschen)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--algorithm',
+            choices=jwt_keys.ALGORITHMS,
+            default=None,
+            help='Algorithmus neuer Schlüssel (Standard: JWT_KEY_ALGORITHM)',
+        )
+        parser.add_argument(
+            '--now',
+            action='store_true',
+            help='Wartenden bzw. neuen Schlüssel sofort aktivieren',
+        )
+        parser.add_argument(
+            '--revoke',
+            metavar='KID',
+            help='Schlüssel sofort löschen (kompromittiert)',
+        )
+
+    def handle(self, *args, **options):
+        algorithm = options['algorithm'] or getattr(settings, 'JWT_KEY_ALGORITHM', 'RS256')
+        if algorithm not in jwt_keys.ALGORITHMS:
+            raise CommandError(f'JWT_KEY_ALGORITHM muss einer von {", ".join(jwt_keys.ALGORITHMS)} sein.')
+
+        now = timezone.now()
+        ring_ttl = timedelta(seconds=jwt_keys.get_ring_ttl())
+
+        with transaction.atomic():
+            if options['revoke']:
+                self._revoke(options['revoke'])
+
+            expired = JWTSigningKey.objects.filter(
+                status=JWTSigningKey.STATUS_RETIRED,
+                retired_at__lt=now - api_settings.REFRESH_TOKEN_LIFETIME - ring_ttl,
+            )
+            for key in expired:
+                self.stdout.write(f'Gelöscht (Tokens abgelaufen): {key.kid}')
+                key.delete()
+
+            pending = JWTSigningKey.objects.filter(status=JWTSigningKey.STATUS_PENDING).order_by('created_at').first()
+            if pending is None and options['now']:
+                pending = self._create(algorithm)
+
+            published_since = now - timedelta(seconds=jwt_keys.get_jwks_max_age()) - ring_ttl
+            if pending is not None and (options['now'] or pending.created_at <= published_since):
+                self._activate(pending, now)
+            elif pending is not None:
+                self.stdout.write(self.style.WARNING(
+                    f'{pending.kid} ist noch nicht lange genug veröffentlicht '
+                    f'(seit {pending.created_at:%Y-%m-%d %H:%M}), Aktivierung beim nächsten Lauf.'
+                ))
+
+            if not JWTSigningKey.objects.filter(status=JWTSigningKey.STATUS_PENDING).exists():
+                self._create(algorithm)
+
+        self._print_ring()
+
+    def _revoke(self, kid):
+        try:
+            key = JWTSigningKey.objects.get(kid=kid)
+        except JWTSigningKey.DoesNotExist:
+            raise CommandError(f'Kein Schlüssel mit kid {kid}.')
+        key.delete()
+        self.stdout.write(self.style.WARNING(f'Widerrufen: {kid} - damit signierte Tokens sind ungültig.'))
+
+    def _create(self, algorithm):
+        key = jwt_keys.generate_key(algorithm)
+        key.save()
+        self.stdout.write(f'Veröffentlicht: {key.kid} ({algorithm})')
+        return key
+
+    def _activate(self, key, now):
+        JWTSigningKey.objects.filter(status=JWTSigningKey.STATUS_ACTIVE).update(
+            status=JWTSigningKey.STATUS_RETIRED, retired_at=now,
+        )
+        key.status = JWTSigningKey.STATUS_ACTIVE
+        key.activated_at = now
+        key.save(update_fields=['status', 'activated_at'])
+        self.stdout.write(self.style.SUCCESS(f'Aktiviert: {key.kid} ({key.algorithm})'))
+
+    def _print_ring(self):
+        self.stdout.write(f'\n{"kid":<45} {"Alg.":<6} {"Status":<8} {"veröffentlicht":<17} {"aktiviert":<17}')
+        self.stdout.write('-' * 96)
+        for key in JWTSigningKey.objects.order_by('created_at'):
+            activated = f'{key.activated_at:%Y-%m-%d %H:%M}' if key.activated_at else '-'
+            self.stdout.write(
+                f'{key.kid:<45} {key.algorithm:<6} {key.status:<8} '
+                f'{key.created_at:%Y-%m-%d %H:%M}  {activated:<17}'
+            )
+        self.stdout.write(
+            f'\nAndere Worker übernehmen Änderungen nach spätestens {jwt_keys.get_ring_ttl()} s; '
+            f'Websites nach JWKS_MAX_AGE ({jwt_keys.get_jwks_max_age()} s).'
+        )
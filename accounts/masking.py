@@ -0,0 +1,174 @@
+"""
+Maskierung sensibler Daten in Request-/Response-Bodies für das API-Logging
+
+Statt jeden Body per json.loads zu parsen und neu zu serialisieren, wird
+direkt auf den Bytes gearbeitet: ein Vorfilter sucht nach sensiblen
+Schlüsselnamen, Bodies ohne Treffer (der Normalfall, z.B. Permission-Checks)
+werden unverändert übernommen. Bei Treffern werden in einem Durchlauf nur
+die betroffenen Werte ersetzt, die restliche Formatierung bleibt erhalten.
+Maskiert wird nur der Teil, der tatsächlich gespeichert wird (Capture-Limit).
+"""
+import json
+import re
+
+
+SENSITIVE_FIELDS = (
+    'password', 'password2', 'password_confirm',
+    'old_password', 'new_password', 'new_password2', 'new_password_confirm',
+    'access', 'refresh', 'token', 'tokens', 'access_token', 'refresh_token',
+    'api_key', 'api_secret', 'client_secret',
+    'authorization',
+)
+
+MASK = '***MASKED***'
+TRUNCATED_SUFFIX = '... (truncated)'
+DEFAULT_LIMIT = 10000
+
+_names = b'|'.join(
+    re.escape(name.encode()) for name in sorted(SENSITIVE_FIELDS, key=len, reverse=True)
+)
+
+# Beide Muster laufen auf bytes.lower() (nur ASCII, Positionen bleiben gleich),
+# das ist deutlich schneller als re.IGNORECASE
+_PRESCAN = re.compile(rb'"(?:' + _names + rb')"')
+_KEY = re.compile(rb'(?<!\\)"(?:' + _names + rb')"\s*:\s*')
+
+_STRING_END = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_SCALAR = re.compile(rb'[^,}\]\s]*')
+
+_MASKED_VALUE = f'"{MASK}"'.encode()
+_QUOTE, _OPEN, _CLOSE = ord('"'), b'{[', b'}]'
+
+
+def _value_end(raw, start):
+    """
+    Ende des JSON-Werts ab `start`. Unvollständige Werte (abgeschnittener
+    Body) reichen bis zum Ende.
+    """
+    length = len(raw)
+    if start >= length:
+        return start
+
+    char = raw[start]
+    if char == _QUOTE:
+        match = _STRING_END.match(raw, start + 1)
+        return match.end() if match else length
+
+    if char in _OPEN:
+        depth = 0
+        i = start
+        while i < length:
+            char = raw[i]
+            if char == _QUOTE:
+                match = _STRING_END.match(raw, i + 1)
+                if not match:
+                    return length
+                i = match.end()
+                continue
+            if char in _OPEN:
+                depth += 1
+            elif char in _CLOSE:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return length
+
+    return _SCALAR.match(raw, start).end()
+
+
+def _mask_bytes(raw, lowered):
+    match = _KEY.search(lowered)
+    if not match:
+        return raw
+
+    parts = []
+    position = 0
+    while match:
+        value_start = match.end()
+        parts.append(raw[position:value_start])
+        parts.append(_MASKED_VALUE)
+        position = _value_end(raw, value_start)
+        # Schlüssel innerhalb des maskierten Werts überspringen
+        match = _KEY.search(lowered, position)
+    parts.append(raw[position:])
+    return b''.join(parts)
+
+
+def _mask_parsed(value):
+    if isinstance(value, dict):
+        return {
+            key: MASK if key.lower() in SENSITIVE_FIELDS else _mask_parsed(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_mask_parsed(item) for item in value]
+    return value
+
+
+def _mask_escaped(text):
+    """
+    Langsamer Weg für Texte mit Unicode-Escapes, in denen Schlüsselnamen
+    verschleiert sein können: parsen, maskieren, kompakt serialisieren.
+    """
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    masked = _mask_parsed(data)
+    if masked == data:
+        return text
+    return json.dumps(masked, ensure_ascii=False, separators=(',', ':'))
+
+
+def _mask(raw):
+    """Maskiert UTF-8-Bytes und gibt Text zurück (UnicodeDecodeError bei Binärdaten)."""
+    # Escapes (\u0070assword) kann der Vorfilter nicht erkennen
+    if b'\\u' in raw:
+        text = _mask_escaped(raw.decode('utf-8'))
+        if text is not None:
+            return text
+
+    lowered = raw.lower()
+    if _PRESCAN.search(lowered):
+        raw = _mask_bytes(raw, lowered)
+    return raw.decode('utf-8')
+
+
+def _utf8_prefix(data, limit):
+    """Höchstens `limit` Bytes, ohne ein UTF-8-Zeichen zu zerschneiden."""
+    if len(data) <= limit:
+        return data
+    end = limit
+    # Folgebytes (10xxxxxx) gehören zum vorherigen Zeichen
+    while end > 0 and limit - end < 3 and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return data[:end]
+
+
+def mask_text(text):
+    """Ersetzt die Werte aller sensiblen Schlüssel in einem (JSON-)Text."""
+    return _mask(text.encode('utf-8', 'surrogatepass'))
+
+
+def mask_payload(data, limit=DEFAULT_LIMIT):
+    """
+    Bereitet einen Body für das Log auf: kürzen, dann maskieren.
+
+    Args:
+        data: Body als bytes oder str
+        limit: Maximale Länge in Bytes, die gespeichert wird
+
+    Returns:
+        str: Maskierter (und ggf. gekürzter) Text
+
+    Raises:
+        UnicodeDecodeError: für binäre Bodies
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8', 'surrogatepass')
+
+    text = _mask(_utf8_prefix(data, limit))
+    if len(data) > limit:
+        text += TRUNCATED_SUFFIX
+    return text
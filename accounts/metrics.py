@@ -0,0 +1,498 @@
+"""
+Prometheus-Metriken über alle Gunicorn-Worker
+
+Jeder Worker sammelt seine Werte im Speicher und schreibt sie regelmäßig
+(METRICS_FLUSH_INTERVAL, im Thread des Log-Writers) als JSON-Datei nach
+METRICS_DIR/worker-<pid>.json. /metrics liest alle Dateien, addiert sie und
+gibt das Prometheus-Textformat aus; für den eigenen Prozess werden die
+aktuellen Werte aus dem Speicher verwendet.
+
+Beendete Worker (worker_exit bzw. child_exit im Master) werden in
+METRICS_DIR/dead.json übernommen, damit Counter und Histogramme bei
+Worker-Neustarts (max_requests) nicht zurückspringen. Gauges zählen nur
+für laufende Worker.
+
+Gunicorn (siehe gunicorn_config.py):
+    when_ready  -> reset_metrics_store()
+    post_fork   -> init_metrics_store()
+    worker_exit -> shutdown_metrics_store()
+    child_exit  -> mark_process_dead(pid)
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+
+try:
+    import fcntl
+except ImportError:  # Windows (Entwicklung)
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEAD_FILE = 'dead.json'
+LOCK_FILE = '.lock'
+
+_lock = threading.Lock()
+_values = {}
+_pid = os.getpid()
+_last_flush = 0.0
+# Nach shutdown_metrics_store(): Werte sind in dead.json übernommen
+_closed = False
+_registry = {}
+_collectors = []
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = _series(self.name)
+            series[key] = series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            _series(self.name)[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = _series(self.name)
+            series[key] = series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = _series(self.name)
+            # [Anzahl je Bucket..., Überlauf, Summe]
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+                    break
+            else:
+                data[len(self.buckets)] += 1
+            data[-1] += value
+
+
+def _check_fork():
+    global _pid, _values
+    if _pid != os.getpid():
+        # Geforkter Prozess: Werte des Elternprozesses nicht übernehmen
+        _pid = os.getpid()
+        _values = {}
+
+
+def _series(name):
+    _check_fork()
+    series = _values.get(name)
+    if series is None:
+        series = _values[name] = {}
+    return series
+
+
+# --- Metriken ---------------------------------------------------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    'authservice_http_requests_total', 'HTTP-Requests pro View', ('method', 'view', 'status'),
+)
+HTTP_DURATION = Histogram(
+    'authservice_http_request_duration_seconds', 'Request-Dauer pro View',
+    ('method', 'view'), LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter(
+    'authservice_db_queries_total', 'SQL-Queries pro View', ('view',),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'authservice_db_queries_per_request', 'SQL-Queries je Request', ('view',),
+    (0, 1, 2, 5, 10, 20, 50, 100),
+)
+CACHE_REQUESTS = Counter(
+    'authservice_cache_requests_total', 'Cache-Zugriffe (API-Keys, Berechtigungen)', ('cache', 'result'),
+)
+OUTBOUND_REQUESTS = Counter(
+    'authservice_outbound_requests_total', 'Aufrufe externer Dienste (E-Mail, Lexware)', ('service', 'outcome'),
+)
+OUTBOUND_DURATION = Histogram(
+    'authservice_outbound_request_duration_seconds', 'Dauer externer Aufrufe', ('service',), LATENCY_BUCKETS,
+)
+OUTBOUND_IN_FLIGHT = Gauge(
+    'authservice_outbound_in_flight', 'Laufende Aufrufe externer Dienste', ('service',),
+)
+PASSWORD_HASH_QUEUE_SECONDS = Histogram(
+    'authservice_password_hash_queue_seconds', 'Wartezeit auf einen Hashing-Thread', ('operation',),
+    LATENCY_BUCKETS,
+)
+PASSWORD_HASH_DURATION = Histogram(
+    'authservice_password_hash_duration_seconds', 'Dauer des Passwort-Hashings', ('operation',),
+    LATENCY_BUCKETS,
+)
+PASSWORD_HASH_REJECTED = Counter(
+    'authservice_password_hash_rejected_total', 'Wegen voller Hashing-Warteschlange abgelehnt (503)',
+    ('operation',),
+)
+PASSWORD_HASH_PENDING = Gauge(
+    'authservice_password_hash_pending', 'Laufende und wartende Passwort-Hashes',
+)
+API_LOG_QUEUE_DEPTH = Gauge(
+    'authservice_api_log_queue_depth', 'Wartende Einträge in der API-Log-Queue',
+)
+API_LOG_RECORDS = Counter(
+    'authservice_api_log_records_total', 'API-Log-Writer: Einträge nach Ergebnis', ('outcome',),
+)
+
+
+def record_cache(cache_name, hit):
+    """Zählt einen Cache-Treffer bzw. -Fehlschlag."""
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+@contextmanager
+def track_outbound(service):
+    """
+    Misst einen Aufruf eines externen Dienstes (auch als Dekorator nutzbar):
+
+        with track_outbound('lexware'):
+            requests.get(...)
+    """
+    OUTBOUND_IN_FLIGHT.inc(service=service)
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        OUTBOUND_IN_FLIGHT.dec(service=service)
+        OUTBOUND_DURATION.observe(time.perf_counter() - start, service=service)
+        OUTBOUND_REQUESTS.inc(service=service, outcome=outcome)
+
+
+def register_collector(collector):
+    """collector() wird vor jedem Speichern/Ausgeben aufgerufen (z.B. um Gauges zu setzen)."""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+# Zählerstände des Log-Writers beim letzten Sammeln (für die Differenz)
+_log_writer_seen = {}
+
+
+def _collect_log_writer():
+    from .log_writer import get_log_writer
+
+    stats = get_log_writer().stats()
+    API_LOG_QUEUE_DEPTH.set(stats.pop('queued'))
+    # Der Writer zählt kumuliert, der Counter bekommt nur den Zuwachs - so
+    # übernimmt dead.json die Werte beendeter Worker wie bei jedem Counter
+    for outcome, value in stats.items():
+        delta = value - _log_writer_seen.get(outcome, 0)
+        _log_writer_seen[outcome] = value
+        if delta > 0:
+            API_LOG_RECORDS.inc(delta, outcome=outcome)
+
+
+register_collector(_collect_log_writer)
+
+
+# --- Multiprozess-Store -----------------------------------------------------
+
+def is_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def get_metrics_dir():
+    return Path(getattr(settings, 'METRICS_DIR', None) or Path(tempfile.gettempdir()) / 'authservice-metrics')
+
+
+def _worker_file(pid):
+    return get_metrics_dir() / f'worker-{pid}.json'
+
+
+@contextmanager
+def _store_lock(exclusive):
+    """Sperrt das Verzeichnis, damit Leser nie einen halb übernommenen Worker sehen."""
+    directory = get_metrics_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(directory / LOCK_FILE, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _run_collectors():
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception as e:
+            logger.debug('Metrics-Collector %r fehlgeschlagen: %s', collector, e)
+
+
+def _snapshot():
+    """Werte dieses Prozesses als JSON-fähiges dict."""
+    _run_collectors()
+    with _lock:
+        _check_fork()
+        return {
+            name: [[list(key), value] for key, value in series.items()]
+            for name, series in _values.items() if series
+        }
+
+
+def _write_json(path, data):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as handle:
+        json.dump(data, handle, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning('Metrics-Datei %s nicht lesbar: %s', path, e)
+        return None
+
+
+def flush_metrics(force=True):
+    """Schreibt die Werte dieses Prozesses (force=False: nur wenn fällig)."""
+    global _last_flush
+    if not is_enabled() or _closed:
+        return
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+    now = time.monotonic()
+    if not force and now - _last_flush < interval:
+        return
+    _last_flush = now
+    _write_worker_file()
+
+
+def _write_worker_file(final=False):
+    data = {'pid': os.getpid(), 'values': _snapshot()}
+    with _store_lock(exclusive=False):
+        # Ein Flush, der vor shutdown_metrics_store() begonnen hat, schreibt nicht mehr
+        if _closed and not final:
+            return
+        _write_json(_worker_file(os.getpid()), data)
+
+
+def _merge(target, values, include_gauges=True):
+    for name, series in values.items():
+        metric = _registry.get(name)
+        if metric is None or (metric.kind == 'gauge' and not include_gauges):
+            continue
+        merged = target.setdefault(name, {})
+        for key, value in series:
+            key = tuple(key)
+            if metric.kind == 'histogram':
+                current = merged.get(key)
+                if current is None or len(current) != len(value):
+                    merged[key] = list(value)
+                else:
+                    merged[key] = [a + b for a, b in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    """
+    Summiert alle Worker.
+
+    Returns:
+        dict: {metric_name: {label_tuple: value}}
+    """
+    own_pid = os.getpid()
+    merged = {}
+    with _store_lock(exclusive=False):
+        dead = _read_json(get_metrics_dir() / DEAD_FILE)
+        if dead:
+            _merge(merged, dead['values'], include_gauges=False)
+        for path in get_metrics_dir().glob('worker-*.json'):
+            data = _read_json(path)
+            if not data or data['pid'] == own_pid:
+                continue
+            # Abgestürzte Worker (noch nicht übernommen): Gauges sind veraltet
+            _merge(merged, data['values'], include_gauges=_pid_alive(data['pid']))
+    _merge(merged, _snapshot())
+    return merged
+
+
+def mark_process_dead(pid):
+    """Übernimmt die Datei eines beendeten Workers in dead.json (ohne Gauges)."""
+    path = _worker_file(pid)
+    if not path.exists():
+        return
+    with _store_lock(exclusive=True):
+        data = _read_json(path)
+        if data is not None:
+            dead_path = get_metrics_dir() / DEAD_FILE
+            totals = {}
+            dead = _read_json(dead_path)
+            if dead:
+                _merge(totals, dead['values'], include_gauges=False)
+            _merge(totals, data['values'], include_gauges=False)
+            _write_json(dead_path, {'pid': None, 'values': {
+                name: [[list(key), value] for key, value in series.items()]
+                for name, series in totals.items()
+            }})
+        path.unlink(missing_ok=True)
+
+
+def reset_metrics_store():
+    """Beim Start des Masters: Dateien eines früheren Laufs entfernen."""
+    directory = get_metrics_dir()
+    if not directory.exists():
+        return
+    for path in directory.glob('*.json'):
+        path.unlink(missing_ok=True)
+
+
+def init_metrics_store():
+    """Nach dem Fork eines Workers: eigener, leerer Zustand."""
+    global _pid, _values, _last_flush, _closed
+    with _lock:
+        _pid = os.getpid()
+        _values = {}
+    _last_flush = 0.0
+    _closed = False
+    get_metrics_dir().mkdir(parents=True, exist_ok=True)
+    from .log_writer import get_log_writer
+    get_log_writer().add_flush_hook(flush_metrics)
+
+
+def shutdown_metrics_store():
+    """
+    Beim Beenden eines Workers: letzte Werte schreiben und übernehmen.
+    Spätere Flushes (z.B. der atexit-Shutdown des Log-Writers) schreiben
+    keine Datei mehr, sonst übernähme child_exit die Werte ein zweites Mal.
+    """
+    global _closed
+    if not is_enabled() or _closed:
+        return
+    _closed = True
+    _write_worker_file(final=True)
+    mark_process_dead(os.getpid())
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+def render(values=None):
+    """Prometheus-Textformat (Version 0.0.4)."""
+    values = collect() if values is None else values
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(values.get(name, {}).items()):
+            if metric.kind != 'histogram':
+                lines.append(f'{name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                cumulative += count
+                labels = _format_labels(metric.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f'{name}_bucket{labels} {cumulative}')
+            labels = _format_labels(metric.labelnames, key)
+            lines.append(f'{name}_sum{labels} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{labels} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics - Prometheus-Scrape-Endpoint.
+
+    Ist METRICS_TOKEN gesetzt, muss er als Bearer-Token gesendet werden;
+    ohne Token ist der Endpoint nur mit DEBUG=True erreichbar.
+    """
+    if not is_enabled():
+        return HttpResponseNotFound()
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        import hmac
+        given = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(given.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        return HttpResponseNotFound()
+
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,120 @@
+"""
+MFA-Challenges für den zweistufigen Login
+
+Ist MFA aktiv, gibt LoginView statt der Tokens einen temp_token aus, der
+zusammen mit dem Code an /api/accounts/mfa/verify/ geht. Die Challenge liegt
+im gemeinsamen Django-Cache (Redis in Produktion) und ist damit in allen
+Gunicorn-Workern bekannt; sie läuft über die Cache-TTL ab
+(MFA_CHALLENGE_TTL). Schlüssel ist der SHA-256 des Tokens, der Klartext
+wird nicht gespeichert.
+
+Jede Operation ist ein einzelner Cache-Zugriff (set/get/incr/delete).
+Eingelöst wird über cache.delete(): Nur der Aufruf, der den Eintrag
+tatsächlich löscht, erhält die Challenge - ein temp_token gilt also auch
+bei parallelen Requests genau einmal. Nach MFA_CHALLENGE_MAX_ATTEMPTS
+falschen Codes wird die Challenge verworfen.
+"""
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+CHALLENGE_KEY = 'mfa:challenge:{digest}'
+ATTEMPTS_KEY = 'mfa:challenge:{digest}:attempts'
+
+
+def get_challenge_ttl():
+    """Gültigkeit eines temp_token in Sekunden."""
+    return getattr(settings, 'MFA_CHALLENGE_TTL', 300)
+
+
+def get_max_attempts():
+    """Erlaubte Fehlversuche pro temp_token."""
+    return getattr(settings, 'MFA_CHALLENGE_MAX_ATTEMPTS', 5)
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_challenge(user, website=None):
+    """
+    Legt eine Challenge für einen Benutzer an, dessen Passwort geprüft ist.
+
+    Args:
+        user: User instance
+        website: Website des Logins (optional) - der Code muss dann mit
+            dem API-Key derselben Website eingelöst werden
+
+    Returns:
+        str: temp_token
+    """
+    token = secrets.token_urlsafe(32)
+    cache.set(
+        CHALLENGE_KEY.format(digest=_digest(token)),
+        {
+            'user_id': str(user.pk),
+            'website_id': str(website.pk) if website else None,
+        },
+        get_challenge_ttl()
+    )
+    return token
+
+
+def get_challenge(token):
+    """
+    Challenge zu einem temp_token, ohne sie einzulösen.
+
+    Returns:
+        dict ('user_id', 'website_id') oder None, wenn der Token unbekannt,
+        abgelaufen oder bereits verwendet ist
+    """
+    if not isinstance(token, str) or not token:
+        return None
+    return cache.get(CHALLENGE_KEY.format(digest=_digest(token)))
+
+
+def record_failed_attempt(token):
+    """
+    Zählt einen falschen Code. Beim letzten erlaubten Versuch wird die
+    Challenge verworfen.
+
+    Returns:
+        int: verbleibende Versuche (0 = Challenge verworfen)
+    """
+    digest = _digest(token)
+    attempts_key = ATTEMPTS_KEY.format(digest=digest)
+    max_attempts = get_max_attempts()
+
+    cache.add(attempts_key, 0, get_challenge_ttl())
+    try:
+        attempts = cache.incr(attempts_key)
+    except ValueError:
+        # Zähler gerade abgelaufen - dann ist es die Challenge auch
+        attempts = max_attempts
+
+    if attempts >= max_attempts:
+        cache.delete_many([CHALLENGE_KEY.format(digest=digest), attempts_key])
+        return 0
+    return max_attempts - attempts
+
+
+def consume_challenge(token):
+    """
+    Löst eine Challenge ein (atomar, höchstens einmal).
+
+    Returns:
+        dict ('user_id', 'website_id') oder None, wenn der Token unbekannt,
+        abgelaufen oder von einem parallelen Request bereits eingelöst ist
+    """
+    challenge = get_challenge(token)
+    if challenge is None:
+        return None
+
+    digest = _digest(token)
+    if not cache.delete(CHALLENGE_KEY.format(digest=digest)):
+        return None
+    cache.delete(ATTEMPTS_KEY.format(digest=digest))
+    return challenge
@@ -3,12 +3,14 @@ MFA (Multi-Factor Authentication) Views
 Handles TOTP-based two-factor authentication setup and verification.
 """
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
+from .authentication import READ_AUTHENTICATION_CLASSES
 from .permissions import HasValidAPIKeyOrIsAuthenticated
+from .ratelimit import MFARateThrottle
 from django.conf import settings
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
@@ -17,6 +19,8 @@ import qrcode.image.svg
 import io
 import base64
 
+from .api_keys import resolve_api_key
+from .mfa_challenges import consume_challenge, get_challenge, record_failed_attempt
 from .models import MFADevice
 
 
@@ -118,6 +122,7 @@ class VerifyMFASetupView(APIView):
     This activates MFA for the user.
     """
     permission_classes = [HasValidAPIKeyOrIsAuthenticated]
+    throttle_classes = [MFARateThrottle]
     
     def post(self, request):
         user = request.user
@@ -190,6 +195,7 @@ class DisableMFAView(APIView):
     Requires password confirmation and MFA token for security.
     """
     permission_classes = [HasValidAPIKeyOrIsAuthenticated]
+    throttle_classes = [MFARateThrottle]
     
     def post(self, request):
         user = request.user
@@ -284,6 +290,7 @@ class RegenerateBackupCodesView(APIView):
 
 
 @api_view(['GET'])
+@authentication_classes(READ_AUTHENTICATION_CLASSES)
 @permission_classes([HasValidAPIKeyOrIsAuthenticated])
 def get_mfa_status(request):
     """
@@ -310,12 +317,19 @@ def get_mfa_status(request):
 
 @api_view(['POST'])
 @permission_classes([HasValidAPIKeyOrIsAuthenticated])
+@throttle_classes([MFARateThrottle])
 def verify_mfa_token(request):
     """
-    Verify an MFA token without changing any state.
-    Useful for testing or re-authentication.
+    Verify an MFA token.
+    
+    With 'temp_token' (from LoginView when MFA is required) this completes the
+    login: the challenge is consumed and the regular login response with JWT
+    tokens is returned. The challenge must be redeemed with the API key of the
+    website it was issued for.
+    
+    Without 'temp_token' the token is only verified for the authenticated user
+    (useful for testing or re-authentication).
     """
-    user = request.user
     token = request.data.get('token')
     
     if not token:
@@ -323,6 +337,16 @@ def verify_mfa_token(request):
             'error': 'Token is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    temp_token = request.data.get('temp_token')
+    if temp_token:
+        return _complete_mfa_challenge(request, temp_token, token)
+    
+    user = request.user
+    if not user.is_authenticated:
+        return Response({
+            'error': 'Authentication or temp_token is required'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
     try:
         mfa_device = MFADevice.objects.get(user=user, is_active=True)
     except MFADevice.DoesNotExist:
@@ -344,3 +368,47 @@ def verify_mfa_token(request):
             'valid': False,
             'message': 'Invalid token'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _complete_mfa_challenge(request, temp_token, token):
+    """
+    Second login step: redeem a challenge issued by LoginView.
+    """
+    from .views import complete_login
+    
+    challenge = get_challenge(temp_token)
+    website, _ = resolve_api_key(request)
+    website_id = str(website.id) if website else None
+    
+    if challenge is None or challenge['website_id'] != website_id:
+        return Response({
+            'error': 'Invalid or expired temp_token'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    try:
+        mfa_device = MFADevice.objects.select_related('user').get(
+            user_id=challenge['user_id'],
+            is_active=True,
+            user__is_active=True
+        )
+    except MFADevice.DoesNotExist:
+        return Response({
+            'error': 'Invalid or expired temp_token'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    if not mfa_device.verify_token(str(token)):
+        remaining_attempts = record_failed_attempt(temp_token)
+        return Response({
+            'error': 'Invalid MFA token',
+            'remaining_attempts': remaining_attempts
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    # Nur der erste von parallelen Requests löst die Challenge ein
+    if consume_challenge(temp_token) is None:
+        return Response({
+            'error': 'Invalid or expired temp_token'
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    
+    if website is not None:
+        request.website = website
+    return complete_login(request, mfa_device.user)
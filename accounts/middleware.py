@@ -11,6 +11,11 @@ from django.http import JsonResponse
 from django.conf import settings
 from rest_framework.exceptions import APIException
 from .models import APIRequestLog
+from .log_policy import get_log_policy
+from .masking import DEFAULT_LIMIT as BODY_CAPTURE_LIMIT, mask_payload, mask_text
+from .log_writer import get_log_writer
+from .rollups import get_rollup_aggregator
+from . import instrumentation, ratelimit
 
 User = get_user_model()
 
@@ -45,6 +50,28 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
         if hasattr(request, '_start_time'):
             duration = time.time() - request._start_time
         
+        # Queries und Phasen bis hierher (siehe RequestInstrumentationMiddleware)
+        timings = instrumentation.current()
+        
+        # Rollups zählen jeden Request, unabhängig von Sampling und Policy
+        try:
+            aggregator = get_rollup_aggregator()
+            if aggregator is not None:
+                aggregator.record(
+                    request.method, request.path, response.status_code,
+                    duration, getattr(request, '_start_time', None), timings
+                )
+                get_log_writer().tick()
+        except Exception as e:
+            print(f"Error recording API rollup: {e}")
+        
+        # Policy prüfen, bevor Bodies gelesen werden (siehe API_LOG_POLICIES)
+        decision = get_log_policy().decide(
+            request.method, request.path, response.status_code, duration
+        )
+        if decision is None:
+            return response
+        
         # User ermitteln
         user = None
         if hasattr(request, 'user') and request.user.is_authenticated:
@@ -53,28 +80,20 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
         # IP-Adresse ermitteln (auch hinter Proxy)
         ip_address = self.get_client_ip(request)
         
-        # Request Body auslesen (max 10000 Zeichen)
+        # Request Body auslesen (max 10000 Zeichen, Passwörter maskiert)
         request_body = None
-        if request.method in ['POST', 'PUT', 'PATCH']:
+        if decision.capture_bodies and request.method in ['POST', 'PUT', 'PATCH']:
             try:
                 if hasattr(request, 'body'):
-                    body_unicode = request.body.decode('utf-8')
-                    # Passwörter maskieren
-                    request_body = self.mask_sensitive_data(body_unicode)
-                    if len(request_body) > 10000:
-                        request_body = request_body[:10000] + '... (truncated)'
+                    request_body = mask_payload(request.body, BODY_CAPTURE_LIMIT)
             except Exception:
                 request_body = '[Binary or unreadable data]'
         
-        # Response Body auslesen (max 10000 Zeichen)
+        # Response Body auslesen (max 10000 Zeichen, Tokens maskiert)
         response_body = None
         try:
-            if hasattr(response, 'content'):
-                content = response.content.decode('utf-8')
-                # Tokens maskieren
-                response_body = self.mask_sensitive_data(content)
-                if len(response_body) > 10000:
-                    response_body = response_body[:10000] + '... (truncated)'
+            if decision.capture_bodies and hasattr(response, 'content'):
+                response_body = mask_payload(response.content, BODY_CAPTURE_LIMIT)
         except Exception:
             response_body = '[Binary or unreadable data]'
         
@@ -82,7 +101,7 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
         query_params = dict(request.GET) if request.GET else None
         
         # Headers (ohne sensible Daten)
-        headers = self.get_safe_headers(request)
+        headers = self.get_safe_headers(request) if decision.capture_headers else None
         
         # Log in Datenbank speichern
         try:
@@ -92,7 +111,8 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
             
             request._logging_in_progress = True
             
-            APIRequestLog.objects.create(
+            # Nicht im Request schreiben - der Writer speichert gesammelt im Hintergrund
+            get_log_writer().submit(APIRequestLog(
                 user=user,
                 method=request.method,
                 path=request.path,
@@ -102,10 +122,13 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
                 status_code=response.status_code,
                 ip_address=ip_address,
                 user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                headers=json.dumps(headers),
+                headers=json.dumps(headers) if headers is not None else None,
                 duration=duration,
+                query_count=timings.query_count if timings else None,
+                db_duration=timings.db_duration if timings else None,
+                timings=timings.as_dict() if timings else None,
                 referer=request.META.get('HTTP_REFERER', '')[:500]
-            )
+            ))
         except Exception as e:
             # Fehler beim Logging nicht durchreichen
             pass
@@ -129,37 +152,9 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
     def mask_sensitive_data(self, text):
         """
         Maskiert sensible Daten wie Passwörter und Tokens
+        (siehe accounts/masking.py)
         """
-        try:
-            data = json.loads(text)
-            
-            # Felder die maskiert werden sollen
-            sensitive_fields = [
-                'password', 'password2', 'password_confirm',
-                'old_password', 'new_password', 'new_password2', 'new_password_confirm',
-                'access', 'refresh', 'token', 'access_token', 'refresh_token',
-                'api_key', 'api_secret', 'client_secret',
-                'authorization'
-            ]
-            
-            def mask_dict(d):
-                if isinstance(d, dict):
-                    for key, value in d.items():
-                        if key.lower() in sensitive_fields:
-                            d[key] = '***MASKED***'
-                        elif isinstance(value, dict):
-                            mask_dict(value)
-                        elif isinstance(value, list):
-                            for item in value:
-                                if isinstance(item, dict):
-                                    mask_dict(item)
-                return d
-            
-            masked_data = mask_dict(data)
-            return json.dumps(masked_data, ensure_ascii=False, indent=2)
-        except (json.JSONDecodeError, TypeError):
-            # Kein JSON, Text zurückgeben
-            return text
+        return mask_text(text)
     
     def get_safe_headers(self, request):
         """
@@ -201,6 +196,81 @@ class APIRequestLoggingMiddleware(MiddlewareMixin):
         return safe_headers
 
 
+class RequestInstrumentationMiddleware:
+    """
+    Misst SQL-Queries, DB-Zeit und Phasen jedes Requests (siehe
+    accounts/instrumentation.py) und setzt für API-Requests den
+    Server-Timing Header. Steht an erster Stelle in settings.MIDDLEWARE,
+    damit alle übrigen Middlewares mitgemessen werden.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with instrumentation.instrument() as timings:
+            response = self.get_response(request)
+            if request.path.startswith('/api/') and instrumentation.server_timing_enabled():
+                response['Server-Timing'] = timings.server_timing()
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Zählt Requests, Dauer und SQL-Queries pro View für /metrics
+    (siehe accounts/metrics.py). Steht in settings.MIDDLEWARE direkt nach
+    RequestInstrumentationMiddleware und vor allen übrigen Middlewares.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        from . import metrics
+        self.metrics = metrics
+        if metrics.is_enabled():
+            get_log_writer().add_flush_hook(metrics.flush_metrics)
+    
+    def __call__(self, request):
+        if not self.metrics.is_enabled() or request.path.startswith(settings.STATIC_URL or '/static/'):
+            return self.get_response(request)
+        
+        start = time.perf_counter()
+        with instrumentation.instrument() as timings:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        metrics = self.metrics
+        metrics.HTTP_REQUESTS.inc(method=request.method, view=view, status=response.status_code)
+        metrics.HTTP_DURATION.observe(duration, method=request.method, view=view)
+        metrics.DB_QUERIES.inc(timings.query_count, view=view)
+        metrics.DB_QUERIES_PER_REQUEST.observe(timings.query_count, view=view)
+        
+        # Hält den Hintergrund-Thread am Laufen, der die Werte regelmäßig speichert
+        get_log_writer().tick()
+        return response
+
+
+class RateLimitMiddleware:
+    """
+    Setzt die RateLimit-* Header für Endpunkte mit Rate Limiting
+    (siehe accounts/ratelimit.py).
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        response = self.get_response(request)
+        decision = ratelimit.get_decision(request)
+        if decision is not None:
+            response['RateLimit-Limit'] = str(decision.limit.capacity)
+            response['RateLimit-Remaining'] = str(decision.remaining)
+            response['RateLimit-Reset'] = str(decision.reset)
+            response['RateLimit-Policy'] = f'{decision.limit.capacity};w={decision.limit.period}'
+        return response
+
+
 class APIExceptionHandlerMiddleware(MiddlewareMixin):
     """
     Middleware zum Abfangen aller Exceptions und Zurückgeben von JSON-Fehlern
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_website_require_website_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='website',
+            name='embed_permission_claims',
+            field=models.BooleanField(default=False, help_text='Bettet die effektiven Berechtigungen (Bitmap + Version) in den JWT Access Token ein, damit die Website ohne Rückfrage lokal autorisieren kann.', verbose_name='Berechtigungen im Access Token'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_website_embed_permission_claims'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apirequestlog',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Zeitstempel'),
+        ),
+    ]
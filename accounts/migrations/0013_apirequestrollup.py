@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_alter_apirequestlog_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIRequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(db_index=True, verbose_name='Minute')),
+                ('method', models.CharField(max_length=10, verbose_name='HTTP Methode')),
+                ('endpoint', models.CharField(max_length=255, verbose_name='Endpoint')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Requests')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Fehler (4xx/5xx)')),
+                ('server_error_count', models.PositiveIntegerField(default=0, verbose_name='Serverfehler (5xx)')),
+                ('duration_sum', models.FloatField(default=0, verbose_name='Summe Dauer (ms)')),
+                ('duration_max', models.FloatField(default=0, verbose_name='Max. Dauer (ms)')),
+                ('histogram', models.JSONField(default=list, verbose_name='Latenz-Histogramm')),
+            ],
+            options={
+                'verbose_name': 'API Request Rollup',
+                'verbose_name_plural': 'API Request Rollups',
+                'ordering': ['-bucket'],
+                'unique_together': {('bucket', 'method', 'endpoint')},
+            },
+        ),
+    ]
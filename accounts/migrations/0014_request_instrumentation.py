@@ -0,0 +1,53 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_apirequestrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apirequestlog',
+            name='db_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='DB-Zeit (Sekunden)'),
+        ),
+        migrations.AddField(
+            model_name='apirequestlog',
+            name='query_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='SQL-Queries'),
+        ),
+        migrations.AddField(
+            model_name='apirequestlog',
+            name='timings',
+            field=models.JSONField(blank=True, null=True, verbose_name='Phasen (Sekunden)'),
+        ),
+        migrations.AddField(
+            model_name='apirequestrollup',
+            name='auth_duration_sum',
+            field=models.FloatField(default=0, verbose_name='Summe Authentifizierung (ms)'),
+        ),
+        migrations.AddField(
+            model_name='apirequestrollup',
+            name='db_duration_sum',
+            field=models.FloatField(default=0, verbose_name='Summe DB-Zeit (ms)'),
+        ),
+        migrations.AddField(
+            model_name='apirequestrollup',
+            name='permission_duration_sum',
+            field=models.FloatField(default=0, verbose_name='Summe Berechtigungen (ms)'),
+        ),
+        migrations.AddField(
+            model_name='apirequestrollup',
+            name='query_count_sum',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Summe SQL-Queries'),
+        ),
+        migrations.AddField(
+            model_name='apirequestrollup',
+            name='serialization_duration_sum',
+            field=models.FloatField(default=0, verbose_name='Summe Serialisierung (ms)'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_request_instrumentation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JWTSigningKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kid', models.CharField(help_text='RFC 7638 Thumbprint des öffentlichen Schlüssels', max_length=64, unique=True, verbose_name='Key ID')),
+                ('algorithm', models.CharField(choices=[('RS256', 'RS256 (RSA)'), ('EdDSA', 'EdDSA (Ed25519)')], max_length=10, verbose_name='Algorithmus')),
+                ('private_key', models.TextField(verbose_name='Privater Schlüssel (PEM)')),
+                ('public_key', models.TextField(verbose_name='Öffentlicher Schlüssel (PEM)')),
+                ('status', models.CharField(choices=[('pending', 'Veröffentlicht (noch nicht aktiv)'), ('active', 'Aktiv (signiert neue Tokens)'), ('retired', 'Ausgemustert (nur noch Prüfung)')], db_index=True, default='pending', max_length=10, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Veröffentlicht')),
+                ('activated_at', models.DateTimeField(blank=True, null=True, verbose_name='Aktiviert')),
+                ('retired_at', models.DateTimeField(blank=True, null=True, verbose_name='Ausgemustert')),
+            ],
+            options={
+                'verbose_name': 'JWT Signing Key',
+                'verbose_name_plural': 'JWT Signing Keys',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
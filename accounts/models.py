@@ -1,13 +1,36 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+import time
 import uuid
 import secrets
 import pyotp
 import json
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    """QuerySet für User: update() verwirft die betroffenen Benutzer im Benutzer-Cache."""
+    
+    def update(self, **kwargs):
+        from .user_cache import IGNORED_FIELDS, invalidate
+        
+        # update() löst kein post_save aus (siehe accounts/signals.py)
+        if set(kwargs) <= IGNORED_FIELDS:
+            return super().update(**kwargs)
+        
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        if updated:
+            def invalidate_users():
+                for user_id in user_ids:
+                    invalidate(user_id)
+            transaction.on_commit(invalidate_users)
+        return updated
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """Custom user manager for email-based authentication."""
     
     def create_user(self, email, password=None, **extra_fields):
@@ -118,6 +141,21 @@ class User(AbstractBaseUser, PermissionsMixin):
         """Return the short name."""
         return self.first_name or self.username
     
+    def check_password(self, raw_password):
+        """
+        Return whether raw_password is correct.
+        
+        Unlike AbstractBaseUser.check_password, an outdated hash (different
+        algorithm or work factor) is re-hashed in the background instead of
+        during the request (see accounts/hashers.py).
+        """
+        from .hashers import schedule_hash_upgrade
+        
+        def setter(raw_password):
+            schedule_hash_upgrade(self, raw_password)
+        
+        return check_password(raw_password, self.password, setter)
+    
     def has_website_access(self, website):
         """Check if user has access to a specific website."""
         if self.is_superuser:
@@ -229,6 +267,11 @@ class Website(models.Model):
         verbose_name='Website-Zugriff erforderlich',
         help_text='Wenn aktiv, können sich nur Benutzer mit expliziter Berechtigung anmelden. Wenn deaktiviert, kann sich jeder anmelden.'
     )
+    embed_permission_claims = models.BooleanField(
+        default=False,
+        verbose_name='Berechtigungen im Access Token',
+        help_text='Bettet die effektiven Berechtigungen (Bitmap + Version) in den JWT Access Token ein, damit die Website ohne Rückfrage lokal autorisieren kann.'
+    )
     
     # Required Registration Fields
     require_first_name = models.BooleanField(default=False, verbose_name='Vorname erforderlich')
@@ -272,11 +315,31 @@ class Website(models.Model):
         self.save()
 
 
+class UserSessionQuerySet(models.QuerySet):
+    """QuerySet für UserSession: Deaktivieren per update() beendet den verzögerten Pfad von touch()."""
+    
+    def update(self, **kwargs):
+        if kwargs.get('is_active') is not False:
+            return super().update(**kwargs)
+        
+        pairs = set(self.values_list('user_id', 'website_id'))
+        updated = super().update(**kwargs)
+        if updated:
+            def invalidate_synced():
+                for user_id, website_id in pairs:
+                    UserSession.invalidate_synced(user_id, website_id)
+            transaction.on_commit(invalidate_synced)
+        return updated
+
+
 class UserSession(models.Model):
     """
     Tracks user sessions across different websites.
     """
     
+    # Version der Sitzungen eines Benutzers pro Website im gemeinsamen Cache, siehe touch()
+    SYNC_VERSION_KEY = 'user_session:version:{user_id}:{website_id}'
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessions')
     website = models.ForeignKey(Website, on_delete=models.CASCADE, related_name='sessions')
@@ -292,6 +355,8 @@ class UserSession(models.Model):
     
     is_active = models.BooleanField(default=True, verbose_name='Aktiv')
     
+    objects = UserSessionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Benutzersitzung'
         verbose_name_plural = 'Benutzersitzungen'
@@ -306,6 +371,58 @@ class UserSession(models.Model):
     def is_expired(self):
         """Check if session is expired."""
         return timezone.now() > self.expires_at
+    
+    @classmethod
+    def touch(cls, user, website, ip_address, user_agent, expires_at):
+        """
+        Verlängert die Sitzung eines Benutzers für eine Website oder legt sie an.
+        
+        Ein UPDATE statt update_or_create() (SELECT FOR UPDATE + UPDATE in
+        einem Savepoint); kommt auch mit mehreren Sitzungen pro Benutzer und
+        Website zurecht, die ältere SSO-Logins angelegt haben.
+        
+        Hat dieser Prozess die Sitzung gerade erst mit derselben IP und
+        demselben User Agent geschrieben, werden nur last_activity und
+        expires_at verzögert nachgezogen (accounts/coalescer.py). Wurde die
+        Sitzung seitdem anderweitig gespeichert, deaktiviert oder gelöscht
+        (SYNC_VERSION_KEY, accounts/signals.py), wird wieder sofort
+        geschrieben und damit auch is_active wiederhergestellt.
+        """
+        from .coalescer import get_coalescer
+        
+        coalescer = get_coalescer()
+        lookup = {'user_id': user.pk, 'website_id': website.pk}
+        version = cache.get(cls.SYNC_VERSION_KEY.format(user_id=user.pk, website_id=website.pk))
+        fingerprint = (ip_address, user_agent, version)
+        if coalescer.synced(cls, lookup, fingerprint):
+            coalescer.defer(cls, lookup, expires_at=expires_at, last_activity=timezone.now())
+            return
+        
+        updated = cls.objects.filter(user=user, website=website).update(
+            ip_address=ip_address,
+            user_agent=user_agent,
+            expires_at=expires_at,
+            last_activity=timezone.now(),
+            is_active=True,
+        )
+        if not updated:
+            cls.objects.create(
+                user=user,
+                website=website,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                expires_at=expires_at,
+            )
+        coalescer.mark_synced(cls, lookup, fingerprint)
+    
+    @classmethod
+    def invalidate_synced(cls, user_id, website_id):
+        """Nächstes touch() dieser Sitzungen schreibt in allen Prozessen wieder sofort."""
+        key = cls.SYNC_VERSION_KEY.format(user_id=user_id, website_id=website_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
 
 
 class SocialAccount(models.Model):
@@ -419,6 +536,27 @@ class SSOToken(models.Model):
         self.used_at = timezone.now()
         self.save(update_fields=['is_used', 'used_at'])
     
+    def consume(self):
+        """
+        Mark token as used if it is still valid.
+        
+        Single conditional UPDATE, so concurrent requests cannot exchange
+        the same token twice.
+        
+        Returns:
+            bool: True if this call used the token
+        """
+        now = timezone.now()
+        consumed = SSOToken.objects.filter(
+            pk=self.pk,
+            is_used=False,
+            expires_at__gt=now
+        ).update(is_used=True, used_at=now)
+        if consumed:
+            self.is_used = True
+            self.used_at = now
+        return bool(consumed)
+    
     @staticmethod
     def generate_token():
         """Generate a secure random SSO token."""
@@ -468,8 +606,9 @@ class MFADevice(models.Model):
         # Try TOTP verification first
         totp = self.get_totp()
         if totp.verify(token, valid_window=1):  # Allow 1 time step tolerance
-            self.last_used = timezone.now()
-            self.save(update_fields=['last_used'])
+            # Nur ein Zeitstempel: verzögert und gebündelt schreiben
+            from .coalescer import touch
+            touch(self, 'last_used')
             return True
         
         # Try backup codes if TOTP failed
@@ -589,7 +728,12 @@ class APIRequestLog(models.Model):
     
     # Metadata
     duration = models.FloatField(null=True, blank=True, verbose_name='Dauer (Sekunden)')
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Zeitstempel', db_index=True)
+    # Instrumentierung (siehe accounts/instrumentation.py)
+    query_count = models.PositiveIntegerField(null=True, blank=True, verbose_name='SQL-Queries')
+    db_duration = models.FloatField(null=True, blank=True, verbose_name='DB-Zeit (Sekunden)')
+    timings = models.JSONField(null=True, blank=True, verbose_name='Phasen (Sekunden)')
+    # Zeitpunkt des Requests (nicht des - asynchronen - Speicherns)
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name='Zeitstempel', db_index=True)
     
     class Meta:
         verbose_name = 'API Request Log'
@@ -618,3 +762,77 @@ class APIRequestLog(models.Model):
     def is_success(self):
         """Check if request was successful."""
         return 200 <= self.status_code < 300
+
+
+class APIRequestRollup(models.Model):
+    """
+    Aggregierte API-Requests pro Minute, Methode und normalisiertem Endpoint
+    (siehe accounts/rollups.py)
+    """
+    
+    bucket = models.DateTimeField(verbose_name='Minute', db_index=True)
+    method = models.CharField(max_length=10, verbose_name='HTTP Methode')
+    endpoint = models.CharField(max_length=255, verbose_name='Endpoint')
+    
+    count = models.PositiveIntegerField(default=0, verbose_name='Requests')
+    error_count = models.PositiveIntegerField(default=0, verbose_name='Fehler (4xx/5xx)')
+    server_error_count = models.PositiveIntegerField(default=0, verbose_name='Serverfehler (5xx)')
+    
+    # Dauer in Millisekunden
+    duration_sum = models.FloatField(default=0, verbose_name='Summe Dauer (ms)')
+    duration_max = models.FloatField(default=0, verbose_name='Max. Dauer (ms)')
+    # Instrumentierung (Summen, Zeiten in Millisekunden)
+    query_count_sum = models.PositiveBigIntegerField(default=0, verbose_name='Summe SQL-Queries')
+    db_duration_sum = models.FloatField(default=0, verbose_name='Summe DB-Zeit (ms)')
+    auth_duration_sum = models.FloatField(default=0, verbose_name='Summe Authentifizierung (ms)')
+    permission_duration_sum = models.FloatField(default=0, verbose_name='Summe Berechtigungen (ms)')
+    serialization_duration_sum = models.FloatField(default=0, verbose_name='Summe Serialisierung (ms)')
+    # Anzahl Requests je Latenz-Bucket (rollups.LATENCY_BUCKETS_MS + Überlauf)
+    histogram = models.JSONField(default=list, verbose_name='Latenz-Histogramm')
+    
+    class Meta:
+        verbose_name = 'API Request Rollup'
+        verbose_name_plural = 'API Request Rollups'
+        ordering = ['-bucket']
+        unique_together = ['bucket', 'method', 'endpoint']
+    
+    def __str__(self):
+        return f"{self.bucket:%Y-%m-%d %H:%M} {self.method} {self.endpoint} ({self.count})"
+
+
+class JWTSigningKey(models.Model):
+    """
+    Asymmetric key pair for signing JWTs (see accounts/jwt_keys.py).
+    Public keys are published under /.well-known/jwks.json.
+    """
+    ALGORITHM_CHOICES = [
+        ('RS256', 'RS256 (RSA)'),
+        ('EdDSA', 'EdDSA (Ed25519)'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_ACTIVE = 'active'
+    STATUS_RETIRED = 'retired'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Veröffentlicht (noch nicht aktiv)'),
+        (STATUS_ACTIVE, 'Aktiv (signiert neue Tokens)'),
+        (STATUS_RETIRED, 'Ausgemustert (nur noch Prüfung)'),
+    ]
+    
+    kid = models.CharField(max_length=64, unique=True, verbose_name='Key ID',
+                           help_text='RFC 7638 Thumbprint des öffentlichen Schlüssels')
+    algorithm = models.CharField(max_length=10, choices=ALGORITHM_CHOICES, verbose_name='Algorithmus')
+    private_key = models.TextField(verbose_name='Privater Schlüssel (PEM)')
+    public_key = models.TextField(verbose_name='Öffentlicher Schlüssel (PEM)')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING,
+                              db_index=True, verbose_name='Status')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Veröffentlicht')
+    activated_at = models.DateTimeField(null=True, blank=True, verbose_name='Aktiviert')
+    retired_at = models.DateTimeField(null=True, blank=True, verbose_name='Ausgemustert')
+    
+    class Meta:
+        verbose_name = 'JWT Signing Key'
+        verbose_name_plural = 'JWT Signing Keys'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.kid} ({self.algorithm}, {self.get_status_display()})"
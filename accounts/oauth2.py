@@ -0,0 +1,95 @@
+"""
+Gecachte Prüfung von OAuth2 Access Tokens
+
+OAuth2Authentication (django-oauth-toolkit) lädt für jeden Request mit
+OAuth2 Bearer Token die AccessToken-Zeile samt Application und Benutzer.
+CachedOAuth2Validator (OAUTH2_PROVIDER['OAUTH2_VALIDATOR_CLASS']) legt das
+Ergebnis bis zum Ablauf des Tokens im gemeinsamen Django-Cache ab
+(Schlüssel: SHA-256 des Tokens; Inhalt: Token-ID, Benutzer-ID, Scopes,
+Ablauf, Application-ID und client_id - kein client_secret). Die Application
+wird daraus als Instanz mit nachladbaren Feldern wiederhergestellt, den
+Benutzer liefert accounts/user_cache.py.
+
+Widerruf, Refresh-Token-Rotation (der alte Access Token wird gelöscht),
+jede Änderung an einem AccessToken und Änderungen oder das Löschen seiner
+Application entfernen den Eintrag per Signal (accounts/signals.py). Scopes und Ablauf prüft oauthlib wie bisher über
+AccessToken.is_valid().
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+from oauth2_provider.oauth2_validators import OAuth2Validator
+
+from . import user_cache
+from .metrics import record_cache
+
+
+CACHE_KEY = 'oauth2:access_token:{digest}'
+
+
+def cache_key(token):
+    return CACHE_KEY.format(digest=hashlib.sha256(token.encode('utf-8')).hexdigest())
+
+
+def invalidate(token):
+    """Entfernt einen Access Token aus dem Cache."""
+    cache.delete(cache_key(token))
+
+
+def invalidate_many(tokens):
+    """Entfernt mehrere Access Tokens aus dem Cache."""
+    cache.delete_many([cache_key(token) for token in tokens])
+
+
+class CachedOAuth2Validator(OAuth2Validator):
+    """OAuth2Validator, der Access Tokens bis zu ihrem Ablauf cacht."""
+
+    def _load_access_token(self, token):
+        key = cache_key(token)
+        entry = cache.get(key)
+        if entry is not None:
+            record_cache('oauth2_token', True)
+            return self._restore(token, entry)
+
+        record_cache('oauth2_token', False)
+        access_token = super()._load_access_token(token)
+        if access_token is None:
+            return None
+
+        timeout = int((access_token.expires - timezone.now()).total_seconds())
+        if timeout > 0:
+            application = access_token.application
+            cache.set(key, {
+                'id': access_token.pk,
+                'user_id': access_token.user_id,
+                'application_id': access_token.application_id,
+                'client_id': application.client_id if application is not None else None,
+                'scope': access_token.scope,
+                'expires': access_token.expires,
+            }, timeout)
+            user_cache.prime(access_token.user)
+        return access_token
+
+    def _restore(self, token, entry):
+        access_token = get_access_token_model()(
+            pk=entry['id'],
+            token=token,
+            scope=entry['scope'],
+            expires=entry['expires'],
+        )
+        if entry['application_id'] is not None:
+            # Nur ID und client_id geladen, weitere Felder lädt Django bei Zugriff nach
+            access_token.application = get_application_model().from_db(
+                None, ['id', 'client_id'], [entry['application_id'], entry['client_id']],
+            )
+        else:
+            access_token.application = None
+
+        if entry['user_id'] is not None:
+            user = user_cache.get_user(entry['user_id'])
+            if user is None:
+                return None
+            access_token.user = user
+        return access_token
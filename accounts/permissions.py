@@ -2,7 +2,7 @@
 Custom Permission Classes für API-Key-Authentifizierung
 """
 from rest_framework import permissions
-from .models import Website
+from .api_keys import INVALID_KEY, INVALID_SECRET, MISSING_KEY, resolve_api_key
 
 
 class HasValidAPIKey(permissions.BasePermission):
@@ -23,30 +23,48 @@ class HasValidAPIKey(permissions.BasePermission):
     message = 'Ungültiger oder fehlender API-Key. Bitte fügen Sie einen gültigen API-Key im X-API-Key Header hinzu.'
     
     def has_permission(self, request, view):
-        # API-Key aus Header holen
-        api_key = request.headers.get('X-API-Key') or request.headers.get('X-Api-Key')
+        # API-Key aus Header holen und prüfen (einmal pro Request, gecacht)
+        website, error = resolve_api_key(request)
         
-        if not api_key:
+        if error == MISSING_KEY:
             self.message = 'API-Key fehlt. Bitte fügen Sie den X-API-Key Header zu Ihrer Anfrage hinzu.'
             return False
         
-        # Prüfe ob API-Key zu einer aktiven Website gehört
-        try:
-            website = Website.objects.get(api_key=api_key, is_active=True)
-            
-            # Optional: Prüfe auch API-Secret falls vorhanden
-            api_secret = request.headers.get('X-API-Secret') or request.headers.get('X-Api-Secret')
-            if api_secret and website.api_secret and api_secret != website.api_secret:
-                self.message = 'API-Secret ist ungültig.'
-                return False
-            
-            # Speichere Website im Request für späteren Zugriff
-            request.website = website
-            return True
-            
-        except Website.DoesNotExist:
+        if error == INVALID_SECRET:
+            self.message = 'API-Secret ist ungültig.'
+            return False
+        
+        if error == INVALID_KEY:
             self.message = 'API-Key ist ungültig oder die zugehörige Website ist nicht aktiv.'
             return False
+        
+        # Speichere Website im Request für späteren Zugriff
+        request.website = website
+        return True
+
+
+class HasValidAPIKeyAndSecret(HasValidAPIKey):
+    """
+    Permission-Klasse: Wie HasValidAPIKey, zusätzlich ist der X-API-Secret
+    Header Pflicht.
+    
+    Für Endpoints, die nur Backend-Dienste aufrufen sollen (z.B. Token-
+    Introspection) - der API-Key allein steht auch im Frontend-Code.
+    
+    Verwendung in Views:
+        permission_classes = [HasValidAPIKeyAndSecret]
+    """
+    
+    def has_permission(self, request, view):
+        if not super().has_permission(request, view):
+            return False
+        
+        # Der Secret-Vergleich selbst passiert in resolve_api_key()
+        api_secret = request.headers.get('X-API-Secret') or request.headers.get('X-Api-Secret')
+        if not api_secret or not request.website.api_secret:
+            self.message = 'API-Secret fehlt. Bitte fügen Sie den X-API-Secret Header zu Ihrer Anfrage hinzu.'
+            return False
+        return True
 
 
 class HasValidAPIKeyOrIsAuthenticated(permissions.BasePermission):
@@ -68,26 +86,21 @@ class HasValidAPIKeyOrIsAuthenticated(permissions.BasePermission):
             return True
         
         # Falls kein JWT-Token, prüfe API-Key
-        api_key = request.headers.get('X-API-Key') or request.headers.get('X-Api-Key')
+        website, error = resolve_api_key(request)
         
-        if not api_key:
+        if error == MISSING_KEY:
             return False
         
-        try:
-            website = Website.objects.get(api_key=api_key, is_active=True)
-            
-            # Optional: Prüfe auch API-Secret
-            api_secret = request.headers.get('X-API-Secret') or request.headers.get('X-Api-Secret')
-            if api_secret and website.api_secret and api_secret != website.api_secret:
-                self.message = 'API-Secret ist ungültig.'
-                return False
-            
-            request.website = website
-            return True
-            
-        except Website.DoesNotExist:
+        if error == INVALID_SECRET:
+            self.message = 'API-Secret ist ungültig.'
+            return False
+        
+        if error == INVALID_KEY:
             self.message = 'Ungültiger API-Key oder zugehörige Website ist nicht aktiv.'
             return False
+        
+        request.website = website
+        return True
 
 
 class IsAdminOrHasValidAPIKey(permissions.BasePermission):
@@ -109,23 +122,18 @@ class IsAdminOrHasValidAPIKey(permissions.BasePermission):
             return True
         
         # Prüfe API-Key
-        api_key = request.headers.get('X-API-Key') or request.headers.get('X-Api-Key')
+        website, error = resolve_api_key(request)
         
-        if not api_key:
+        if error == MISSING_KEY:
             return False
         
-        try:
-            website = Website.objects.get(api_key=api_key, is_active=True)
-            
-            # Optional: Prüfe API-Secret
-            api_secret = request.headers.get('X-API-Secret') or request.headers.get('X-Api-Secret')
-            if api_secret and website.api_secret and api_secret != website.api_secret:
-                self.message = 'API-Secret ist ungültig.'
-                return False
-            
-            request.website = website
-            return True
-            
-        except Website.DoesNotExist:
+        if error == INVALID_SECRET:
+            self.message = 'API-Secret ist ungültig.'
+            return False
+        
+        if error == INVALID_KEY:
             self.message = 'Ungültiger API-Key.'
             return False
+        
+        request.website = website
+        return True
@@ -0,0 +1,302 @@
+"""
+Rate Limiting für Login- und Credential-Endpunkte (Token Bucket)
+
+Jeder Scope (login, mfa, password_reset, verification_email) hat bis zu drei
+Buckets: pro Client-IP, pro Account (Benutzername/E-Mail, gehasht) und pro
+API-Key (Website). Limits stehen in settings.RATE_LIMITS im Format
+'Anzahl/Zeitraum', z.B. '10/15min': Burst von 10 Anfragen, der Bucket ist
+nach 15 Minuten wieder voll (gleichmäßig aufgefüllt).
+
+Die Buckets liegen im gemeinsamen Django-Cache (Redis in Produktion) und
+gelten damit für alle Gunicorn-Worker. Pro Bucket werden zwei Werte gehalten:
+der Zähler verbrauchter Tokens (nur über cache.incr/decr verändert, also
+atomar) und eine Zeitbasis. Verfügbar sind
+
+    capacity + floor((jetzt - basis) * rate) - verbraucht
+
+Ist der Bucket voll, wird nur die Zeitbasis nachgezogen (überzählige Tokens
+verfallen). Abgelehnte Anfragen geben ihr Token per decr zurück. Ein Check
+kostet damit zwei Cache-Zugriffe pro Bucket (get_many + incr), eine Ablehnung
+einen weiteren - ohne Datenbank und vor dem Passwort-Hashing in der View.
+
+Erfolgreiche Anmeldungen geben ihr Token im Account-Bucket zurück
+(refund_account), das Account-Limit zählt also nur Fehlversuche - sonst
+könnte jeder, der die Anfragen eines Benutzers kennt, dessen Logins durch
+Mitzählen aussperren und legitime Logins verbrauchten das Limit mit.
+
+Die Entscheidung des knappsten Buckets liegt am Request; RateLimitMiddleware
+setzt daraus die Header RateLimit-Limit/-Remaining/-Reset/-Policy, DRF bei
+429 zusätzlich Retry-After.
+"""
+import hashlib
+import math
+import re
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.throttling import BaseThrottle
+
+from .api_keys import resolve_api_key
+
+
+BUCKET_KEY = 'ratelimit:{scope}:{kind}:{ident}'
+PERIODS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+# Buckets in Prüfreihenfolge (die billigsten zuerst)
+KINDS = ('ip', 'api_key', 'account')
+
+_RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+)\s*$')
+_REQUEST_ATTR = '_ratelimit_decision'
+_ACCOUNT_KEY_ATTR = '_ratelimit_account_key'
+
+Limit = namedtuple('Limit', ['capacity', 'period'])
+Decision = namedtuple('Decision', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+
+class RateLimited(exceptions.Throttled):
+    default_detail = 'Zu viele Anfragen.'
+    extra_detail_singular = 'Erneut möglich in {wait} Sekunde.'
+    extra_detail_plural = 'Erneut möglich in {wait} Sekunden.'
+
+
+def is_enabled():
+    return getattr(settings, 'RATE_LIMIT_ENABLED', True)
+
+
+def get_limits(scope):
+    """Limits eines Scopes als {kind: Limit}."""
+    rates = getattr(settings, 'RATE_LIMITS', {}).get(scope, {})
+    return {kind: parse_rate(rates[kind]) for kind in KINDS if rates.get(kind)}
+
+
+def parse_rate(rate):
+    """
+    '10/min' -> Limit(10, 60), '5/15min' -> Limit(5, 900)
+
+    Raises:
+        ValueError: bei ungültigem Format
+    """
+    match = _RATE_RE.match(rate.lower())
+    if not match or match.group(3) not in PERIODS or int(match.group(1)) < 1:
+        raise ValueError(f'Ungültiges Rate Limit: {rate!r}')
+    count, multiplier, unit = match.groups()
+    return Limit(int(count), int(multiplier or 1) * PERIODS[unit])
+
+
+def get_client_ip(request):
+    """
+    Client-IP für das Rate Limiting.
+
+    Anders als beim Logging zählt hier nur der Eintrag in X-Forwarded-For, den
+    der eigene Proxy (nginx, $proxy_add_x_forwarded_for) angehängt hat - die
+    übrigen Einträge setzt der Client selbst. RATE_LIMIT_PROXY_COUNT ist die
+    Anzahl vertrauenswürdiger Proxies vor Gunicorn (0 = nur REMOTE_ADDR).
+    """
+    proxy_count = getattr(settings, 'RATE_LIMIT_PROXY_COUNT', 1)
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxy_count and x_forwarded_for:
+        forwarded = [ip.strip() for ip in x_forwarded_for.split(',')]
+        if len(forwarded) >= proxy_count and forwarded[-proxy_count]:
+            return forwarded[-proxy_count][:45]
+    return request.META.get('REMOTE_ADDR', '')[:45]
+
+
+def _account_digest(identifier):
+    return hashlib.sha256(identifier.strip().lower().encode('utf-8')).hexdigest()
+
+
+def hit(key, limit, now=None):
+    """
+    Entnimmt ein Token aus einem Bucket.
+
+    Args:
+        key: Cache-Schlüssel des Buckets
+        limit: Limit
+        now: Zeitpunkt (time.time(), für Tests/Benchmarks)
+
+    Returns:
+        Decision
+    """
+    now = time.time() if now is None else now
+    rate = limit.capacity / limit.period
+    count_key, start_key = f'{key}:n', f'{key}:t'
+    # Nur zur Speicherbereinigung; ein voller Bucket wird über die Zeitbasis erkannt
+    timeout = max(limit.period * 4, 3600)
+
+    values = cache.get_many([count_key, start_key])
+    used = values.get(count_key)
+    start = values.get(start_key)
+
+    if used is None:
+        cache.add(count_key, 0, timeout)
+        used = 0
+    if start is None or math.floor((now - start) * rate) >= used:
+        # Bucket voll: Zeitbasis nachziehen, so dass genau capacity Tokens verfügbar sind
+        start = now - used / rate
+        cache.set(start_key, start, timeout)
+        cache.touch(count_key, timeout)
+
+    try:
+        used = cache.incr(count_key)
+    except ValueError:
+        # Zähler zwischenzeitlich verdrängt - Bucket neu beginnen
+        cache.set_many({count_key: 1, start_key: now}, timeout)
+        used, start = 1, now
+
+    refilled = math.floor((now - start) * rate + 1e-9)
+    remaining = limit.capacity + refilled - used
+
+    if remaining < 0:
+        try:
+            cache.decr(count_key)
+        except ValueError:
+            pass
+        used -= 1
+        retry_after = max(1, math.ceil((used + 1 - limit.capacity) / rate - (now - start)))
+        return Decision(False, limit, 0, _seconds_until_full(used, rate, now - start), retry_after)
+
+    return Decision(True, limit, remaining, _seconds_until_full(used, rate, now - start), 0)
+
+
+def _seconds_until_full(used, rate, elapsed):
+    return max(0, math.ceil(used / rate - elapsed))
+
+
+def refund(key):
+    """Gibt ein Token an einen Bucket zurück (abgelehnt von einem anderen Bucket bzw. erfolgreicher Login)."""
+    try:
+        cache.decr(f'{key}:n')
+    except ValueError:
+        pass
+
+
+def check(request, scope, account=None):
+    """
+    Prüft alle Buckets eines Scopes für einen Request.
+
+    Args:
+        request: DRF Request
+        scope: Schlüssel in settings.RATE_LIMITS
+        account: Benutzername/E-Mail/User-ID oder None
+
+    Returns:
+        Decision des knappsten (bzw. des ablehnenden) Buckets oder None ohne Limits
+    """
+    limits = get_limits(scope)
+    if not limits:
+        return None
+
+    idents = {'ip': get_client_ip(request), 'api_key': None, 'account': None}
+    if 'api_key' in limits:
+        website, _ = resolve_api_key(request)
+        idents['api_key'] = str(website.pk) if website else None
+    if account:
+        idents['account'] = _account_digest(str(account))
+
+    decision = None
+    consumed = []
+    for kind, limit in limits.items():
+        if not idents[kind]:
+            continue
+        key = BUCKET_KEY.format(scope=scope, kind=kind, ident=idents[kind])
+        result = hit(key, limit)
+        if not result.allowed:
+            for previous in consumed:
+                refund(previous)
+            decision = result
+            break
+        consumed.append(key)
+        if decision is None or result.remaining < decision.remaining:
+            decision = result
+
+    if decision is not None:
+        http_request = getattr(request, '_request', request)
+        setattr(http_request, _REQUEST_ATTR, decision)
+        if decision.allowed and idents['account'] and 'account' in limits:
+            setattr(http_request, _ACCOUNT_KEY_ATTR, BUCKET_KEY.format(
+                scope=scope, kind='account', ident=idents['account'],
+            ))
+    return decision
+
+
+def refund_account(request):
+    """
+    Gibt das Token zurück, das dieser Request im Account-Bucket verbraucht
+    hat (nach erfolgreicher Anmeldung). Mehrfache Aufrufe erstatten einmal.
+    """
+    http_request = getattr(request, '_request', request)
+    key = getattr(http_request, _ACCOUNT_KEY_ATTR, None)
+    if key is not None:
+        delattr(http_request, _ACCOUNT_KEY_ATTR)
+        refund(key)
+
+
+def get_decision(request):
+    """Entscheidung des Rate Limits für diesen Request (oder None)."""
+    return getattr(request, _REQUEST_ATTR, None)
+
+
+class CredentialRateThrottle(BaseThrottle):
+    """
+    DRF-Throttle für Credential-Endpunkte. Läuft in APIView.initial(), also
+    vor der View und damit vor authenticate()/Passwort-Hashing.
+
+    Unterklassen setzen scope und ggf. get_account().
+    """
+    scope = None
+    account_fields = ()
+
+    def get_account(self, request):
+        """Kennung des Accounts, auf den die Anfrage zielt (oder None)."""
+        for field in self.account_fields:
+            value = request.data.get(field) if hasattr(request.data, 'get') else None
+            if isinstance(value, str) and value.strip():
+                return value
+        return None
+
+    def allow_request(self, request, view):
+        if not is_enabled():
+            return True
+        decision = check(request, self.scope, self.get_account(request))
+        if decision is not None and not decision.allowed:
+            # Direkt auslösen, damit auch Function-Based Views die deutsche Meldung liefern
+            raise RateLimited(wait=decision.retry_after)
+        return True
+
+
+class LoginRateThrottle(CredentialRateThrottle):
+    scope = 'login'
+    account_fields = ('username', 'email')
+
+
+class PasswordResetRateThrottle(CredentialRateThrottle):
+    scope = 'password_reset'
+    account_fields = ('email',)
+
+
+class VerificationEmailRateThrottle(CredentialRateThrottle):
+    scope = 'verification_email'
+    account_fields = ('email',)
+
+
+class MFARateThrottle(CredentialRateThrottle):
+    """Account = angemeldeter Benutzer bzw. Benutzer der MFA-Challenge (temp_token)."""
+    scope = 'mfa'
+
+    def get_account(self, request):
+        if request.user and request.user.is_authenticated:
+            return str(request.user.pk)
+        temp_token = request.data.get('temp_token') if hasattr(request.data, 'get') else None
+        if temp_token:
+            from .mfa_challenges import get_challenge
+            challenge = get_challenge(temp_token)
+            if challenge:
+                return challenge['user_id']
+        return None
@@ -0,0 +1,226 @@
+"""
+Bloom-Filter der gesperrten Refresh Tokens
+
+Jeder Token-Refresh (ROTATE_REFRESH_TOKENS + BLACKLIST_AFTER_ROTATION),
+jeder Logout und jede SSO-Initiierung prüft, ob der Refresh Token in
+SimpleJWTs BlacklistedToken steht - ein JOIN auf OutstandingToken, die mit
+jedem Login und Refresh wächst. Fast immer lautet die Antwort "nicht
+gesperrt".
+
+Jeder Prozess hält deshalb einen Bloom-Filter aller gesperrten, noch nicht
+abgelaufenen JTIs. Ist eine JTI nicht im Filter, ist der Token sicher nicht
+gesperrt und es fällt kein Query an; nur bei einem Treffer (gesperrt oder
+falsch positiv, TOKEN_BLOOM_ERROR_RATE) fragt accounts.tokens.RefreshToken
+die Datenbank.
+
+Synchronisation zwischen Workern: neue Sperren (post_save auf
+BlacklistedToken, nach dem Commit) landen mit fortlaufender Nummer im
+gemeinsamen Django-Cache. Vor jeder Prüfung liest ein Prozess den Zähler
+und übernimmt fehlende Einträge; fehlen welche (verdrängt, Cache geleert)
+oder ist der Rückstand zu groß, wird der Filter aus der Datenbank neu
+aufgebaut - ebenso nach TOKEN_BLOOM_REBUILD_INTERVAL, damit abgelaufene
+JTIs herausfallen.
+
+Abgelaufene OutstandingToken/BlacklistedToken-Zeilen entfernt
+python manage.py compact_token_blacklist in Chunks.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from .metrics import record_cache
+
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY = 'revoked_jti:counter'
+ENTRY_KEY = 'revoked_jti:{position}'
+
+# Größerer Rückstand: Neuaufbau statt get_many über alle Einträge
+MAX_CATCH_UP = 1000
+
+_filter = None
+_position = None
+_built = 0.0
+_lock = threading.Lock()
+
+
+def get_error_rate():
+    """Anteil falsch positiver Treffer (führen zu einem Query)."""
+    return getattr(settings, 'TOKEN_BLOOM_ERROR_RATE', 0.001)
+
+
+def get_min_capacity():
+    """Mindestkapazität des Filters (JTIs)."""
+    return getattr(settings, 'TOKEN_BLOOM_MIN_CAPACITY', 10000)
+
+
+def get_rebuild_interval():
+    """Sekunden, nach denen der Filter aus der Datenbank neu aufgebaut wird."""
+    return getattr(settings, 'TOKEN_BLOOM_REBUILD_INTERVAL', 3600)
+
+
+class BloomFilter:
+    """Bloom-Filter über Strings mit Double Hashing (Kirsch/Mitzenmacher)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+
+def _get_counter():
+    counter = cache.get(COUNTER_KEY)
+    if counter is None:
+        # Neue Epoche (Cache geleert): größer als jede bisherige Position
+        cache.add(COUNTER_KEY, time.time_ns(), None)
+        counter = cache.get(COUNTER_KEY)
+    return counter
+
+
+def _rebuild(counter):
+    global _filter, _position, _built
+    revoked = BlacklistedToken.objects.filter(
+        token__expires_at__gt=timezone.now(),
+    ).values_list('token__jti', flat=True)
+
+    jtis = list(revoked.iterator(chunk_size=5000))
+    bloom = BloomFilter(max(2 * len(jtis), get_min_capacity()), get_error_rate())
+    for jti in jtis:
+        bloom.add(jti)
+
+    _filter, _position, _built = bloom, counter, time.monotonic()
+    logger.debug('Bloom-Filter gesperrter Tokens neu aufgebaut: %s JTIs', len(jtis))
+
+
+def _sync():
+    """Bringt den Filter dieses Prozesses auf den Stand des gemeinsamen Caches."""
+    global _position
+    counter = _get_counter()
+    if counter is not None and counter == _position and not _expired():
+        return
+
+    with _lock:
+        if _filter is None or counter is None or _position is None or _expired() \
+                or counter < _position or counter - _position > MAX_CATCH_UP:
+            _rebuild(counter)
+            return
+        if counter == _position:
+            return
+
+        keys = [ENTRY_KEY.format(position=n) for n in range(_position + 1, counter + 1)]
+        entries = cache.get_many(keys)
+        if len(entries) < len(keys):
+            # Verdrängt oder noch nicht geschrieben: Datenbank ist maßgeblich
+            _rebuild(counter)
+            return
+        for key in keys:
+            _filter.add(entries[key])
+        _position = counter
+        if _filter.is_full:
+            _rebuild(counter)
+
+
+def _expired():
+    return _filter is None or _filter.is_full or time.monotonic() - _built > get_rebuild_interval()
+
+
+def might_be_revoked(jti):
+    """
+    False, wenn der Token mit dieser JTI sicher nicht gesperrt ist.
+
+    True heißt "vielleicht" - der Aufrufer prüft dann BlacklistedToken.
+    """
+    try:
+        _sync()
+        revoked = jti in _filter
+    except Exception:
+        logger.exception('Bloom-Filter gesperrter Tokens nicht verfügbar')
+        return True
+    record_cache('token_blacklist', not revoked)
+    return revoked
+
+
+def record_revocation(jti):
+    """Neue Sperre: lokal sofort, in anderen Prozessen bei der nächsten Prüfung."""
+    if _filter is not None:
+        _filter.add(jti)
+    try:
+        position = cache.incr(COUNTER_KEY)
+    except ValueError:
+        cache.add(COUNTER_KEY, time.time_ns(), None)
+        position = cache.incr(COUNTER_KEY)
+    cache.set(ENTRY_KEY.format(position=position), jti, get_rebuild_interval())
+
+
+def reset():
+    """Verwirft den Filter dieses Prozesses."""
+    global _filter, _position
+    with _lock:
+        _filter = None
+        _position = None
+
+
+def compact(before=None, chunk_size=5000, pause=0.0, progress=None):
+    """
+    Löscht abgelaufene OutstandingToken-Zeilen samt ihrer BlacklistedToken
+    in Chunks (je Chunk eine kurze Transaktion).
+
+    Args:
+        before: Ablaufzeitpunkt (Standard: jetzt)
+        chunk_size: Zeilen pro Lösch-Schritt
+        pause: Pause in Sekunden nach jedem Chunk
+        progress: optionaler Callback(outstanding, blacklisted) je Chunk
+
+    Returns:
+        dict: {'outstanding': n, 'blacklisted': n}
+    """
+    before = before or timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=before).order_by('pk')
+    stats = {'outstanding': 0, 'blacklisted': 0}
+
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+
+        with transaction.atomic():
+            blacklisted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            outstanding, _ = OutstandingToken.objects.filter(pk__in=ids).delete()
+
+        stats['outstanding'] += outstanding
+        stats['blacklisted'] += blacklisted
+        if progress:
+            progress(outstanding, blacklisted)
+        if pause:
+            time.sleep(pause)
+
+    return stats
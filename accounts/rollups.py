@@ -0,0 +1,390 @@
+"""
+Rollups für API-Requests (Latenz und Status pro Endpoint)
+
+Die Logging-Middleware zählt jeden API-Request - auch solche, die die
+Log-Policy verwirft - in einem In-Memory-Aggregator pro Prozess:
+
+    (Minute, Methode, normalisierter Endpoint) -> Anzahl, Fehler,
+                                                  Dauer-Summe/-Maximum,
+                                                  Latenz-Histogramm
+
+Der Hintergrund-Thread des Log-Writers schreibt den Aggregator alle
+API_ROLLUP_FLUSH_INTERVAL Sekunden in APIRequestRollup. Zeilen, die andere
+Worker für dieselbe Minute schon angelegt haben, werden zusammengeführt.
+
+Das Histogramm hat feste Grenzen (LATENCY_BUCKETS_MS) und ist damit
+beliebig addierbar - über Worker, Minuten und Endpoints hinweg. p50/p95/p99
+werden aus dem zusammengeführten Histogramm interpoliert.
+
+Endpoints werden normalisiert, damit IDs nicht pro Objekt eine eigene Zeile
+erzeugen:
+
+    /api/accounts/websites/3f2b...-.../   ->  /api/accounts/websites/{uuid}/
+    /api/permissions/roles/17/            ->  /api/permissions/roles/{id}/
+"""
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+# Obergrenzen der Latenz-Buckets in Millisekunden; dazu kommt ein Überlauf-Bucket
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+HISTOGRAM_SIZE = len(LATENCY_BUCKETS_MS) + 1
+
+_UUID = re.compile(r'^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$')
+_NUMBER = re.compile(r'^\d+$')
+# Tokens (Verifizierungs-Links, SSO-Tokens, ...): lang und enthalten Ziffern
+_TOKEN = re.compile(r'^(?=.*\d)[A-Za-z0-9_\-.=]{20,}$')
+
+
+def normalize_endpoint(path):
+    """Ersetzt IDs und Tokens im Pfad durch Platzhalter."""
+    segments = []
+    for segment in path.split('/'):
+        if _NUMBER.match(segment):
+            segment = '{id}'
+        elif _UUID.match(segment):
+            segment = '{uuid}'
+        elif _TOKEN.match(segment):
+            segment = '{token}'
+        segments.append(segment)
+    return '/'.join(segments)[:255]
+
+
+def bucket_start(timestamp):
+    """Beginn der Minute (aware datetime, UTC) zu einem Unix-Timestamp."""
+    return datetime.fromtimestamp(int(timestamp // 60) * 60, tz=dt_timezone.utc)
+
+
+def histogram_index(duration_ms):
+    return bisect_left(LATENCY_BUCKETS_MS, duration_ms)
+
+
+def merge_histograms(target, source):
+    """Addiert `source` auf `target` (Listen gleicher Länge) und gibt `target` zurück."""
+    if len(target) < HISTOGRAM_SIZE:
+        target.extend([0] * (HISTOGRAM_SIZE - len(target)))
+    for index, value in enumerate(source):
+        target[index] += value
+    return target
+
+
+def percentile(histogram, quantile, duration_max=None):
+    """
+    Schätzt ein Perzentil (0 < quantile <= 1) in Millisekunden durch lineare
+    Interpolation innerhalb des Buckets. Ohne Einträge: None.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+
+    rank = quantile * total
+    seen = 0
+    for index, value in enumerate(histogram):
+        if not value:
+            continue
+        if seen + value >= rank:
+            lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0
+            if index < len(LATENCY_BUCKETS_MS):
+                upper = LATENCY_BUCKETS_MS[index]
+            else:
+                upper = max(duration_max or lower, lower)
+            estimate = lower + (upper - lower) * (rank - seen) / value
+            if duration_max is not None:
+                estimate = min(estimate, duration_max)
+            return round(estimate, 2)
+        seen += value
+    return duration_max
+
+
+# Additive Felder von APIRequestRollup (Summen über alle Requests)
+SUM_FIELDS = (
+    'count', 'error_count', 'server_error_count', 'duration_sum',
+    'query_count_sum', 'db_duration_sum',
+    'auth_duration_sum', 'permission_duration_sum', 'serialization_duration_sum',
+)
+# Phase aus accounts/instrumentation.py -> Feld
+PHASE_FIELDS = {
+    'auth': 'auth_duration_sum',
+    'perm': 'permission_duration_sum',
+    'ser': 'serialization_duration_sum',
+}
+
+
+class _Stats:
+    __slots__ = SUM_FIELDS + ('duration_max', 'histogram')
+
+    def __init__(self):
+        for field in SUM_FIELDS:
+            setattr(self, field, 0)
+        self.duration_max = 0.0
+        self.histogram = [0] * HISTOGRAM_SIZE
+
+    def add(self, status_code, duration_ms, query_count=None, db_duration=None, phases=None):
+        """Zählt einen Request (db_duration und phases in Sekunden)."""
+        self.count += 1
+        if status_code >= 400:
+            self.error_count += 1
+            if status_code >= 500:
+                self.server_error_count += 1
+        if duration_ms is not None:
+            self.duration_sum += duration_ms
+            if duration_ms > self.duration_max:
+                self.duration_max = duration_ms
+            self.histogram[histogram_index(duration_ms)] += 1
+        if query_count:
+            self.query_count_sum += query_count
+        if db_duration:
+            self.db_duration_sum += db_duration * 1000
+        for phase, seconds in (phases or {}).items():
+            field = PHASE_FIELDS.get(phase)
+            if field:
+                setattr(self, field, getattr(self, field) + seconds * 1000)
+
+    def merge(self, other):
+        """Addiert ein anderes _Stats oder eine Rollup-Zeile (Objekt oder dict)."""
+        get = other.get if isinstance(other, dict) else lambda field: getattr(other, field)
+        for field in SUM_FIELDS:
+            setattr(self, field, getattr(self, field) + get(field))
+        self.duration_max = max(self.duration_max, get('duration_max'))
+        merge_histograms(self.histogram, get('histogram'))
+
+
+class RollupAggregator:
+    """Zählt Requests im Speicher und schreibt sie gesammelt in APIRequestRollup."""
+
+    def __init__(self, flush_interval=10.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._stats = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, method, path, status_code, duration=None, timestamp=None, timings=None):
+        """
+        Args:
+            method: HTTP-Methode
+            path: Request-Pfad (wird normalisiert)
+            status_code: HTTP-Status
+            duration: Dauer in Sekunden (oder None)
+            timestamp: Unix-Timestamp des Requests (Standard: jetzt)
+            timings: RequestTimings aus accounts/instrumentation.py (oder None)
+        """
+        key = (
+            bucket_start(timestamp if timestamp is not None else time.time()),
+            method,
+            normalize_endpoint(path),
+        )
+        duration_ms = duration * 1000 if duration is not None else None
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Geforkter Worker: Zähler des Elternprozesses nicht doppelt schreiben
+                self._reset()
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _Stats()
+            if timings is None:
+                stats.add(status_code, duration_ms)
+            else:
+                stats.add(status_code, duration_ms, timings.query_count, timings.db_duration, timings.phases)
+
+    def flush(self, force=True):
+        """
+        Schreibt die gesammelten Zähler (force=False: nur wenn das Intervall
+        abgelaufen ist). Wird vom Log-Writer-Thread aufgerufen.
+        """
+        if not force and time.monotonic() - self._last_flush < self.flush_interval:
+            return 0
+
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+                    return 0
+                pending, self._stats = self._stats, {}
+                self._last_flush = time.monotonic()
+
+            if not pending:
+                return 0
+
+            try:
+                self._save(pending)
+            except Exception as e:
+                # Zähler nicht verlieren, beim nächsten Flush erneut versuchen
+                logger.warning('API-Rollups konnten nicht gespeichert werden: %s', e)
+                with self._lock:
+                    for key, stats in pending.items():
+                        current = self._stats.get(key)
+                        if current is None:
+                            self._stats[key] = stats
+                        else:
+                            current.merge(stats)
+                return 0
+            return len(pending)
+
+    def _save(self, pending, retries=1):
+        try:
+            save_rollups(pending)
+        except IntegrityError:
+            # Ein anderer Worker hat dieselbe Zeile gleichzeitig angelegt
+            if not retries:
+                raise
+            self._save(pending, retries - 1)
+
+
+def save_rollups(pending):
+    """
+    Führt {(bucket, method, endpoint): _Stats} mit bestehenden Zeilen zusammen.
+    """
+    from django.db.models import Q
+    from .models import APIRequestRollup
+
+    with transaction.atomic():
+        lookup = Q()
+        for bucket, method, endpoint in pending:
+            lookup |= Q(bucket=bucket, method=method, endpoint=endpoint)
+        existing = {
+            (row.bucket, row.method, row.endpoint): row
+            for row in APIRequestRollup.objects.select_for_update().filter(lookup)
+        }
+
+        to_create = []
+        to_update = []
+        for key, stats in pending.items():
+            row = existing.get(key)
+            if row is None:
+                to_create.append(APIRequestRollup(
+                    bucket=key[0],
+                    method=key[1],
+                    endpoint=key[2],
+                    duration_max=stats.duration_max,
+                    histogram=stats.histogram,
+                    **{field: getattr(stats, field) for field in SUM_FIELDS},
+                ))
+                continue
+            for field in SUM_FIELDS:
+                setattr(row, field, getattr(row, field) + getattr(stats, field))
+            row.duration_max = max(row.duration_max, stats.duration_max)
+            row.histogram = merge_histograms(list(row.histogram), stats.histogram)
+            to_update.append(row)
+
+        if to_create:
+            APIRequestRollup.objects.bulk_create(to_create)
+        if to_update:
+            APIRequestRollup.objects.bulk_update(
+                to_update, SUM_FIELDS + ('duration_max', 'histogram')
+            )
+
+
+def rebuild_rollups(since, until, chunk_size=5000):
+    """
+    Berechnet die Rollups für [since, until) neu aus APIRequestLog (Backfill).
+    Bestehende Rollups im Zeitraum werden ersetzt. Vom Log-Sampling verworfene
+    Requests fehlen dabei naturgemäß.
+
+    Returns:
+        int: Anzahl verarbeiteter Log-Einträge
+    """
+    from .models import APIRequestLog, APIRequestRollup
+
+    since = bucket_start(since.timestamp())
+    until = bucket_start(until.timestamp())
+
+    pending = {}
+    rows = 0
+    logs = APIRequestLog.objects.filter(timestamp__gte=since, timestamp__lt=until).values_list(
+        'timestamp', 'method', 'path', 'status_code', 'duration',
+        'query_count', 'db_duration', 'timings',
+    )
+    for timestamp, method, path, status_code, duration, query_count, db_duration, timings \
+            in logs.iterator(chunk_size=chunk_size):
+        key = (bucket_start(timestamp.timestamp()), method, normalize_endpoint(path))
+        stats = pending.get(key)
+        if stats is None:
+            stats = pending[key] = _Stats()
+        stats.add(
+            status_code, duration * 1000 if duration is not None else None,
+            query_count, db_duration, timings,
+        )
+        rows += 1
+
+    with transaction.atomic():
+        APIRequestRollup.objects.filter(bucket__gte=since, bucket__lt=until).delete()
+        if pending:
+            save_rollups(pending)
+    return rows
+
+
+def summarize(rows):
+    """
+    Fasst Rollup-Zeilen (dicts mit den Feldern von APIRequestRollup) zusammen.
+
+    Returns:
+        dict: count, error_count, server_error_count, error_rate, avg_ms,
+              max_ms, p50, p95, p99, avg_queries, avg_db_ms, avg_auth_ms,
+              avg_permission_ms, avg_serialization_ms
+    """
+    total = _Stats()
+    for row in rows:
+        total.merge(row)
+
+    def average(value):
+        return round(value / total.count, 2) if total.count else None
+
+    timed = sum(total.histogram)
+    return {
+        'count': total.count,
+        'error_count': total.error_count,
+        'server_error_count': total.server_error_count,
+        'error_rate': round(total.error_count * 100 / total.count, 2) if total.count else 0,
+        'avg_ms': round(total.duration_sum / timed, 2) if timed else None,
+        'max_ms': round(total.duration_max, 2) if timed else None,
+        'p50': percentile(total.histogram, 0.50, total.duration_max),
+        'p95': percentile(total.histogram, 0.95, total.duration_max),
+        'p99': percentile(total.histogram, 0.99, total.duration_max),
+        'avg_queries': average(total.query_count_sum),
+        'avg_db_ms': average(total.db_duration_sum),
+        'avg_auth_ms': average(total.auth_duration_sum),
+        'avg_permission_ms': average(total.permission_duration_sum),
+        'avg_serialization_ms': average(total.serialization_duration_sum),
+    }
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_rollup_aggregator():
+    """
+    Prozessweiter Aggregator (None, wenn API_ROLLUP_ENABLED=False).
+    Wird beim ersten Aufruf beim Log-Writer als Flush-Hook registriert.
+    """
+    global _aggregator
+    if not getattr(settings, 'API_ROLLUP_ENABLED', True):
+        return None
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                from .log_writer import get_log_writer
+
+                aggregator = RollupAggregator(
+                    flush_interval=getattr(settings, 'API_ROLLUP_FLUSH_INTERVAL', 10.0),
+                )
+                get_log_writer().add_flush_hook(aggregator.flush)
+                _aggregator = aggregator
+    return _aggregator
@@ -0,0 +1,85 @@
+"""
+Signal-Handler der Accounts-App
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from oauth2_provider.models import get_access_token_model, get_application_model
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import api_keys, introspection, jwt_keys, oauth2, revocation, user_cache
+from .models import JWTSigningKey, User, UserSession, Website
+
+
+@receiver(post_save, sender=Website)
+@receiver(post_delete, sender=Website)
+def invalidate_api_keys(sender, instance, **kwargs):
+    """API-Key, Secret oder Status einer Website geändert (auch regenerate_credentials())."""
+    transaction.on_commit(api_keys.invalidate)
+
+
+@receiver(post_save, sender=JWTSigningKey)
+@receiver(post_delete, sender=JWTSigningKey)
+def invalidate_jwt_key_ring(sender, instance, **kwargs):
+    """Schlüssel erzeugt, aktiviert, ausgemustert oder gelöscht (andere Prozesse laden nach JWT_KEY_RING_TTL neu)."""
+    transaction.on_commit(jwt_keys.invalidate)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def record_revoked_token(sender, instance, created, **kwargs):
+    """Refresh Token gesperrt (Logout, Rotation): Bloom-Filter aller Worker ergänzen."""
+    if created:
+        jti = instance.token.jti
+        transaction.on_commit(lambda: revocation.record_revocation(jti))
+
+
+@receiver(post_save, sender=get_access_token_model())
+@receiver(post_delete, sender=get_access_token_model())
+def invalidate_access_token(sender, instance, **kwargs):
+    """OAuth2 Access Token geändert, widerrufen oder rotiert: gecachte Prüfungen verwerfen."""
+    token = instance.token
+
+    def invalidate():
+        oauth2.invalidate(token)
+        introspection.invalidate(token)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=get_application_model())
+@receiver(pre_delete, sender=get_application_model())
+def invalidate_application_tokens(sender, instance, **kwargs):
+    """
+    OAuth2 Application geändert oder gelöscht: gecachte Prüfungen ihrer Access
+    Tokens verwerfen (vor dem Löschen, danach sind die Tokens schon entfernt).
+    """
+    tokens = list(get_access_token_model().objects.filter(application=instance).values_list('token', flat=True))
+    if not tokens:
+        return
+
+    def invalidate():
+        oauth2.invalidate_many(tokens)
+        for token in tokens:
+            introspection.invalidate(token)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, update_fields=None, **kwargs):
+    """Benutzer geändert (auch Passwort, is_active) oder gelöscht - nicht bei reinen last_login-Updates."""
+    if update_fields and set(update_fields) <= user_cache.IGNORED_FIELDS:
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=UserSession)
+@receiver(post_delete, sender=UserSession)
+def invalidate_synced_session(sender, instance, created=False, **kwargs):
+    """Sitzung gespeichert (z.B. im Admin deaktiviert) oder gelöscht: touch() schreibt wieder sofort."""
+    if created:
+        return
+    user_id, website_id = instance.user_id, instance.website_id
+    transaction.on_commit(lambda: UserSession.invalidate_synced(user_id, website_id))
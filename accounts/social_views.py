@@ -2,7 +2,7 @@ from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
@@ -110,7 +110,7 @@ class SocialLoginView(APIView):
         
         # Check if social account exists
         try:
-            social_account = SocialAccount.objects.get(
+            social_account = SocialAccount.objects.select_related('user').get(
                 provider=provider,
                 provider_user_id=provider_user_id
             )
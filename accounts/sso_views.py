@@ -3,20 +3,21 @@ SSO (Single Sign-On) Views
 Handles cross-website authentication for seamless user experience.
 """
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
 from datetime import timedelta
-from rest_framework_simplejwt.tokens import RefreshToken
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from .authentication import READ_AUTHENTICATION_CLASSES
 from .permissions import HasValidAPIKey, HasValidAPIKeyOrIsAuthenticated
 import secrets
 
 from .models import SSOToken, Website
+from .tokens import get_tokens_for_user
 
 User = get_user_model()
 
@@ -215,8 +216,8 @@ def exchange_sso_token(request):
             'error': 'Invalid SSO token'
         }, status=status.HTTP_401_UNAUTHORIZED)
     
-    # Check if token is valid
-    if not sso_token.is_valid():
+    # Check if token is valid and mark it as used (atomic, a token can only be exchanged once)
+    if not sso_token.consume():
         return Response({
             'error': 'SSO token has expired or already been used'
         }, status=status.HTTP_401_UNAUTHORIZED)
@@ -227,18 +228,15 @@ def exchange_sso_token(request):
         # Log suspicious activity but allow (IPs can change due to proxies)
         pass
     
-    # Mark token as used
-    sso_token.mark_as_used()
-    
     # Generate JWT tokens
     user = sso_token.user
-    refresh = RefreshToken.for_user(user)
+    refresh, access = get_tokens_for_user(user, sso_token.website)
     
-    # Create session for this website
+    # Create or extend session for this website
     from .models import UserSession
-    UserSession.objects.create(
-        user=user,
-        website=sso_token.website,
+    UserSession.touch(
+        user,
+        sso_token.website,
         ip_address=client_ip,
         user_agent=request.META.get('HTTP_USER_AGENT', ''),
         expires_at=timezone.now() + timedelta(days=7)
@@ -246,7 +244,7 @@ def exchange_sso_token(request):
     
     return Response({
         'success': True,
-        'access': str(refresh.access_token),
+        'access': str(access),
         'refresh': str(refresh),
         'user': {
             'id': str(user.id),
@@ -263,6 +261,7 @@ def exchange_sso_token(request):
 
 
 @api_view(['POST'])
+@authentication_classes(READ_AUTHENTICATION_CLASSES)
 @permission_classes([HasValidAPIKey])
 def check_sso_status(request):
     """
@@ -336,7 +335,7 @@ def sso_login_callback(request):
     
     # Validate refresh token and get user
     try:
-        from rest_framework_simplejwt.tokens import RefreshToken as JWT_RefreshToken
+        from .tokens import RefreshToken as JWT_RefreshToken
         token = JWT_RefreshToken(refresh_token)
         user_id = token['user_id']
         user = User.objects.get(id=user_id)
@@ -502,9 +501,9 @@ def auto_login_from_trusted_site(request):
     
     # Log the auto-login
     from .models import UserSession
-    UserSession.objects.create(
-        user=user,
-        website=website,
+    UserSession.touch(
+        user,
+        website,
         ip_address=request.META.get('REMOTE_ADDR'),
         user_agent=request.META.get('HTTP_USER_AGENT', ''),
         expires_at=timezone.now() + timedelta(days=7)
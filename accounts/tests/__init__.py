@@ -0,0 +1,14 @@
+from django.conf import settings
+
+
+# Middlewares, die im Betrieb außerhalb des Requests schreiben (Log-Writer-
+# Thread bzw. Metrics-Dateien) - in Tests abgeschaltet
+EXCLUDED_MIDDLEWARE = (
+    'accounts.middleware.MetricsMiddleware',
+    'accounts.middleware.APIRequestLoggingMiddleware',
+)
+
+
+def quiet_middleware():
+    """settings.MIDDLEWARE ohne EXCLUDED_MIDDLEWARE."""
+    return [name for name in settings.MIDDLEWARE if name not in EXCLUDED_MIDDLEWARE]
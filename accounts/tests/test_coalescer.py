@@ -0,0 +1,103 @@
+import threading
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.coalescer import TimestampCoalescer, get_coalescer
+from accounts.models import UserSession, Website
+
+User = get_user_model()
+
+
+class UserSessionTouchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.website = Website.objects.create(
+            name='Session Site', domain='session.test', callback_url='https://session.test/cb',
+        )
+        cls.user = User.objects.create_user(
+            email='member@session.test', username='session_member', password='Session-Test-2024!',
+        )
+
+    def setUp(self):
+        cache.clear()
+        get_coalescer().clear()
+        self.addCleanup(get_coalescer().clear)
+
+    def _touch(self):
+        UserSession.touch(
+            self.user, self.website, ip_address='10.0.0.1', user_agent='test',
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+
+    def test_synced_session_writes_only_timestamps(self):
+        self._touch()
+
+        # Ohne Flush-Thread (Tests) sofort, aber nur last_activity und expires_at
+        with self.assertNumQueries(1) as queries:
+            self._touch()
+        self.assertNotIn('"ip_address"', queries.captured_queries[0]['sql'])
+        self.assertEqual(get_coalescer().stats()['pending'], 0)
+
+    def test_no_flush_thread_runs_in_tests(self):
+        self._touch()
+        self._touch()
+
+        self.assertFalse(get_coalescer().is_running())
+        self.assertNotIn('timestamp-coalescer', [thread.name for thread in threading.enumerate()])
+
+    def test_session_deactivated_by_save_is_reactivated(self):
+        self._touch()
+        session = UserSession.objects.get(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            session.is_active = False
+            session.save()
+        self._touch()
+
+        session.refresh_from_db()
+        self.assertTrue(session.is_active)
+
+    def test_session_deactivated_by_update_is_reactivated(self):
+        self._touch()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSession.objects.filter(user=self.user).update(is_active=False)
+        self._touch()
+
+        self.assertTrue(UserSession.objects.get(user=self.user).is_active)
+
+
+class RecordingCoalescer(TimestampCoalescer):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.saved = threading.Event()
+
+    def _save(self, due):
+        self.saved.set()
+
+
+class FlushThreadTests(SimpleTestCase):
+
+    def test_without_flush_thread_updates_are_written_at_once(self):
+        coalescer = RecordingCoalescer(interval=60)
+
+        coalescer.defer(UserSession, {'pk': 1}, last_activity=timezone.now())
+
+        self.assertTrue(coalescer.saved.is_set())
+        self.assertEqual(coalescer.stats()['pending'], 0)
+
+    def test_flush_thread_writes_without_log_writer(self):
+        coalescer = RecordingCoalescer(interval=0.2, flush_interval=0.05)
+        coalescer.start()
+        self.addCleanup(coalescer.shutdown)
+
+        coalescer.defer(UserSession, {'pk': 1}, last_activity=timezone.now())
+
+        self.assertTrue(coalescer.saved.wait(2))
+        self.assertEqual(coalescer.stats()['pending'], 0)
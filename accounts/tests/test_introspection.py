@@ -0,0 +1,94 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import introspection, user_cache
+from accounts.introspection import introspect
+
+User = get_user_model()
+
+
+class IntrospectionCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='member@introspection.test', username='introspection_member', password='Introspect-2024!',
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.reset()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_cached_result_is_served_without_queries(self):
+        self.assertTrue(introspect([self.token])[0]['active'])
+
+        with self.assertNumQueries(0):
+            self.assertTrue(introspect([self.token])[0]['active'])
+
+    def test_deactivated_user_is_inactive_despite_cached_result(self):
+        self.assertTrue(introspect([self.token])[0]['active'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertEqual(introspect([self.token]), [{'active': False}])
+
+    def test_deleted_user_is_inactive_despite_cached_result(self):
+        self.assertTrue(introspect([self.token])[0]['active'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(introspect([self.token]), [{'active': False}])
+
+    def _deactivate_after(self, check):
+        """Benutzer deaktivieren, nachdem check() ihn noch aktiv gesehen hat."""
+        def wrapper(*args):
+            results = check(*args)
+            with self.captureOnCommitCallbacks(execute=True):
+                user = User.objects.get(pk=self.user.pk)
+                user.is_active = False
+                user.save()
+            return results
+        return wrapper
+
+    def test_deactivation_during_check_is_not_cached_as_active(self):
+        with mock.patch.object(
+            introspection, '_introspect_jwts', self._deactivate_after(introspection._introspect_jwts),
+        ):
+            self.assertTrue(introspect([self.token])[0]['active'])
+
+        self.assertEqual(introspect([self.token]), [{'active': False}])
+
+    def test_oauth2_result_is_cached_once_its_user_is_known(self):
+        application = get_application_model().objects.create(
+            name='Introspection App', user=self.user,
+            client_type='confidential', authorization_grant_type='authorization-code',
+        )
+        token = get_access_token_model().objects.create(
+            user=self.user, application=application, token='introspection-oauth',
+            scope='read', expires=timezone.now() + timedelta(hours=1),
+        ).token
+
+        # Erster Aufruf: Benutzer vor der Prüfung unbekannt, also nur gemerkt
+        with mock.patch.object(
+            introspection, '_introspect_oauth2', self._deactivate_after(introspection._introspect_oauth2),
+        ):
+            self.assertTrue(introspect([token])[0]['active'])
+        self.assertEqual(introspect([token]), [{'active': False}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = True
+            self.user.save()
+        self.assertTrue(introspect([token])[0]['active'])
+        with self.assertNumQueries(0):
+            self.assertTrue(introspect([token])[0]['active'])
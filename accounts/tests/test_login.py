@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from accounts import api_keys
+from accounts.coalescer import get_coalescer
+from accounts.models import Website
+from . import quiet_middleware
+
+User = get_user_model()
+
+PASSWORD = 'Login-Test-2024!'
+
+
+@override_settings(MIDDLEWARE=quiet_middleware())
+class WebsiteAccessLoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.website = Website.objects.create(
+            name='Restricted Site', domain='restricted.test', callback_url='https://restricted.test/cb',
+            require_website_access=True, auto_register_users=False,
+        )
+        cls.user = User.objects.create_user(
+            email='outsider@login.test', username='login_outsider', password=PASSWORD,
+        )
+
+    def setUp(self):
+        cache.clear()
+        api_keys.invalidate()
+        get_coalescer().clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY=self.website.api_key)
+
+    def tearDown(self):
+        get_coalescer().clear()
+
+    def test_denied_login_issues_no_tokens(self):
+        response = self.client.post(
+            reverse('accounts:login'), {'username': self.user.email, 'password': PASSWORD}, format='json',
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('access', response.data)
+        self.assertFalse(OutstandingToken.objects.filter(user=self.user).exists())
+        self.assertEqual(get_coalescer().stats()['pending'], 0)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_granted_login_issues_tokens(self):
+        self.user.allowed_websites.add(self.website)
+
+        response = self.client.post(
+            reverse('accounts:login'), {'username': self.user.email, 'password': PASSWORD}, format='json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(OutstandingToken.objects.filter(user=self.user).exists())
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from accounts import metrics
+from accounts.log_writer import shutdown_log_writer
+
+
+class MetricsStoreShutdownTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(METRICS_ENABLED=True, METRICS_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Neuer Worker-Zustand wie nach post_fork, danach wieder offen
+        metrics.init_metrics_store()
+        self.addCleanup(metrics.init_metrics_store)
+
+    def _dead_value(self, metric, key):
+        dead = metrics._read_json(metrics.get_metrics_dir() / metrics.DEAD_FILE)
+        for series_key, value in dead['values'][metric.name]:
+            if tuple(series_key) == key:
+                return value
+        return None
+
+    def test_worker_exit_sequence_merges_counters_once(self):
+        metrics.HTTP_REQUESTS.inc(5, method='GET', view='metrics-test', status=200)
+
+        # Gunicorn worker_exit, danach atexit im Worker, danach child_exit im Master
+        metrics.shutdown_metrics_store()
+        shutdown_log_writer()
+        metrics.mark_process_dead(os.getpid())
+
+        self.assertEqual(self._dead_value(metrics.HTTP_REQUESTS, ('GET', 'metrics-test', '200')), 5)
+        self.assertFalse(metrics._worker_file(os.getpid()).exists())
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+
+from accounts import user_cache
+from accounts.oauth2 import CachedOAuth2Validator, cache_key
+
+User = get_user_model()
+
+
+class CachedOAuth2ValidatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='member@oauth2.test', username='oauth2_member', password='OAuth2-Test-2024!',
+        )
+        cls.application = get_application_model().objects.create(
+            name='Cached App', user=cls.user,
+            client_type='confidential', authorization_grant_type='authorization-code',
+        )
+        cls.access_token = get_access_token_model().objects.create(
+            user=cls.user, application=cls.application, token='oauth2-cache-test',
+            scope='read profile', expires=timezone.now() + timedelta(hours=1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.reset()
+        self.validator = CachedOAuth2Validator()
+
+    def test_cache_entry_holds_no_model_instances(self):
+        self.validator._load_access_token(self.access_token.token)
+
+        entry = cache.get(cache_key(self.access_token.token))
+        self.assertEqual(entry['application_id'], self.application.pk)
+        self.assertEqual(entry['client_id'], self.application.client_id)
+        for value in entry.values():
+            self.assertNotIsInstance(value, (get_application_model(), User))
+
+    def test_cached_token_restores_application(self):
+        self.validator._load_access_token(self.access_token.token)
+
+        with self.assertNumQueries(0):
+            access_token = self.validator._load_access_token(self.access_token.token)
+            self.assertEqual(access_token.application.client_id, self.application.client_id)
+            self.assertEqual(access_token.user.pk, self.user.pk)
+        # Nicht gecachte Felder werden bei Bedarf nachgeladen
+        self.assertEqual(access_token.application.name, 'Cached App')
+
+    def test_changed_application_invalidates_cached_tokens(self):
+        self.validator._load_access_token(self.access_token.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.application.name = 'Renamed App'
+            self.application.save()
+
+        self.assertIsNone(cache.get(cache_key(self.access_token.token)))
+
+    def test_deleted_application_invalidates_cached_tokens(self):
+        self.validator._load_access_token(self.access_token.token)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.application.delete()
+
+        self.assertIsNone(cache.get(cache_key(self.access_token.token)))
+        self.assertIsNone(self.validator._load_access_token(self.access_token.token))
@@ -0,0 +1,362 @@
+"""
+SQL-Query-Budgets aller API-Endpunkte (Regressionsschutz gegen N+1-Queries).
+
+Legt ein kleines und ein großes Fixture an (Benutzer mit vielen Rollen,
+direkten Berechtigungen, mehreren Websites, MFA-Gerät, Sitzungen und
+Social Accounts), ruft jede Route aus accounts/urls.py und
+permissions_system/urls.py auf und prüft mit assertNumQueries die Anzahl
+der SQL-Queries pro Aufruf. Beide Fixtures erwarten dieselbe Anzahl - ein
+Endpunkt, dessen Queries mit Rollen, Websites oder Sitzungen wachsen,
+fällt im großen Fixture durch.
+
+Routen ohne Testfall lassen test_every_route_has_a_case fehlschlagen, neue
+Endpunkte müssen also hier eingetragen werden (oder mit Begründung in
+SKIPPED).
+
+Caches werden vor jedem Aufruf geleert, gemessen wird also immer der kalte
+Pfad. Logging- und Metrics-Middleware sind abgeschaltet (sie schreiben im
+Betrieb asynchron bzw. in Dateien).
+
+    python manage.py test accounts.tests.test_query_budgets
+"""
+import logging
+from collections import namedtuple
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model, get_application_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import api_keys, jwt_keys, user_cache
+from accounts.coalescer import get_coalescer
+from accounts.mfa_challenges import issue_challenge
+from accounts.models import (
+    EmailVerificationToken, MFADevice, PasswordResetToken, SocialAccount,
+    SSOToken, UserSession, Website,
+)
+from permissions_system.catalog import reset_local_catalog
+from permissions_system.models import Permission, Role, UserPermission, UserRole
+from . import quiet_middleware
+
+
+User = get_user_model()
+
+PASSWORD = 'Budget-Check-2024!'
+
+# URL-Name -> Begründung, warum die Route nicht gemessen wird
+SKIPPED = {
+    'test_smtp': 'baut eine Verbindung zum SMTP-Server auf (DNS/Netzwerk)',
+}
+
+# queries: erwartete Anzahl SQL-Queries, unabhängig von der Fixture-Größe
+Case = namedtuple('Case', ['name', 'method', 'url', 'data', 'auth', 'status', 'queries'])
+
+
+def _seed(scale):
+    """
+    Legt das Fixture an. `scale` bestimmt die Anzahl der Websites, Rollen,
+    direkten Berechtigungen und Sitzungen des Hauptbenutzers.
+    """
+    now = timezone.now()
+    fx = SimpleNamespace(scale=scale)
+
+    fx.websites = [
+        Website.objects.create(
+            name=f'Budget Site {i}',
+            domain=f'site{i}.budget.test',
+            callback_url=f'https://site{i}.budget.test/callback',
+            embed_permission_claims=(i == 0),
+        )
+        for i in range(scale + 1)
+    ]
+    fx.website = fx.websites[0]
+
+    global_perms = [
+        Permission.objects.create(name=f'Global {i}', codename=f'budget_global_{i}', scope='global')
+        for i in range(scale * 2)
+    ]
+    local_perms = [
+        Permission.objects.create(
+            name=f'Local {i}', codename=f'budget_local_{i}', scope='local', website=website,
+        )
+        for i, website in enumerate(fx.websites)
+    ]
+    fx.permission = global_perms[0]
+
+    fx.admin = User.objects.create_user(
+        email='admin@budget.test', username='budget_admin', password=PASSWORD, is_staff=True,
+    )
+    fx.user = User.objects.create_user(
+        email='member@budget.test', username='budget_member', password=PASSWORD,
+        first_name='Max', last_name='Mustermann', is_verified=True,
+    )
+    fx.user.allowed_websites.set(fx.websites)
+
+    roles = []
+    for i in range(scale):
+        role = Role.objects.create(name=f'Budget Role {i}')
+        role.permissions.set(global_perms[i:i + 2] + [local_perms[i % len(local_perms)]])
+        roles.append(role)
+    fx.role = roles[0]
+
+    for i, role in enumerate(roles):
+        UserRole.objects.create(user=fx.user, role=role, scope='global', assigned_by=fx.admin)
+        UserRole.objects.create(
+            user=fx.user, role=role, scope='local', website=fx.websites[i % len(fx.websites)],
+            assigned_by=fx.admin,
+        )
+    for i, perm in enumerate(global_perms):
+        UserPermission.objects.create(user=fx.user, permission=perm, granted=bool(i % 2), assigned_by=fx.admin)
+    for perm in local_perms:
+        UserPermission.objects.create(user=fx.user, permission=perm, website=perm.website, assigned_by=fx.admin)
+
+    for website in fx.websites:
+        for _ in range(2):
+            UserSession.objects.create(
+                user=fx.user, website=website, ip_address='10.0.0.1', user_agent='budget',
+                expires_at=now + timedelta(hours=1),
+            )
+
+    for provider in ('google', 'github', 'microsoft')[:min(scale, 3)]:
+        SocialAccount.objects.create(
+            user=fx.user, provider=provider, provider_user_id=f'{provider}-budget',
+            email=fx.user.email,
+        )
+
+    fx.mfa_device = MFADevice.objects.create(
+        user=fx.user, secret_key=MFADevice.generate_secret(), is_active=True, activated_at=now,
+    )
+    fx.mfa_device.set_backup_codes(MFADevice.generate_backup_codes(count=10))
+    fx.mfa_device.save()
+
+    fx.sso_token = SSOToken.objects.create(
+        user=fx.user, token=SSOToken.generate_token(), website=fx.website,
+        expires_at=now + timedelta(minutes=5),
+    )
+    fx.verification_token = EmailVerificationToken.objects.create(
+        user=fx.admin, token=EmailVerificationToken.generate_token(), expires_at=now + timedelta(hours=1),
+    )
+    fx.reset_token = PasswordResetToken.objects.create(
+        user=fx.admin, token=PasswordResetToken.generate_token(), expires_at=now + timedelta(hours=1),
+    )
+
+    application = get_application_model().objects.create(
+        name='Budget App', user=fx.admin,
+        client_type='confidential', authorization_grant_type='authorization-code',
+    )
+    fx.oauth_tokens = [
+        get_access_token_model().objects.create(
+            user=fx.user, application=application, token=f'budget-oauth-{i}',
+            scope='read profile', expires=now + timedelta(hours=1),
+        ).token
+        for i in range(scale)
+    ]
+    return fx
+
+
+def _cases(fx):
+    """Testfälle in Aufrufreihenfolge (verändernde Aufrufe zuletzt)."""
+    a = lambda name, **kwargs: reverse(f'accounts:{name}', kwargs=kwargs or None)
+    p = lambda name, **kwargs: reverse(f'permissions_system:{name}', kwargs=kwargs or None)
+    website_id = str(fx.website.id)
+    totp = lambda: fx.mfa_device.get_totp().now()
+    refresh = lambda: str(RefreshToken.for_user(fx.user))
+    access = lambda user=fx.user: str(RefreshToken.for_user(user).access_token)
+
+    return [
+        # Authentifizierung
+        # last_login und MFA last_used: ohne Flush-Thread (Tests) sofort geschrieben, im Betrieb gepuffert
+        Case('login', 'post', a('login'),
+             lambda: {'username': fx.user.email, 'password': PASSWORD, 'mfa_token': totp()}, 'key', 200, 11),
+        Case('token_refresh', 'post', a('token_refresh'), lambda: {'refresh': refresh()}, None, 200, 6),
+        Case('jwks', 'get', reverse('jwks'), None, None, 200, 0),
+        Case('register', 'post', a('register'),
+             {'email': 'new@budget.test', 'username': 'budget_new', 'password': PASSWORD,
+              'password2': PASSWORD}, 'key', 201, 11),
+
+        # E-Mail / Passwort
+        Case('resend_verification', 'post', a('resend_verification'), {'email': fx.admin.email}, 'key', 200, 3),
+        Case('verify_email', 'get', a('verify_email'), lambda: {'token': fx.verification_token.token}, 'key', 200, 5),
+        Case('request_password_reset', 'post', a('request_password_reset'), {'email': fx.admin.email}, 'key', 200, 3),
+        Case('reset_password', 'get', a('reset_password'), {'token': fx.reset_token.token}, 'key', 200, 2),
+        Case('smtp_config', 'get', a('smtp_config'), None, 'admin', 200, 1),
+
+        # MFA
+        Case('mfa_status', 'get', a('mfa_status'), None, 'user', 200, 2),
+        Case('mfa_verify_token', 'post', a('mfa_verify_token'), lambda: {'token': totp()}, 'user', 200, 2),
+        Case('mfa_verify_challenge', 'post', a('mfa_verify_token'),
+             lambda: {'temp_token': issue_challenge(fx.user, fx.website), 'token': totp()}, 'key', 200, 8),
+        Case('mfa_enable', 'post', a('mfa_enable'), None, 'user', 400, 2),
+        Case('mfa_verify_setup', 'post', a('mfa_verify_setup'), {'token': '000000'}, 'user', 400, 2),
+        Case('mfa_regenerate_backup_codes', 'post', a('mfa_regenerate_backup_codes'),
+             lambda: {'token': totp()}, 'user', 200, 3),
+
+        # SSO
+        Case('sso_initiate', 'get', a('sso_initiate'),
+             {'website_id': website_id, 'return_url': 'https://site0.budget.test/'}, 'user+key', 200, 4),
+        Case('sso_exchange', 'post', a('sso_exchange'),
+             lambda: {'sso_token': fx.sso_token.token, 'website_id': website_id}, 'key', 200, 7),
+        Case('sso_status', 'post', a('sso_status'), {'website_id': website_id}, 'session+key', 200, 8),
+        Case('sso_callback', 'post', a('sso_callback'),
+             lambda: {'website_id': website_id, 'return_url': 'https://site0.budget.test/', 'refresh_token': refresh()},
+             'key', 200, 5),
+        Case('sso_auto_login', 'get', a('sso_auto_login'),
+             {'user_email': fx.user.email, 'website_id': website_id}, 'key', 302, 13),
+        Case('sso_logout', 'get', a('sso_logout'), None, 'session+key', 200, 6),
+
+        # Social Login und Profil
+        Case('social_login', 'post', a('social_login'),
+             {'provider': 'google', 'provider_user_id': 'google-budget', 'email': fx.user.email}, 'key', 200, 3),
+        Case('social_accounts', 'get', a('social_accounts'), None, 'user', 200, 2),
+        Case('check_profile_completion', 'post', a('check_profile_completion'),
+             {'website_id': website_id}, 'user', 200, 2),
+        Case('complete_profile', 'post', a('complete_profile'),
+             {'phone': '+49301234567', 'website_id': website_id}, 'user', 200, 4),
+        Case('profile', 'get', a('profile'), None, 'user', 200, 1),
+        # OAuth2 Access Token, Token/Application/Benutzer in einem Query (danach aus dem Cache)
+        Case('profile_oauth', 'get', a('profile'), None, 'oauth', 200, 1),
+
+        # Websites und Zugriff
+        Case('website_list', 'get', a('website_list'), None, 'admin', 200, 3),
+        Case('website_detail', 'get', a('website_detail', pk=fx.website.pk), None, 'admin', 200, 2),
+        Case('website_required_fields', 'get', a('website_required_fields', website_id=fx.website.pk),
+             None, 'key', 200, 2),
+        Case('verify_access', 'post', a('verify_access'), {'website_id': website_id}, 'user', 200, 4),
+        Case('introspect', 'post', a('introspect'), lambda: {'token': access()}, 'key+secret', 200, 2),
+        Case('introspect_batch', 'post', a('introspect_batch'),
+             lambda: {'tokens': [access(), access(fx.admin), 'invalid'] + fx.oauth_tokens}, 'key+secret', 200, 3),
+        Case('session_list', 'get', a('session_list'), None, 'user', 200, 3),
+
+        # Berechtigungen
+        Case('permission_list', 'get', p('permission_list'), None, 'admin', 200, 3),
+        Case('permission_detail', 'get', p('permission_detail', pk=fx.permission.pk), None, 'admin', 200, 2),
+        Case('role_list', 'get', p('role_list'), None, 'admin', 200, 4),
+        Case('role_detail', 'get', p('role_detail', pk=fx.role.pk), None, 'admin', 200, 3),
+        Case('user_role_list', 'get', p('user_role_list'), {'user': str(fx.user.id)}, 'admin', 200, 3),
+        Case('user_permission_list', 'get', p('user_permission_list'), {'user': str(fx.user.id)}, 'admin', 200, 3),
+        Case('check_my_permissions', 'get', p('check_my_permissions'), {'website_id': website_id}, 'user', 200, 5),
+        Case('check_user_permissions', 'get', p('check_user_permissions', user_id=fx.user.id),
+             {'website_id': website_id}, 'admin', 200, 6),
+        Case('check_specific_permission', 'post', p('check_specific_permission'),
+             {'permission_codename': 'budget_global_1', 'website_id': website_id}, 'user', 200, 4),
+        Case('check_bulk_permissions', 'post', p('check_bulk_permissions'),
+             {'permission_codenames': ['budget_global_0', 'budget_local_0'],
+              'website_ids': [website_id, str(fx.websites[1].id)]},
+             'user', 200, 5),
+        Case('permission_catalog', 'get', p('permission_catalog'), None, 'key', 200, 2),
+        Case('assign_role', 'post', p('assign_role'),
+             {'user_id': str(fx.admin.id), 'role_id': str(fx.role.id), 'website_id': website_id}, 'admin', 201, 8),
+        Case('revoke_role', 'post', p('revoke_role'),
+             {'user_id': str(fx.admin.id), 'role_id': str(fx.role.id), 'website_id': website_id}, 'admin', 200, 3),
+        Case('assign_permission', 'post', p('assign_permission'),
+             {'user_id': str(fx.admin.id), 'permission_id': str(fx.permission.id)}, 'admin', 201, 9),
+        Case('revoke_permission', 'post', p('revoke_permission'),
+             {'user_id': str(fx.admin.id), 'permission_id': str(fx.permission.id)}, 'admin', 200, 3),
+
+        # Verändernde Aufrufe
+        Case('user_website_access', 'post', a('user_website_access', user_id=fx.user.id),
+             {'website_id': str(fx.websites[-1].id)}, 'admin', 200, 4),
+        Case('unlink_social_account', 'delete', a('unlink_social_account', provider='google'),
+             None, 'user', 200, 3),
+        Case('change_password', 'post', a('change_password'),
+             {'old_password': PASSWORD, 'new_password': PASSWORD + 'x', 'new_password2': PASSWORD + 'x'},
+             'user', 200, 2),
+        Case('mfa_disable', 'post', a('mfa_disable'),
+             lambda: {'password': PASSWORD + 'x', 'token': totp()}, 'user', 200, 3),
+        Case('logout', 'post', a('logout'), lambda: {'refresh': refresh()}, 'user', 200, 7),
+    ]
+
+
+def _url_names():
+    from accounts.urls import urlpatterns as account_patterns
+    from permissions_system.urls import urlpatterns as permission_patterns
+
+    return {pattern.name for pattern in account_patterns + permission_patterns}
+
+
+@override_settings(
+    MIDDLEWARE=quiet_middleware(),
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query-budgets',
+    }},
+    SESSION_ENGINE='django.contrib.sessions.backends.db',
+    LEXWARE_API_KEY=None,
+)
+class QueryBudgetTests(TestCase):
+    """Kleines Fixture: ein Eintrag je Rolle, Website und Sitzung."""
+
+    scale = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fx = _seed(cls.scale)
+
+    def setUp(self):
+        # Erwartete 4xx-Antworten nicht als Warnungen ausgeben
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.addCleanup(self._reset_caches)
+
+    def _reset_caches(self):
+        for cache in caches.all():
+            cache.clear()
+        api_keys.invalidate()
+        user_cache.reset()
+        get_coalescer().clear()
+        reset_local_catalog()
+
+    def test_query_budgets(self):
+        for case in _cases(self.fx):
+            with self.subTest(endpoint=case.name):
+                self._check(case)
+
+    def test_every_route_has_a_case(self):
+        covered = {case.name for case in _cases(self.fx)}
+        self.assertEqual(_url_names() - covered - set(SKIPPED), set())
+
+    def _check(self, case):
+        fx = self.fx
+        client = APIClient()
+        auth = case.auth or ''
+        headers = {}
+
+        if 'key' in auth:
+            headers['HTTP_X_API_KEY'] = fx.website.api_key
+        if 'secret' in auth:
+            headers['HTTP_X_API_SECRET'] = fx.website.api_secret
+        if auth.startswith('user'):
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(fx.user).access_token}'
+        elif auth == 'admin':
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(fx.admin).access_token}'
+        elif auth == 'oauth':
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {fx.oauth_tokens[0]}'
+        elif auth.startswith('session'):
+            client.force_login(fx.user, backend='django.contrib.auth.backends.ModelBackend')
+        client.credentials(**headers)
+
+        self._reset_caches()
+        # Pro Prozess gehalten (JWT_KEY_RING_TTL), im Betrieb praktisch immer geladen
+        jwt_keys.get_key_ring()
+
+        data = case.data() if callable(case.data) else case.data
+
+        with self.assertNumQueries(case.queries):
+            if case.method == 'get':
+                response = client.get(case.url, data)
+            else:
+                response = getattr(client, case.method)(case.url, data, format='json')
+
+        self.assertEqual(response.status_code, case.status, getattr(response, 'data', None))
+
+
+class LargeFixtureQueryBudgetTests(QueryBudgetTests):
+    """Großes Fixture: gleiche Query-Anzahl wie im kleinen, sonst N+1."""
+
+    scale = 10
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts import api_keys
+from accounts.coalescer import get_coalescer
+from accounts.models import Website
+from . import quiet_middleware
+
+User = get_user_model()
+
+PASSWORD = 'Ratelimit-Test-2024!'
+
+
+@override_settings(
+    MIDDLEWARE=quiet_middleware(),
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMITS={'login': {'account': '3/15min'}},
+)
+class LoginAccountLimitTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.website = Website.objects.create(
+            name='Limit Site', domain='limit.test', callback_url='https://limit.test/cb',
+        )
+        cls.user = User.objects.create_user(
+            email='limited@ratelimit.test', username='ratelimit_user', password=PASSWORD,
+        )
+        cls.user.allowed_websites.add(cls.website)
+
+    def setUp(self):
+        cache.clear()
+        api_keys.invalidate()
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY=self.website.api_key)
+
+    def tearDown(self):
+        get_coalescer().clear()
+
+    def _login(self, password):
+        return self.client.post(
+            reverse('accounts:login'), {'username': self.user.email, 'password': password}, format='json',
+        )
+
+    def test_successful_logins_do_not_use_up_the_account_limit(self):
+        for _ in range(5):
+            self.assertEqual(self._login(PASSWORD).status_code, 200)
+
+    def test_failed_logins_use_up_the_account_limit(self):
+        self._login(PASSWORD)
+        for _ in range(3):
+            self.assertEqual(self._login('wrong').status_code, 401)
+
+        self.assertEqual(self._login(PASSWORD).status_code, 429)
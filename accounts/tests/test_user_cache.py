@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts import user_cache
+from accounts.hashers import _upgrade_hash
+
+User = get_user_model()
+
+PASSWORD = 'User-Cache-2024!'
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.SHA1PasswordHasher',
+])
+class UserCacheUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='member@user-cache.test', username='user_cache_member', password=PASSWORD,
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.reset()
+
+    def test_queryset_update_invalidates_cached_user(self):
+        self.assertTrue(user_cache.get_user(self.user.pk).is_active)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertFalse(user_cache.get_user(self.user.pk).is_active)
+
+    def test_hash_upgrade_invalidates_cached_user(self):
+        old_encoded = user_cache.get_user(self.user.pk).password
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _upgrade_hash(self.user.pk, PASSWORD, old_encoded)
+
+        cached = user_cache.get_user(self.user.pk)
+        self.assertNotEqual(cached.password, old_encoded)
+        self.assertTrue(cached.check_password(PASSWORD))
+
+    def test_last_login_update_keeps_cached_user(self):
+        user_cache.get_user(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            User.objects.filter(pk=self.user.pk).update(last_login=timezone.now())
+
+        self.assertEqual(callbacks, [])
+        with self.assertNumQueries(0):
+            user_cache.get_user(self.user.pk)
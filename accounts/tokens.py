@@ -0,0 +1,120 @@
+"""
+JWT-Ausstellung mit optionalen Berechtigungs-Claims
+
+Websites mit `embed_permission_claims` erhalten im Access Token einen
+kompakten Berechtigungs-Digest und können damit lokal autorisieren, ohne
+/api/permissions/check/me/ aufzurufen:
+
+    "perms": {
+        "wid": "<website uuid>",
+        "ver": [<globale Version>, <Benutzer-Version>],
+        "g": "<hex bitmap globaler Berechtigungen>",
+        "l": "<hex bitmap lokaler Berechtigungen>"
+    }
+
+Bit n entspricht Slot n im Katalog unter /api/permissions/catalog/.
+Der Refresh Token trägt nur die Website-ID, beim Token-Refresh werden die
+Claims neu berechnet.
+
+last_login (UPDATE_LAST_LOGIN) wird bei jeder Token-Ausgabe verzögert über
+accounts/coalescer.py geschrieben.
+
+Refresh Tokens prüfen ihre Sperre zuerst gegen den Bloom-Filter aus
+accounts/revocation.py und nur bei einem Treffer gegen die Datenbank.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken as BaseRefreshToken
+
+from . import coalescer, revocation
+from .models import Website
+
+
+PERMISSION_CLAIM = 'perms'
+WEBSITE_CLAIM = 'wid'
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh Token, der BlacklistedToken nur abfragt, wenn der Bloom-Filter
+    gesperrter JTIs anschlägt.
+    """
+
+    def check_blacklist(self):
+        if revocation.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+def embeds_permission_claims(website):
+    return website is not None and website.is_active and website.embed_permission_claims
+
+
+def build_permission_claim(user, website):
+    """Berechtigungs-Digest eines Benutzers für eine Website."""
+    from permissions_system.cache import get_versions
+    from permissions_system.permissions import PermissionChecker
+
+    bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
+    global_version, user_version = get_versions(user.pk)
+
+    return {
+        'wid': str(website.pk),
+        'ver': [global_version or 0, user_version or 0],
+        'g': format(bitmaps['global'], 'x'),
+        'l': format(bitmaps['local'], 'x'),
+    }
+
+
+def get_tokens_for_user(user, website=None):
+    """
+    Erstellt Refresh- und Access-Token für einen Benutzer.
+
+    Args:
+        user: User instance
+        website: Website des Logins (optional)
+
+    Returns:
+        tuple: (RefreshToken, AccessToken)
+    """
+    refresh = RefreshToken.for_user(user)
+
+    if api_settings.UPDATE_LAST_LOGIN:
+        coalescer.touch(user, 'last_login')
+
+    if not embeds_permission_claims(website):
+        return refresh, refresh.access_token
+
+    # Nur die Website-ID wandert in den Refresh Token, der Digest wird bei
+    # jedem Refresh neu berechnet
+    refresh[WEBSITE_CLAIM] = str(website.pk)
+    access = refresh.access_token
+    access[PERMISSION_CLAIM] = build_permission_claim(user, website)
+    return refresh, access
+
+
+class PermissionClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Token-Refresh, der die Berechtigungs-Claims des Access Tokens erneuert.
+    """
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        # Token wurde gerade erst signiert
+        access = AccessToken(data['access'], verify=False)
+        website_id = access.get(WEBSITE_CLAIM)
+        if not website_id:
+            return data
+
+        website = Website.objects.filter(pk=website_id).first()
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}
+        ).first()
+
+        if user is not None and embeds_permission_claims(website):
+            access[PERMISSION_CLAIM] = build_permission_claim(user, website)
+            data['access'] = str(access)
+
+        return data
@@ -44,6 +44,10 @@ from .sso_views import (
     sso_logout,
     auto_login_from_trusted_site,
 )
+from .introspection_views import (
+    introspect_token,
+    introspect_tokens_batch,
+)
 
 app_name = 'accounts'
 
@@ -104,6 +108,10 @@ urlpatterns = [
     path('users/<uuid:user_id>/websites/', UserWebsiteAccessView.as_view(), name='user_website_access'),
     path('verify-access/', verify_access, name='verify_access'),
     
+    # Token-Introspection (RFC 7662)
+    path('introspect/', introspect_token, name='introspect'),
+    path('introspect/batch/', introspect_tokens_batch, name='introspect_batch'),
+    
     # Sessions
     path('sessions/', UserSessionListView.as_view(), name='session_list'),
 ]
@@ -0,0 +1,122 @@
+"""
+Benutzer-Cache pro Prozess
+
+Die Authentifizierung lädt bei jedem Request den Benutzer des Tokens per
+SQL, obwohl er sich zwischen zwei Requests fast nie ändert. Hier werden
+Benutzer pro Prozess in einem kleinen TTL/LRU-Cache gehalten
+(USER_CACHE_TTL, USER_CACHE_SIZE).
+
+Jeder Benutzer hat eine Version im gemeinsamen Django-Cache. Speichern
+(auch Passwort- und is_active-Änderungen) oder Löschen eines Benutzers
+erhöht sie (accounts/signals.py), ebenso QuerySet.update() auf Benutzern
+(UserQuerySet in accounts/models.py), worauf alle Worker ihren Eintrag
+verwerfen. Reine last_login-Updates ändern die Version nicht.
+
+Ein Treffer kostet einen Cache-Zugriff (Version) und keinen Query.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .metrics import record_cache
+
+
+VERSION_KEY = 'user_cache:version:{user_id}'
+
+# Änderungen, die keine Invalidierung auslösen
+IGNORED_FIELDS = frozenset({'last_login'})
+
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_cache_ttl():
+    """Lebensdauer eines Eintrags in Sekunden (0 = Cache aus)."""
+    return getattr(settings, 'USER_CACHE_TTL', 30)
+
+
+def get_cache_size():
+    """Maximale Anzahl gecachter Benutzer pro Prozess."""
+    return getattr(settings, 'USER_CACHE_SIZE', 2048)
+
+
+def _version_key(user_id):
+    return VERSION_KEY.format(user_id=user_id)
+
+
+def get_versions(user_ids):
+    """Versionen mehrerer Benutzer als {user_id: Version} (ein Cache-Zugriff)."""
+    keys = {str(user_id): _version_key(user_id) for user_id in user_ids}
+    versions = cache.get_many(list(keys.values())) if keys else {}
+    return {user_id: versions.get(key) for user_id, key in keys.items()}
+
+
+def get_user(user_id):
+    """
+    Liefert den Benutzer mit diesem Primärschlüssel oder None.
+
+    Die zurückgegebene Instanz ist eine Kopie; Änderungen daran erreichen
+    den Cache nicht.
+    """
+    ttl = get_cache_ttl()
+    if ttl <= 0:
+        return get_user_model().objects.filter(pk=user_id).first()
+
+    key = str(user_id)
+    version = cache.get(_version_key(key))
+    now = time.monotonic()
+
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            expires, entry_version, user = entry
+            if expires > now and entry_version == version:
+                _entries.move_to_end(key)
+                record_cache('user', True)
+                return copy.copy(user)
+            del _entries[key]
+
+    record_cache('user', False)
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is not None:
+        _store(key, version, user, now + ttl)
+    return copy.copy(user)
+
+
+def prime(user):
+    """Übernimmt einen gerade geladenen Benutzer (z.B. per select_related)."""
+    ttl = get_cache_ttl()
+    if ttl <= 0 or user is None:
+        return
+    key = str(user.pk)
+    _store(key, cache.get(_version_key(key)), copy.copy(user), time.monotonic() + ttl)
+
+
+def _store(key, version, user, expires):
+    with _lock:
+        _entries[key] = (expires, version, user)
+        _entries.move_to_end(key)
+        while len(_entries) > get_cache_size():
+            _entries.popitem(last=False)
+
+
+def invalidate(user_id):
+    """Verwirft den Benutzer in allen Prozessen."""
+    key = str(user_id)
+    with _lock:
+        _entries.pop(key, None)
+    try:
+        cache.incr(_version_key(key))
+    except ValueError:
+        cache.add(_version_key(key), time.time_ns(), None)
+
+
+def reset():
+    """Leert den Cache dieses Prozesses."""
+    with _lock:
+        _entries.clear()
@@ -2,14 +2,14 @@ from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
-import secrets
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from .mfa_challenges import get_challenge_ttl, issue_challenge
 from .models import Website, UserSession, MFADevice
 from .serializers import (
     UserRegistrationSerializer,
@@ -20,15 +20,12 @@ from .serializers import (
     WebsiteCreateSerializer,
     UserSessionSerializer
 )
+from .hashing import PasswordHashingOverloaded
 from .permissions import HasValidAPIKey, HasValidAPIKeyOrIsAuthenticated, IsAdminOrHasValidAPIKey
+from .ratelimit import LoginRateThrottle, refund_account
 
 User = get_user_model()
 
-# Simple in-memory storage for MFA temporary tokens
-# In production, this could be replaced with Redis or database-backed cache
-_mfa_temp_tokens = {}
-
-
 class RegisterView(generics.CreateAPIView):
     """
     👤 Benutzer-Registrierung
@@ -185,15 +182,12 @@ class RegisterView(generics.CreateAPIView):
         # Create session for the website (if API-Key was used)
         if hasattr(request, 'website'):
             expires_at = timezone.now() + timedelta(hours=24)
-            UserSession.objects.update_or_create(
-                user=user,
-                website=request.website,
-                is_active=True,
-                defaults={
-                    'ip_address': request.META.get('REMOTE_ADDR', ''),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                    'expires_at': expires_at
-                }
+            UserSession.touch(
+                user,
+                request.website,
+                ip_address=request.META.get('REMOTE_ADDR', ''),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                expires_at=expires_at
             )
         
         response_data = {
@@ -215,6 +209,91 @@ class RegisterView(generics.CreateAPIView):
         return Response(response_data, status=status.HTTP_201_CREATED)
 
 
+def complete_login(request, user):
+    """
+    Schließt einen Login ab, nachdem Passwort (und ggf. MFA) geprüft sind.
+    
+    Gemeinsam für LoginView und die MFA-Challenge (/api/accounts/mfa/verify/):
+    stellt die JWT-Tokens aus, gewährt Website-Zugriff, legt die Sitzung an
+    und liefert Benutzer und Berechtigungen zurück.
+    
+    Returns:
+        Response: 200 mit Tokens oder 403, wenn die Website expliziten Zugriff verlangt
+    """
+    # Anmeldung erfolgreich - zählt nicht gegen das Account-Limit
+    refund_account(request)
+    
+    # Grant website access and create session (if API-Key was used)
+    if hasattr(request, 'website'):
+        # Prüfe Website-Zugriff (nur eine Abfrage)
+        if not user.has_website_access(request.website):
+            if request.website.require_website_access and not request.website.auto_register_users:
+                # Website verlangt expliziten Zugriff - User hat keinen Zugriff auf diese Website
+                return Response({
+                    'error': True,
+                    'message': 'Zugriff verweigert',
+                    'details': f'Sie haben keinen Zugriff auf die Website "{request.website.name}"',
+                    'website': {
+                        'name': request.website.name,
+                        'id': str(request.website.id),
+                        'require_access': request.website.require_website_access
+                    },
+                    'reason': 'Website erfordert explizite Zugriffsberechtigung',
+                    'solution': 'Kontaktieren Sie den Website-Administrator für Zugriff'
+                }, status=status.HTTP_403_FORBIDDEN)
+            
+            # Website erlaubt Login für alle oder registriert automatisch - gewähre Zugriff
+            user.allowed_websites.add(request.website)
+        
+        # Create or update session
+        expires_at = timezone.now() + timedelta(hours=24)
+        
+        # IP-Adresse ermitteln (mit Fallback für Proxy/Load Balancer)
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip_address = x_forwarded_for.split(',')[0].strip()
+        else:
+            ip_address = request.META.get('REMOTE_ADDR', '0.0.0.0')
+        
+        # Sicherstellen, dass IP nicht leer ist
+        if not ip_address or ip_address == '':
+            ip_address = '0.0.0.0'
+        
+        UserSession.touch(
+            user,
+            request.website,
+            ip_address=ip_address,
+            user_agent=request.META.get('HTTP_USER_AGENT', 'Unknown')[:500],
+            expires_at=expires_at
+        )
+    
+    # Generate JWT tokens erst nach der Zugriffsprüfung (mit Berechtigungs-Claims,
+    # falls die Website dies aktiviert hat; setzt last_login)
+    from .tokens import get_tokens_for_user
+    refresh, access = get_tokens_for_user(user, getattr(request, 'website', None))
+    
+    # Berechtigungen für den Benutzer abrufen (eine einzige Abfrage, unabhängig von der Anzahl Rollen)
+    from permissions_system.resolver import fetch_permission_grants, group_permissions_by_assignment
+    
+    permissions_data, direct_perms_list = group_permissions_by_assignment(
+        fetch_permission_grants(user)
+    )
+    
+    return Response({
+        'refresh': str(refresh),
+        'access': str(access),
+        'user': {
+            'id': str(user.id),
+            'email': user.email,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+        },
+        'permissions': permissions_data,
+        'direct_permissions': direct_perms_list
+    }, status=status.HTTP_200_OK)
+
+
 class LoginView(TokenObtainPairView):
     """
     🔐 Benutzer-Login (mit MFA-Unterstützung)
@@ -297,9 +376,16 @@ class LoginView(TokenObtainPairView):
     });
     ```
     
+    **Berechtigungs-Claims:**
+    Ist bei der Website "Berechtigungen im Access Token" aktiv, enthält der
+    Access Token zusätzlich einen `perms` Claim (Bitmaps + Version, siehe
+    /api/permissions/catalog/). Er wird bei /api/accounts/token/refresh/ erneuert.
+    
     **Berechtigung:** API-Key erforderlich (X-API-Key Header)
     """
     permission_classes = [HasValidAPIKey]
+    # Läuft vor post(), abgelehnte Anfragen kosten also keinen Passwort-Hash
+    throttle_classes = [LoginRateThrottle]
     
     def post(self, request, *args, **kwargs):
         try:
@@ -374,27 +460,16 @@ class LoginView(TokenObtainPairView):
                 
                 # MFA is enabled, check if token is provided
                 if not mfa_token:
-                    # Generate temporary token for MFA verification
-                    temp_token = secrets.token_urlsafe(32)
-                    
-                    # Store temp token (clean old tokens first)
-                    global _mfa_temp_tokens
-                    # Remove expired tokens (older than 5 minutes)
-                    current_time = timezone.now()
-                    _mfa_temp_tokens = {
-                        k: v for k, v in _mfa_temp_tokens.items()
-                        if (current_time - timezone.datetime.fromisoformat(v['timestamp'])).total_seconds() < 300
-                    }
+                    # Passwort stimmt, der MFA-Code läuft über das Limit des mfa-Scopes
+                    refund_account(request)
                     
-                    # Store new token
-                    _mfa_temp_tokens[f'mfa_temp_{temp_token}'] = {
-                        'user_id': str(user.id),
-                        'timestamp': timezone.now().isoformat()
-                    }
+                    # Challenge im gemeinsamen Cache, einzulösen über /api/accounts/mfa/verify/
+                    temp_token = issue_challenge(user, getattr(request, 'website', None))
                     
                     return Response({
                         'mfa_required': True,
                         'temp_token': temp_token,
+                        'expires_in': get_challenge_ttl(),
                         'message': 'MFA verification required'
                     }, status=status.HTTP_200_OK)
                 
@@ -427,125 +502,11 @@ class LoginView(TokenObtainPairView):
                     'contact': 'Kontaktieren Sie den Support, falls das Problem weiterhin besteht'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # Generate JWT tokens
-            from rest_framework_simplejwt.tokens import RefreshToken
-            refresh = RefreshToken.for_user(user)
-            
-            # Grant website access and create session (if API-Key was used)
-            if hasattr(request, 'website'):
-                # Prüfe ob Website-Zugriff erforderlich ist
-                if request.website.require_website_access:
-                    # Website verlangt expliziten Zugriff - prüfe Berechtigung
-                    if request.website.auto_register_users or user.has_website_access(request.website):
-                        if not user.has_website_access(request.website):
-                            user.allowed_websites.add(request.website)
-                    else:
-                        # User hat keinen Zugriff auf diese Website
-                        return Response({
-                            'error': True,
-                            'message': 'Zugriff verweigert',
-                            'details': f'Sie haben keinen Zugriff auf die Website "{request.website.name}"',
-                            'website': {
-                                'name': request.website.name,
-                                'id': str(request.website.id),
-                                'require_access': request.website.require_website_access
-                            },
-                            'reason': 'Website erfordert explizite Zugriffsberechtigung',
-                            'solution': 'Kontaktieren Sie den Website-Administrator für Zugriff'
-                        }, status=status.HTTP_403_FORBIDDEN)
-                else:
-                    # Website erlaubt Login für alle - gewähre automatisch Zugriff
-                    if not user.has_website_access(request.website):
-                        user.allowed_websites.add(request.website)
-                
-                # Create or update session
-                expires_at = timezone.now() + timedelta(hours=24)
-                
-                # IP-Adresse ermitteln (mit Fallback für Proxy/Load Balancer)
-                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                if x_forwarded_for:
-                    ip_address = x_forwarded_for.split(',')[0].strip()
-                else:
-                    ip_address = request.META.get('REMOTE_ADDR', '0.0.0.0')
-                
-                # Sicherstellen, dass IP nicht leer ist
-                if not ip_address or ip_address == '':
-                    ip_address = '0.0.0.0'
-                
-                UserSession.objects.update_or_create(
-                    user=user,
-                    website=request.website,
-                    defaults={
-                        'ip_address': ip_address,
-                        'user_agent': request.META.get('HTTP_USER_AGENT', 'Unknown')[:500],
-                        'expires_at': expires_at,
-                        'is_active': True
-                    }
-                )
-            
-            # Berechtigungen für den Benutzer abrufen
-            from permissions_system.models import UserRole, UserPermission
-            
-            permissions_data = {
-                'global': [],
-                'local': {}
-            }
-            
-            # Hole alle Rollen des Benutzers
-            user_roles = UserRole.objects.filter(user=user).select_related('role', 'website')
-            
-            for user_role in user_roles:
-                role = user_role.role
-                
-                # Hole alle Berechtigungen dieser Rolle
-                role_permissions = role.permissions.all()
-                permission_codes = [perm.codename for perm in role_permissions]
-                
-                if user_role.scope == 'global':
-                    # Globale Berechtigung - für alle Websites
-                    permissions_data['global'].extend(permission_codes)
-                else:
-                    # Lokale Berechtigung - nur für spezifische Website
-                    website_id = str(user_role.website.id) if user_role.website else None
-                    if website_id:
-                        if website_id not in permissions_data['local']:
-                            permissions_data['local'][website_id] = []
-                        permissions_data['local'][website_id].extend(permission_codes)
-            
-            # Entferne Duplikate
-            permissions_data['global'] = list(set(permissions_data['global']))
-            for website_id in permissions_data['local']:
-                permissions_data['local'][website_id] = list(set(permissions_data['local'][website_id]))
-            
-            # Hole direkte Berechtigungen (ohne Rolle)
-            direct_permissions = UserPermission.objects.filter(
-                user=user,
-                granted=True
-            ).select_related('permission', 'website')
-            
-            direct_perms_list = []
-            for user_perm in direct_permissions:
-                perm_data = {
-                    'permission': user_perm.permission.codename,
-                    'website_id': str(user_perm.website.id) if user_perm.website else None,
-                    'expires_at': user_perm.expires_at.isoformat() if user_perm.expires_at else None
-                }
-                direct_perms_list.append(perm_data)
-            
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': {
-                    'id': str(user.id),
-                    'email': user.email,
-                    'username': user.username,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                },
-                'permissions': permissions_data,
-                'direct_permissions': direct_perms_list
-            }, status=status.HTTP_200_OK)
+            return complete_login(request, user)
             
+        except PasswordHashingOverloaded:
+            # Hashing-Pool voll: 503 mit Retry-After (DRF Exception Handler)
+            raise
         except Exception as e:
             # Detaillierte Fehlerbehandlung mit Stack Trace und Nutzungshinweisen
             from django.conf import settings
@@ -1035,28 +996,17 @@ def verify_access(request):
         has_access = request.user.has_website_access(website)
         
         if has_access:
-            # Create or update session
-            expires_at = timezone.now() + timedelta(hours=24)
-            
-            session, created = UserSession.objects.update_or_create(
-                user=request.user,
-                website=website,
-                defaults={
-                    'ip_address': request.META.get('REMOTE_ADDR', ''),
-                    'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                    'expires_at': expires_at,
-                    'is_active': True
-                }
+            # Create or extend session (also updates last_activity)
+            UserSession.touch(
+                request.user,
+                website,
+                ip_address=request.META.get('REMOTE_ADDR', ''),
+                user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                expires_at=timezone.now() + timedelta(hours=24)
             )
             
-            # Update last_activity if not created
-            if not created:
-                session.last_activity = timezone.now()
-                session.expires_at = expires_at  # Extend session
-                session.save()
-            
-            # Prüfe ob Session abgelaufen ist
-            session_valid = not session.is_expired()
+            # Session wurde gerade verlängert
+            session_valid = True
         else:
             session_valid = False
         
@@ -1084,5 +1034,5 @@ class UserSessionListView(generics.ListAPIView):
     
     def get_queryset(self):
         if self.request.user.is_staff:
-            return UserSession.objects.all()
-        return UserSession.objects.filter(user=self.request.user)
+            return UserSession.objects.select_related('user', 'website')
+        return UserSession.objects.filter(user=self.request.user).select_related('user', 'website')
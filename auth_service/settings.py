@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.RequestInstrumentationMiddleware',  # SQL-Queries/Zeiten pro Request, Server-Timing Header
+    'accounts.middleware.MetricsMiddleware',  # Prometheus-Metriken (/metrics), misst alle übrigen Middlewares mit
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,6 +65,7 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'accounts.middleware.APIExceptionHandlerMiddleware',  # Global Exception Handler (muss früh sein!)
     'accounts.middleware.APIRequestLoggingMiddleware',  # API Request Logging
+    'accounts.middleware.RateLimitMiddleware',  # RateLimit-* Header (Login/Credential-Endpunkte)
 ]
 
 ROOT_URLCONF = 'auth_service.urls'
@@ -119,6 +122,33 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Passwort-Hashing: Django-Standardalgorithmen, aber in einem begrenzten Thread-Pool pro
+# Worker (siehe accounts/hashing.py). Höchstens PASSWORD_HASH_WORKERS Hashes laufen
+# gleichzeitig, PASSWORD_HASH_QUEUE_SIZE weitere warten; darüber hinaus 503 mit Retry-After,
+# damit Login-Wellen nicht alle Gunicorn-Threads belegen. 0 Worker = im Request-Thread hashen.
+PASSWORD_HASHERS = [
+    'accounts.hashers.PBKDF2PasswordHasher',
+    'accounts.hashers.PBKDF2SHA1PasswordHasher',
+    'accounts.hashers.Argon2PasswordHasher',
+    'accounts.hashers.BCryptSHA256PasswordHasher',
+    'accounts.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=1, cast=int)
+PASSWORD_HASH_QUEUE_SIZE = config('PASSWORD_HASH_QUEUE_SIZE', default=1, cast=int)
+PASSWORD_HASH_RETRY_AFTER = config('PASSWORD_HASH_RETRY_AFTER', default=1, cast=int)
+
+# Kostenparameter der Hasher: `python manage.py calibrate_password_hashers --write` misst auf
+# diesem Host und speichert Parameter für PASSWORD_HASH_TARGET_MS pro Hash in
+# PASSWORD_HASH_CALIBRATION_FILE (wird beim Start gelesen). PASSWORD_HASH_WORK_FACTORS
+# überschreibt einzelne Werte, z.B. {'pbkdf2_sha256': {'iterations': 870000}}.
+# Veraltete Hashes werden nach dem nächsten erfolgreichen Login im Hintergrund erneuert.
+PASSWORD_HASH_TARGET_MS = config('PASSWORD_HASH_TARGET_MS', default=250, cast=int)
+PASSWORD_HASH_CALIBRATION_FILE = config(
+    'PASSWORD_HASH_CALIBRATION_FILE', default=str(BASE_DIR / 'password_hashers.json')
+)
+PASSWORD_HASH_WORK_FACTORS = {}
+PASSWORD_HASH_UPGRADE = config('PASSWORD_HASH_UPGRADE', default=True, cast=bool)
+
 # Internationalization
 LANGUAGE_CODE = 'de-de'
 TIME_ZONE = 'Europe/Berlin'
@@ -137,10 +167,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework Settings
 REST_FRAMEWORK = {
+    # Standardklassen mit Zeitmessung (siehe accounts/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'accounts.authentication.JWTAuthentication',
+        'accounts.authentication.OAuth2Authentication',
+        'accounts.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -149,7 +180,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 50,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'accounts.instrumentation.TimedJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ]
 }
@@ -169,8 +200,34 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Erneuert die Berechtigungs-Claims (Website.embed_permission_claims) beim Refresh
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.PermissionClaimsTokenRefreshSerializer',
 }
 
+# Asymmetrische JWT-Signatur (accounts/jwt_keys.py)
+# Schlüssel erzeugen/rotieren: python manage.py rotate_jwt_signing_key
+# Ohne aktiven Schlüssel wird weiter mit SIMPLE_JWT ALGORITHM/SIGNING_KEY signiert.
+JWT_KEY_ALGORITHM = config('JWT_KEY_ALGORITHM', default='RS256')  # RS256 oder EdDSA für neue Schlüssel
+# Optionales Passwort für die privaten Schlüssel in der Datenbank
+JWT_PRIVATE_KEY_PASSWORD = config('JWT_PRIVATE_KEY_PASSWORD', default='')
+# Tokens ohne kid (HS256 mit SIGNING_KEY) akzeptieren - nach der Umstellung
+# und Ablauf der Refresh Tokens auf False setzen
+JWT_ACCEPT_LEGACY_TOKENS = config('JWT_ACCEPT_LEGACY_TOKENS', default=True, cast=bool)
+JWT_KEY_RING_TTL = config('JWT_KEY_RING_TTL', default=60, cast=int)  # Sekunden
+JWT_KEY_RING_MIN_RELOAD = config('JWT_KEY_RING_MIN_RELOAD', default=5, cast=int)  # Sekunden
+# Cache-Control max-age von /.well-known/jwks.json; neue Schlüssel werden
+# frühestens nach dieser Zeit aktiv
+JWKS_MAX_AGE = config('JWKS_MAX_AGE', default=3600, cast=int)
+
+# Bloom-Filter gesperrter Refresh Tokens (accounts/revocation.py)
+# Abgelaufene Einträge löschen: python manage.py compact_token_blacklist
+TOKEN_BLOOM_ERROR_RATE = config('TOKEN_BLOOM_ERROR_RATE', default=0.001, cast=float)  # Falsch positive -> Query
+TOKEN_BLOOM_MIN_CAPACITY = config('TOKEN_BLOOM_MIN_CAPACITY', default=10000, cast=int)  # JTIs
+TOKEN_BLOOM_REBUILD_INTERVAL = config('TOKEN_BLOOM_REBUILD_INTERVAL', default=3600, cast=int)  # Sekunden
+
+# Token-Introspection (RFC 7662, accounts/introspection.py)
+INTROSPECTION_BATCH_SIZE = config('INTROSPECTION_BATCH_SIZE', default=100, cast=int)  # Tokens pro Batch-Anfrage
+
 # OAuth2 Settings
 OAUTH2_PROVIDER = {
     'SCOPES': {
@@ -183,6 +240,8 @@ OAUTH2_PROVIDER = {
     'REFRESH_TOKEN_EXPIRE_SECONDS': config('OAUTH2_REFRESH_TOKEN_EXPIRE_SECONDS', default=86400, cast=int),
     'ROTATE_REFRESH_TOKEN': True,
     'OAUTH2_BACKEND_CLASS': 'oauth2_provider.oauth2_backends.JSONOAuthLibCore',
+    # Access Tokens bis zum Ablauf im Cache (accounts/oauth2.py)
+    'OAUTH2_VALIDATOR_CLASS': 'accounts.oauth2.CachedOAuth2Validator',
 }
 
 # CORS Settings - Sichere Cross-Origin-Anfragen
@@ -241,6 +300,90 @@ except ImportError:
     }
     SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
+# Permission Cache
+# Maximale Lebensdauer eines Berechtigungs-Snapshots pro (Benutzer, Website) in Sekunden.
+# Änderungen an Rollen/Berechtigungen invalidieren Snapshots sofort über Versionszähler.
+PERMISSION_CACHE_TIMEOUT = config('PERMISSION_CACHE_TIMEOUT', default=300, cast=int)
+# Lebensdauer des Slot-Katalogs im Cache (jede Versionsänderung legt ohnehin einen neuen an)
+PERMISSION_CATALOG_TIMEOUT = config('PERMISSION_CATALOG_TIMEOUT', default=86400, cast=int)
+
+# API-Key Cache
+# Aktive Websites werden pro Prozess nach API-Key gecacht (TTL in Sekunden, max. Einträge).
+# Änderungen an einer Website invalidieren den Cache aller Prozesse sofort.
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=60, cast=int)
+API_KEY_CACHE_SIZE = config('API_KEY_CACHE_SIZE', default=1024, cast=int)
+
+# Benutzer der Token-Authentifizierung werden pro Prozess gecacht (TTL in Sekunden, max. Einträge).
+# Speichern oder Löschen eines Benutzers invalidiert den Cache aller Prozesse sofort.
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=30, cast=int)
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=2048, cast=int)
+
+# API Request Logging
+# Logs werden asynchron in Batches geschrieben (ein Writer-Thread pro Worker).
+# API_LOG_ASYNC=False schreibt wie bisher synchron im Request.
+API_LOG_ASYNC = config('API_LOG_ASYNC', default=True, cast=bool)
+API_LOG_QUEUE_SIZE = config('API_LOG_QUEUE_SIZE', default=10000, cast=int)
+API_LOG_BATCH_SIZE = config('API_LOG_BATCH_SIZE', default=200, cast=int)
+API_LOG_FLUSH_INTERVAL = config('API_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+# Bei voller Queue: 'drop' (verwerfen) oder 'sample' (ab halb voller Queue nur Stichprobe)
+API_LOG_OVERFLOW_POLICY = config('API_LOG_OVERFLOW_POLICY', default='drop')
+API_LOG_SAMPLE_RATE = config('API_LOG_SAMPLE_RATE', default=0.1, cast=float)
+
+# Sampling/Capture-Policy pro Pfad-Präfix, Methode und Statusklasse (siehe accounts/log_policy.py).
+# Erste passende Regel gewinnt; Fehler (4xx/5xx) und langsame Requests werden immer vollständig geloggt.
+API_LOG_DEFAULT_POLICY = {'sample_rate': 1.0, 'capture': 'full'}
+API_LOG_POLICIES = [
+    # Häufige, erfolgreiche Lesezugriffe: nur Metadaten
+    {'path': '/api/permissions/check', 'status': ['2xx'], 'capture': 'metadata'},
+    {'path': '/api/permissions/catalog/', 'status': ['2xx', '3xx'], 'capture': 'metadata'},
+]
+API_LOG_SLOW_REQUEST_SECONDS = config('API_LOG_SLOW_REQUEST_SECONDS', default=1.0, cast=float)
+
+# Aufbewahrung: ältere Logs archiviert `python manage.py archive_api_logs` (z.B. täglich per Cron)
+# als gzip-JSONL nach API_LOG_ARCHIVE_DIR/YYYY/MM/ und löscht sie aus der Datenbank.
+API_LOG_RETENTION_DAYS = config('API_LOG_RETENTION_DAYS', default=30, cast=int)
+API_LOG_ARCHIVE_DIR = config('API_LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'log_archive'))
+
+# Rollups pro Minute und Endpoint (Anzahl, Fehler, Latenz-Histogramm) für das
+# Admin-Dashboard; werden alle API_ROLLUP_FLUSH_INTERVAL Sekunden gespeichert.
+API_ROLLUP_ENABLED = config('API_ROLLUP_ENABLED', default=True, cast=bool)
+API_ROLLUP_FLUSH_INTERVAL = config('API_ROLLUP_FLUSH_INTERVAL', default=10.0, cast=float)
+
+# Reine Zeitstempel-Updates (last_login, MFADevice.last_used, UserSession.last_activity/
+# expires_at) werden gepuffert und höchstens alle TIMESTAMP_WRITE_INTERVAL Sekunden pro
+# Zeile gebündelt geschrieben (siehe accounts/coalescer.py); 0 = sofort schreiben.
+TIMESTAMP_WRITE_INTERVAL = config('TIMESTAMP_WRITE_INTERVAL', default=60.0, cast=float)
+
+# Server-Timing Header (db, auth, perm, hash, ser, total) in API-Responses
+API_SERVER_TIMING = config('API_SERVER_TIMING', default=True, cast=bool)
+
+# Prometheus-Metriken unter /metrics, über alle Gunicorn-Worker summiert (dateibasiert
+# in METRICS_DIR, Standard: <tmp>/authservice-metrics). Ohne METRICS_TOKEN ist /metrics
+# nur mit DEBUG=True erreichbar.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Rate Limiting (Token Bucket im gemeinsamen Cache) für Login, MFA, Passwort-Reset und
+# Verifikations-E-Mails, jeweils pro Client-IP, Account und API-Key (siehe accounts/ratelimit.py).
+# Format 'Anzahl/Zeitraum': Anzahl = Burst, nach einem Zeitraum ist der Bucket wieder voll.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+# Anzahl vertrauenswürdiger Proxies (nginx) vor Gunicorn für die Client-IP aus X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = config('RATE_LIMIT_PROXY_COUNT', default=1, cast=int)
+RATE_LIMITS = {
+    'login': {'ip': '30/min', 'account': '10/15min', 'api_key': '1200/min'},
+    'mfa': {'ip': '30/min', 'account': '10/15min', 'api_key': '1200/min'},
+    'password_reset': {'ip': '10/hour', 'account': '3/hour', 'api_key': '300/min'},
+    'verification_email': {'ip': '10/hour', 'account': '3/hour', 'api_key': '300/min'},
+}
+
+# MFA-Login: temp_token aus /api/accounts/login/ (im gemeinsamen Cache, für alle Worker
+# gültig) läuft nach MFA_CHALLENGE_TTL Sekunden ab und wird nach
+# MFA_CHALLENGE_MAX_ATTEMPTS falschen Codes verworfen.
+MFA_CHALLENGE_TTL = config('MFA_CHALLENGE_TTL', default=300, cast=int)
+MFA_CHALLENGE_MAX_ATTEMPTS = config('MFA_CHALLENGE_MAX_ATTEMPTS', default=5, cast=int)
+
 # Session Settings for SSO
 SESSION_COOKIE_AGE = 604800  # 7 days in seconds
 SESSION_SAVE_EVERY_REQUEST = True  # Update session on every request
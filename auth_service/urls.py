@@ -5,6 +5,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from accounts.jwt_keys import jwks_view
+from accounts.metrics import metrics_view
 
 urlpatterns = [
     # Home
@@ -12,6 +14,12 @@ urlpatterns = [
     
     path('admin/', admin.site.urls),
     
+    # Prometheus
+    path('metrics', metrics_view, name='metrics'),
+    
+    # Öffentliche JWT-Schlüssel für die lokale Token-Prüfung
+    path('.well-known/jwks.json', jwks_view, name='jwks'),
+    
     # API Documentation
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
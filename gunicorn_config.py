@@ -11,7 +11,7 @@ backlog = 2048
 # Worker Processes
 workers = multiprocessing.cpu_count() * 2 + 1  # (2 × CPU) + 1
 worker_class = "gthread"
-threads = 2
+threads = 4  # Passwort-Hashing belegt höchstens PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE davon
 worker_connections = 1000
 max_requests = 1000  # Restart worker nach X requests (Memory Leak Prevention)
 max_requests_jitter = 50
@@ -57,6 +57,9 @@ def on_reload(server):
 
 def when_ready(server):
     """Called just after the server is started."""
+    # Metrics eines früheren Laufs verwerfen
+    from accounts.metrics import reset_metrics_store
+    reset_metrics_store()
     print("Auth Service is ready. Spawning workers...")
 
 def pre_fork(server, worker):
@@ -65,6 +68,12 @@ def pre_fork(server, worker):
 
 def post_fork(server, worker):
     """Called just after a worker has been forked."""
+    # Eigene Metrics-Datei für diesen Worker
+    from accounts.metrics import init_metrics_store
+    init_metrics_store()
+    # Flush-Thread für gepufferte Zeitstempel (last_login, last_activity, ...)
+    from accounts.coalescer import start_coalescer
+    start_coalescer()
     print(f"Worker spawned (pid: {worker.pid})")
 
 def pre_exec(server):
@@ -81,4 +90,19 @@ def worker_abort(worker):
 
 def worker_exit(server, worker):
     """Called just after a worker has been exited."""
+    # Wartende API-Logs noch schreiben
+    from accounts.log_writer import shutdown_log_writer
+    shutdown_log_writer()
+    # Gepufferte Zeitstempel noch schreiben
+    from accounts.coalescer import shutdown_coalescer
+    shutdown_coalescer()
+    # Counter/Histogramme des Workers in den gemeinsamen Store übernehmen
+    from accounts.metrics import shutdown_metrics_store
+    shutdown_metrics_store()
     print(f"Worker exited (pid: {worker.pid})")
+
+def child_exit(server, worker):
+    """Called in the master just after a worker has exited."""
+    # Auch abgestürzte/gekillte Worker (Timeout) übernehmen
+    from accounts.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
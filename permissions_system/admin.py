@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from accounts.admin import related_count
 from .models import Permission, Role, UserRole, UserPermission
 
 
@@ -87,13 +88,19 @@ class RoleAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            permissions_count=related_count(Role.permissions.through, 'role'),
+            users_count=related_count(UserRole, 'role'),
+        )
+    
     def get_permissions_count(self, obj):
-        count = obj.permissions.count()
+        count = obj.permissions_count
         return f"🔑 {count} Berechtigung(en)"
     get_permissions_count.short_description = 'Berechtigungen'
     
     def get_users_count(self, obj):
-        count = obj.user_assignments.count()
+        count = obj.users_count
         if count > 0:
             return f"👥 {count} Benutzer"
         return "—"
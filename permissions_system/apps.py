@@ -5,3 +5,7 @@ class PermissionsSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'permissions_system'
     verbose_name = 'Berechtigungssystem'
+    
+    def ready(self):
+        # Signal-Handler für die Invalidierung des Berechtigungs-Caches
+        from . import signals  # noqa: F401
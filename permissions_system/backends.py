@@ -3,7 +3,6 @@ Custom Permission Backend for unified permission system.
 Connects custom UserRole/UserPermission with Django Admin.
 """
 from django.contrib.auth.backends import BaseBackend
-from django.utils import timezone
 
 
 class CustomPermissionBackend(BaseBackend):
@@ -16,6 +15,26 @@ class CustomPermissionBackend(BaseBackend):
         """We don't handle authentication, only permissions."""
         return None
     
+    def _get_permission_cache(self, user_obj):
+        """
+        Load all codenames of a user once and keep them on the user object.
+        
+        Like Django's ModelBackend (_perm_cache) the result lives as long as
+        the user instance, i.e. one request. The admin calls has_perm dozens
+        of times per page, which is then answered from memory.
+        """
+        if not hasattr(user_obj, '_custom_perm_cache'):
+            from .resolver import fetch_permission_grants, granted_codenames
+            
+            # Direct grants and role permissions in a single query.
+            # Codenames are used as-is (already include app_label if present).
+            grants = fetch_permission_grants(user_obj)
+            user_obj._custom_perm_cache = {
+                'all': frozenset(granted_codenames(grants)),
+                'roles': frozenset(granted_codenames(grants, include_direct=False)),
+            }
+        return user_obj._custom_perm_cache
+    
     def has_perm(self, user_obj, perm, obj=None):
         """
         Check if user has a specific permission.
@@ -32,38 +51,11 @@ class CustomPermissionBackend(BaseBackend):
         if not user_obj.is_staff:
             return False
         
-        # Import here to avoid circular imports
-        from .models import UserPermission, UserRole
-        
         # The permission codename can be in two formats:
         # 1. 'app_label.codename' (e.g., 'accounts.view_user')
         # 2. Just 'codename' (e.g., 'view_user')
         # Our database stores the full format with app_label, so we need to match accordingly
-        
-        # Check direct permissions (UserPermission)
-        direct_perms = UserPermission.objects.filter(
-            user=user_obj,
-            permission__codename=perm,  # Match the full permission string
-            granted=True
-        ).select_related('permission')
-        
-        for user_perm in direct_perms:
-            # Check if permission is expired
-            if user_perm.is_active():
-                return True
-        
-        # Check permissions via roles (UserRole)
-        user_roles = UserRole.objects.filter(
-            user=user_obj
-        ).select_related('role').prefetch_related('role__permissions')
-        
-        for user_role in user_roles:
-            # Check if any permission in this role matches
-            for permission in user_role.role.permissions.all():
-                if permission.codename == perm:
-                    return True
-        
-        return False
+        return perm in self._get_permission_cache(user_obj)['all']
     
     def has_module_perms(self, user_obj, app_label):
         """
@@ -81,22 +73,18 @@ class CustomPermissionBackend(BaseBackend):
         if not user_obj.is_staff:
             return False
         
-        # Import here to avoid circular imports
-        from .models import UserPermission, UserRole
-        
-        # Check if user has ANY permission (direct or via role)
-        has_direct = UserPermission.objects.filter(
-            user=user_obj,
-            granted=True
-        ).exists()
-        
-        has_role = UserRole.objects.filter(
-            user=user_obj
-        ).exists()
-        
-        # If user has any permissions at all, show all modules
-        # (more fine-grained control can be added later)
-        return has_direct or has_role
+        if not hasattr(user_obj, '_custom_module_perm_cache'):
+            from .models import UserPermission, UserRole
+            
+            # Check if user has ANY permission (direct or via role)
+            # If user has any permissions at all, show all modules
+            # (more fine-grained control can be added later)
+            user_obj._custom_module_perm_cache = (
+                UserPermission.objects.filter(user=user_obj, granted=True).exists() or
+                UserRole.objects.filter(user=user_obj).exists()
+            )
+        
+        return user_obj._custom_module_perm_cache
     
     def get_user_permissions(self, user_obj, obj=None):
         """
@@ -114,32 +102,7 @@ class CustomPermissionBackend(BaseBackend):
         if not user_obj.is_staff:
             return set()
         
-        from .models import UserPermission, UserRole
-        
-        permissions = set()
-        
-        # Get direct permissions
-        direct_perms = UserPermission.objects.filter(
-            user=user_obj,
-            granted=True
-        ).select_related('permission')
-        
-        for user_perm in direct_perms:
-            if user_perm.is_active():
-                # Use the codename as-is (already includes app_label if present)
-                permissions.add(user_perm.permission.codename)
-        
-        # Get permissions from roles
-        user_roles = UserRole.objects.filter(
-            user=user_obj
-        ).select_related('role').prefetch_related('role__permissions')
-        
-        for user_role in user_roles:
-            for permission in user_role.role.permissions.all():
-                # Use the codename as-is (already includes app_label if present)
-                permissions.add(permission.codename)
-        
-        return permissions
+        return set(self._get_permission_cache(user_obj)['all'])
     
     def get_all_permissions(self, user_obj, obj=None):
         """
@@ -157,17 +120,4 @@ class CustomPermissionBackend(BaseBackend):
         if not user_obj.is_staff:
             return set()
         
-        from .models import UserRole
-        
-        permissions = set()
-        
-        user_roles = UserRole.objects.filter(
-            user=user_obj
-        ).select_related('role').prefetch_related('role__permissions')
-        
-        for user_role in user_roles:
-            for permission in user_role.role.permissions.all():
-                # Use the codename as-is (already includes app_label if present)
-                permissions.add(permission.codename)
-        
-        return permissions
+        return set(self._get_permission_cache(user_obj)['roles'])
@@ -0,0 +1,100 @@
+"""
+Versioned snapshot cache for effective user permissions.
+
+Compiled permissions per (user, website) are stored in the Django cache
+together with the versions they were built against. Signals bump the
+versions whenever roles, assignments or permissions change, so stale
+snapshots are never read again and simply expire.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounts.metrics import record_cache
+
+
+GLOBAL_VERSION_KEY = 'permissions:version:global'
+USER_VERSION_KEY = 'permissions:version:user:{user_id}'
+SNAPSHOT_KEY = 'permissions:snapshot:{user_id}:{website_id}:{superuser}'
+
+
+def get_cache_timeout():
+    """Maximum lifetime of a snapshot in seconds."""
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing or evicted - restart from a time based value so it
+        # can never collide with a version stored in an older snapshot.
+        if not cache.add(key, time.time_ns(), None):
+            cache.incr(key)
+
+
+def bump_global_version():
+    """Invalidate the snapshots of all users (e.g. after a Permission edit)."""
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def bump_user_version(user_id):
+    """Invalidate all snapshots of a single user."""
+    _bump(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def get_versions(user_id):
+    """Return the current (global, user) version pair for a user."""
+    user_key = USER_VERSION_KEY.format(user_id=user_id)
+    values = cache.get_many([GLOBAL_VERSION_KEY, user_key])
+    return values.get(GLOBAL_VERSION_KEY), values.get(user_key)
+
+
+def get_versions_many(user_ids):
+    """Return {user_id: (global, user)} version pairs with a single cache round trip."""
+    keys = {user_id: USER_VERSION_KEY.format(user_id=user_id) for user_id in user_ids}
+    values = cache.get_many([GLOBAL_VERSION_KEY, *keys.values()])
+    global_version = values.get(GLOBAL_VERSION_KEY)
+    return {user_id: (global_version, values.get(key)) for user_id, key in keys.items()}
+
+
+def get_cached_permissions(user, website, build):
+    """
+    Return the permission snapshot for user/website, building it on a miss.
+
+    A hit costs a single cache round trip (versions and snapshot are fetched
+    with one get_many). `build` is called on a miss with the current global
+    version and must return a tuple of (permissions, expires_at) where
+    expires_at is the earliest moment the result changes on its own
+    (time-limited direct permissions) or None.
+
+    Returns:
+        tuple: (permissions, global version the snapshot was built against)
+    """
+    user_key = USER_VERSION_KEY.format(user_id=user.pk)
+    snapshot_key = SNAPSHOT_KEY.format(
+        user_id=user.pk,
+        website_id=website.pk if website else 'none',
+        superuser=int(user.is_superuser),
+    )
+    values = cache.get_many([GLOBAL_VERSION_KEY, user_key, snapshot_key])
+    versions = (values.get(GLOBAL_VERSION_KEY), values.get(user_key))
+
+    snapshot = values.get(snapshot_key)
+    if snapshot is not None and snapshot['versions'] == versions:
+        record_cache('permissions', True)
+        return snapshot['permissions'], versions[0]
+    record_cache('permissions', False)
+
+    permissions, expires_at = build(versions[0])
+
+    timeout = get_cache_timeout()
+    if expires_at is not None:
+        remaining = (expires_at - timezone.now()).total_seconds()
+        timeout = max(0, min(timeout, int(remaining)))
+
+    if timeout:
+        cache.set(snapshot_key, {'versions': versions, 'permissions': permissions}, timeout)
+    return permissions, versions[0]
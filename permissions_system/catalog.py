@@ -0,0 +1,197 @@
+"""
+Permission catalog for bitmap encoded permission sets.
+
+Every Permission owns a stable slot (PermissionSlot). Effective permissions
+are stored as integers where bit `slot` is set when the permission is
+granted, so membership checks become bit operations and a cached snapshot
+is a couple of small integers instead of sets of codename strings.
+
+Slots are assigned when a permission is created (post_save signal) or by
+`python manage.py assign_permission_slots` for permissions that bypassed
+the signal - never while resolving permissions in a request.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from .cache import GLOBAL_VERSION_KEY
+from .models import Permission, PermissionSlot
+
+
+CATALOG_KEY = 'permissions:catalog:v2:{version}'
+
+_MISSING = object()
+_local = {'version': _MISSING, 'catalog': None}
+_lock = threading.Lock()
+
+
+def get_catalog_timeout():
+    """Lifetime of a cached catalog in seconds (a new version replaces it anyway)."""
+    return getattr(settings, 'PERMISSION_CATALOG_TIMEOUT', 86400)
+
+
+def _website_key(website):
+    """Normalize a Website, its pk or None to the key used in the catalog."""
+    if website is None:
+        return None
+    return str(getattr(website, 'pk', website))
+
+
+class PermissionCatalog:
+    """
+    Mapping between permissions and their bit positions.
+
+    Slots are keyed by (codename, website id) - local permissions of
+    different websites never share a bit, even with the same codename.
+    Global permissions use website id None.
+    """
+
+    def __init__(self, rows):
+        # rows: iterable of (slot, codename, website_id)
+        self.rows = [(slot, codename, _website_key(website_id)) for slot, codename, website_id in rows]
+        self.slots = {(codename, website_id): slot for slot, codename, website_id in self.rows}
+        self.codenames = {slot: codename for slot, codename, _ in self.rows}
+
+    def _slots_for(self, codename, website=None):
+        """Slots that grant a codename for a website: the global one and the website's local one."""
+        slots = []
+        slot = self.slots.get((codename, None))
+        if slot is not None:
+            slots.append(slot)
+        website_id = _website_key(website)
+        if website_id is not None:
+            slot = self.slots.get((codename, website_id))
+            if slot is not None:
+                slots.append(slot)
+        return slots
+
+    def encode(self, codenames, website=None):
+        """
+        Return the bitmap for an iterable of codenames (unknown ones are ignored).
+
+        Local codenames are looked up for the given website only.
+        """
+        bitmap = 0
+        for codename in codenames:
+            for slot in self._slots_for(codename, website):
+                bitmap |= 1 << slot
+        return bitmap
+
+    def unknown(self, codenames, website=None):
+        """Codenames without a slot (for the global scope or the website)."""
+        return {codename for codename in codenames if not self._slots_for(codename, website)}
+
+    def decode(self, bitmap):
+        """Return the set of codenames whose bits are set."""
+        codenames = set()
+        slot = 0
+        while bitmap:
+            if bitmap & 1:
+                codename = self.codenames.get(slot)
+                if codename is not None:
+                    codenames.add(codename)
+            bitmap >>= 1
+            slot += 1
+        return codenames
+
+    def _mask(self, codename, website=None):
+        mask = 0
+        for slot in self._slots_for(codename, website):
+            mask |= 1 << slot
+        return mask
+
+    def has(self, bitmap, codename, website=None):
+        return bool(bitmap & self._mask(codename, website))
+
+    def has_any(self, bitmap, codenames, website=None):
+        return any(self.has(bitmap, codename, website) for codename in codenames)
+
+    def has_all(self, bitmap, codenames, website=None):
+        return all(self.has(bitmap, codename, website) for codename in codenames)
+
+    def as_dict(self):
+        """Serializable slot -> codename mapping for relying websites."""
+        return {str(slot): codename for slot, codename in sorted(self.codenames.items())}
+
+
+def assign_slot(permission):
+    """Give a permission the next free slot (no-op if it already has one)."""
+    for _ in range(5):
+        if PermissionSlot.objects.filter(permission=permission).exists():
+            return
+        try:
+            with transaction.atomic():
+                highest = PermissionSlot.objects.aggregate(highest=Max('slot'))['highest']
+                PermissionSlot.objects.create(
+                    slot=0 if highest is None else highest + 1,
+                    permission=permission,
+                )
+            return
+        except IntegrityError:
+            # Another process took the same slot - try again
+            continue
+    raise IntegrityError(f'Kein freier Slot für Berechtigung {permission.codename} gefunden.')
+
+
+def assign_missing_slots():
+    """
+    Give every permission without a slot one (e.g. created by raw SQL,
+    bulk_create or loaddata, which bypass the post_save signal).
+
+    Returns:
+        int: number of assigned slots
+    """
+    from .cache import bump_global_version
+
+    missing = list(Permission.objects.filter(slot__isnull=True).order_by('created_at', 'codename'))
+    for permission in missing:
+        assign_slot(permission)
+    if missing:
+        transaction.on_commit(bump_global_version)
+    return len(missing)
+
+
+def _load_catalog():
+    rows = PermissionSlot.objects.filter(
+        permission__isnull=False
+    ).values_list('slot', 'permission__codename', 'permission__website_id')
+    return PermissionCatalog(rows)
+
+
+def reset_local_catalog():
+    """Forget the catalog memoized in this process (e.g. after a rollback)."""
+    with _lock:
+        _local['version'] = _MISSING
+        _local['catalog'] = None
+
+
+def get_catalog(version=_MISSING):
+    """
+    Return the catalog for the given global permission version.
+
+    The catalog only changes together with the global version (Permission
+    edits and slot assignments bump it), so it is memoized per process and
+    shared between processes through the Django cache.
+    """
+    if version is _MISSING:
+        version = cache.get(GLOBAL_VERSION_KEY)
+
+    with _lock:
+        if _local['version'] == version and _local['catalog'] is not None:
+            return _local['catalog']
+
+    key = CATALOG_KEY.format(version=version)
+    rows = cache.get(key)
+    if rows is None:
+        catalog = _load_catalog()
+        cache.set(key, catalog.rows, get_catalog_timeout())
+    else:
+        catalog = PermissionCatalog(rows)
+
+    with _lock:
+        _local['version'] = version
+        _local['catalog'] = catalog
+    return catalog
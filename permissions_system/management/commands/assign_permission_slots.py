@@ -0,0 +1,26 @@
+"""
+Management command: Bit-Positionen für Berechtigungen ohne Slot vergeben.
+
+Neue Berechtigungen erhalten ihren Slot beim Anlegen (post_save Signal).
+Berechtigungen aus loaddata, bulk_create oder SQL umgehen das Signal und
+werden hier nachgezogen:
+
+    python manage.py assign_permission_slots
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from permissions_system.catalog import assign_missing_slots
+
+
+class Command(BaseCommand):
+    help = 'Vergibt Slots im Berechtigungs-Katalog für Berechtigungen ohne Slot'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            assigned = assign_missing_slots()
+
+        if assigned:
+            self.stdout.write(self.style.SUCCESS(f'✓ {assigned} Berechtigung(en) einen Slot zugewiesen'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ Alle Berechtigungen haben einen Slot'))
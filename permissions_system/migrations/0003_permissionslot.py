@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-17 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def assign_slots(apps, schema_editor):
+    """Give every existing permission a slot, oldest first."""
+    Permission = apps.get_model('permissions_system', 'Permission')
+    PermissionSlot = apps.get_model('permissions_system', 'PermissionSlot')
+    
+    permissions = Permission.objects.order_by('created_at', 'codename')
+    PermissionSlot.objects.bulk_create([
+        PermissionSlot(slot=slot, permission=permission)
+        for slot, permission in enumerate(permissions)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('permissions_system', '0002_alter_role_options_remove_role_scope_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermissionSlot',
+            fields=[
+                ('slot', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Bit-Position')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Erstellt am')),
+                ('permission', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot', to='permissions_system.permission', verbose_name='Berechtigung')),
+            ],
+            options={
+                'verbose_name': 'Berechtigungs-Slot',
+                'verbose_name_plural': 'Berechtigungs-Slots',
+                'ordering': ['slot'],
+            },
+        ),
+        migrations.RunPython(assign_slots, migrations.RunPython.noop),
+    ]
@@ -243,3 +243,32 @@ class UserPermission(models.Model):
             return True
         from django.utils import timezone
         return timezone.now() < self.expires_at
+
+
+class PermissionSlot(models.Model):
+    """
+    Stable bit position of a permission in compiled permission bitmaps.
+    Slots are never reused: a deleted permission keeps its slot reserved,
+    so a bitmap issued earlier can never grant a different permission.
+    """
+    
+    slot = models.PositiveIntegerField(primary_key=True, verbose_name='Bit-Position')
+    permission = models.OneToOneField(
+        Permission,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='slot',
+        verbose_name='Berechtigung'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Erstellt am')
+    
+    class Meta:
+        verbose_name = 'Berechtigungs-Slot'
+        verbose_name_plural = 'Berechtigungs-Slots'
+        ordering = ['slot']
+    
+    def __str__(self):
+        if self.permission_id:
+            return f"{self.slot}: {self.permission.codename}"
+        return f"{self.slot}: (gelöscht)"
@@ -1,9 +1,17 @@
+import logging
+
 from django.contrib.auth import get_user_model
-from django.utils import timezone
-from .models import Permission, Role, UserRole, UserPermission
+from django.db.models import Q
+from accounts.instrumentation import timer
+from .models import Permission, UserRole
+from .cache import get_cached_permissions
+from .catalog import get_catalog
+from .resolver import fetch_permission_grants, resolve_effective_permissions
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class PermissionChecker:
     """
@@ -11,6 +19,30 @@ class PermissionChecker:
     Handles both global and local (website-specific) permissions.
     """
     
+    @staticmethod
+    def get_user_permission_bitmaps(user, website=None):
+        """
+        Get the effective permissions of a user as bitmaps.
+        
+        Results are served from the versioned snapshot cache; a repeat
+        check costs one cache lookup and no SQL. Bit `n` is set when the
+        permission in catalog slot `n` is granted.
+        
+        Args:
+            user: User instance
+            website: Website instance (optional)
+        
+        Returns:
+            tuple: ({'global': int, 'local': int}, PermissionCatalog)
+        """
+        with timer('perm'):
+            bitmaps, version = get_cached_permissions(
+                user,
+                website,
+                lambda version: PermissionChecker._build_user_permissions(user, website, version)
+            )
+            return bitmaps, get_catalog(version)
+    
     @staticmethod
     def get_user_permissions(user, website=None):
         """
@@ -21,83 +53,54 @@ class PermissionChecker:
             website: Website instance (optional)
         
         Returns:
-            dict: Dictionary with 'global' and 'local' permission lists
+            dict: Dictionary with 'global' and 'local' permission sets
         """
-        permissions = {
-            'global': set(),
-            'local': set(),
+        bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
+        return {
+            'global': catalog.decode(bitmaps['global']),
+            'local': catalog.decode(bitmaps['local']),
         }
+    
+    @staticmethod
+    def _build_user_permissions(user, website=None, version=None):
+        """
+        Compute the effective permission bitmaps of a user from the database.
         
+        Regardless of the number of roles this costs exactly one query
+        (plus one for the catalog if it is not cached yet). Permissions
+        without a slot cannot be encoded and are reported in the log.
+        
+        Returns:
+            tuple: (bitmaps dict, earliest expiry of a direct permission or None)
+        """
         # Superusers have all permissions
         if user.is_superuser:
-            all_perms = Permission.objects.all()
+            permissions = {
+                'global': set(),
+                'local': set(),
+            }
+            scope_filter = Q(scope='global')
             if website:
-                permissions['global'] = set(
-                    all_perms.filter(scope='global').values_list('codename', flat=True)
-                )
-                permissions['local'] = set(
-                    all_perms.filter(scope='local', website=website).values_list('codename', flat=True)
-                )
-            else:
-                permissions['global'] = set(
-                    all_perms.filter(scope='global').values_list('codename', flat=True)
-                )
-            return permissions
-        
-        # Get permissions from roles
-        user_roles = UserRole.objects.filter(user=user).select_related('role')
-        
-        if website:
-            # Include both global roles and website-specific roles
-            user_roles = user_roles.filter(
-                role__scope='global'
-            ) | user_roles.filter(
-                role__scope='local',
-                website=website
+                scope_filter |= Q(scope='local', website=website)
+            for codename, scope in Permission.objects.filter(scope_filter).values_list('codename', 'scope'):
+                permissions[scope].add(codename)
+            expires_at = None
+        else:
+            grants = fetch_permission_grants(user, website)
+            permissions, expires_at = resolve_effective_permissions(grants, website)
+        
+        catalog = get_catalog(version)
+        unknown = catalog.unknown(permissions['global']) | catalog.unknown(permissions['local'], website)
+        if unknown:
+            logger.warning(
+                'Berechtigungen ohne Slot (python manage.py assign_permission_slots): %s',
+                ', '.join(sorted(unknown))
             )
-        
-        for user_role in user_roles:
-            role_perms = user_role.role.permissions.all()
-            
-            for perm in role_perms:
-                if perm.scope == 'global':
-                    permissions['global'].add(perm.codename)
-                elif website and perm.website == website:
-                    permissions['local'].add(perm.codename)
-        
-        # Get direct permissions
-        direct_perms = UserPermission.objects.filter(
-            user=user
-        ).select_related('permission')
-        
-        if website:
-            direct_perms = direct_perms.filter(
-                permission__scope='global'
-            ) | direct_perms.filter(
-                permission__scope='local',
-                website=website
-            )
-        
-        for user_perm in direct_perms:
-            # Skip expired permissions
-            if not user_perm.is_active():
-                continue
-            
-            perm = user_perm.permission
-            
-            # Handle explicit denials
-            if not user_perm.granted:
-                if perm.scope == 'global':
-                    permissions['global'].discard(perm.codename)
-                elif perm.scope == 'local':
-                    permissions['local'].discard(perm.codename)
-            else:
-                if perm.scope == 'global':
-                    permissions['global'].add(perm.codename)
-                elif website and perm.website == website:
-                    permissions['local'].add(perm.codename)
-        
-        return permissions
+        bitmaps = {
+            'global': catalog.encode(permissions['global']),
+            'local': catalog.encode(permissions['local'], website),
+        }
+        return bitmaps, expires_at
     
     @staticmethod
     def has_permission(user, permission_codename, website=None):
@@ -115,13 +118,10 @@ class PermissionChecker:
         if user.is_superuser:
             return True
         
-        permissions = PermissionChecker.get_user_permissions(user, website)
+        bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
         
         # Check in both global and local permissions
-        return (
-            permission_codename in permissions['global'] or
-            permission_codename in permissions['local']
-        )
+        return catalog.has(bitmaps['global'] | bitmaps['local'], permission_codename, website)
     
     @staticmethod
     def has_any_permission(user, permission_codenames, website=None):
@@ -139,10 +139,9 @@ class PermissionChecker:
         if user.is_superuser:
             return True
         
-        permissions = PermissionChecker.get_user_permissions(user, website)
-        all_user_perms = permissions['global'] | permissions['local']
+        bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
         
-        return any(perm in all_user_perms for perm in permission_codenames)
+        return catalog.has_any(bitmaps['global'] | bitmaps['local'], permission_codenames, website)
     
     @staticmethod
     def has_all_permissions(user, permission_codenames, website=None):
@@ -160,10 +159,9 @@ class PermissionChecker:
         if user.is_superuser:
             return True
         
-        permissions = PermissionChecker.get_user_permissions(user, website)
-        all_user_perms = permissions['global'] | permissions['local']
+        bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
         
-        return all(perm in all_user_perms for perm in permission_codenames)
+        return catalog.has_all(bitmaps['global'] | bitmaps['local'], permission_codenames, website)
     
     @staticmethod
     def get_user_roles(user, website=None):
@@ -177,14 +175,11 @@ class PermissionChecker:
         Returns:
             QuerySet: UserRole queryset
         """
-        roles = UserRole.objects.filter(user=user)
+        roles = UserRole.objects.filter(user=user).select_related('role')
         
         if website:
             roles = roles.filter(
-                role__scope='global'
-            ) | roles.filter(
-                role__scope='local',
-                website=website
+                Q(scope='global') | Q(scope='local', website=website)
             )
         
         return roles
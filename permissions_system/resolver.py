@@ -0,0 +1,179 @@
+"""
+Single-query permission resolution.
+
+All permissions a user holds - through role assignments or direct
+assignments - are loaded with one UNION over the role/permission join
+table, UserRole and UserPermission. The fold helpers below turn those rows
+into the shapes the checker, the login response and the admin backend need.
+"""
+from collections import namedtuple
+
+from django.db.models import CharField, DateTimeField, F, Q, Value
+from django.utils import timezone
+
+from .models import UserPermission, UserRole
+
+
+PermissionGrant = namedtuple('PermissionGrant', [
+    'codename',
+    'scope',                  # scope of the permission itself
+    'permission_website_id',  # website of a local permission
+    'source',                 # 'role' or 'direct'
+    'assignment_scope',       # scope of the role assignment ('direct' rows: None)
+    'assignment_website_id',  # website of the role/direct assignment
+    'granted',                # False = explicit denial
+    'expires_at',             # expiry of a direct assignment
+])
+
+
+_COLUMNS = (
+    'codename', 'scope', 'permission_website', 'source',
+    'assignment_scope', 'assignment_website', 'granted', 'expires_at',
+)
+
+
+def fetch_permission_grants(user, website=None):
+    """
+    Load every permission row of a user in a single SQL statement.
+
+    Args:
+        user: User instance
+        website: Website instance (optional) - restricts rows to global
+            assignments and assignments for this website
+
+    Returns:
+        list: PermissionGrant tuples, role rows first
+    """
+    role_rows = UserRole.objects.filter(user=user, role__permissions__isnull=False)
+    direct_rows = UserPermission.objects.filter(user=user)
+
+    if website:
+        role_rows = role_rows.filter(Q(scope='global') | Q(website=website))
+        direct_rows = direct_rows.filter(Q(permission__scope='global') | Q(website=website))
+
+    # Both sides must select the same columns in the same order
+    role_rows = role_rows.values(
+        grant_codename=F('role__permissions__codename'),
+        grant_scope=F('role__permissions__scope'),
+        grant_permission_website=F('role__permissions__website_id'),
+        grant_source=Value('role'),
+        grant_assignment_scope=F('scope'),
+        grant_assignment_website=F('website_id'),
+        grant_granted=Value(True),
+        grant_expires_at=Value(None, output_field=DateTimeField()),
+    ).order_by()
+    direct_rows = direct_rows.values(
+        grant_codename=F('permission__codename'),
+        grant_scope=F('permission__scope'),
+        grant_permission_website=F('permission__website_id'),
+        grant_source=Value('direct'),
+        grant_assignment_scope=Value(None, output_field=CharField()),
+        grant_assignment_website=F('website_id'),
+        grant_granted=F('granted'),
+        grant_expires_at=F('expires_at'),
+    ).order_by()
+
+    grants = [
+        PermissionGrant(*(row[f'grant_{field}'] for field in _COLUMNS))
+        for row in role_rows.union(direct_rows, all=True)
+    ]
+    grants.sort(key=lambda grant: grant.source != 'role')
+    return grants
+
+
+def _is_active(grant, now):
+    return grant.expires_at is None or now < grant.expires_at
+
+
+def resolve_effective_permissions(grants, website=None):
+    """
+    Fold grant rows into effective global and local codenames.
+
+    Role permissions are applied first, then direct grants; explicit
+    denials always win over grants.
+
+    Returns:
+        tuple: ({'global': set, 'local': set}, earliest expiry or None)
+    """
+    permissions = {
+        'global': set(),
+        'local': set(),
+    }
+    denied = {
+        'global': set(),
+        'local': set(),
+    }
+    expires_at = None
+    now = timezone.now()
+    website_id = website.pk if website else None
+
+    for grant in grants:
+        if grant.source == 'direct':
+            # Skip expired permissions
+            if not _is_active(grant, now):
+                continue
+            # Remember when the first time-limited assignment runs out
+            if grant.expires_at and (expires_at is None or grant.expires_at < expires_at):
+                expires_at = grant.expires_at
+            if not grant.granted:
+                denied[grant.scope].add(grant.codename)
+                continue
+
+        if grant.scope == 'global':
+            permissions['global'].add(grant.codename)
+        elif website_id and grant.permission_website_id == website_id:
+            permissions['local'].add(grant.codename)
+
+    permissions['global'] -= denied['global']
+    permissions['local'] -= denied['local']
+    return permissions, expires_at
+
+
+def group_permissions_by_assignment(grants):
+    """
+    Build the permission overview returned by the login endpoint.
+
+    Returns:
+        tuple: (
+            {'global': [codenames of global role assignments],
+             'local': {website_id: [codenames of local role assignments]}},
+            [direct grants with permission, website_id and expires_at]
+        )
+    """
+    global_codes = set()
+    local_codes = {}
+    direct = []
+
+    for grant in grants:
+        if grant.source == 'role':
+            if grant.assignment_scope == 'global':
+                global_codes.add(grant.codename)
+            elif grant.assignment_website_id:
+                local_codes.setdefault(str(grant.assignment_website_id), set()).add(grant.codename)
+        elif grant.granted:
+            direct.append({
+                'permission': grant.codename,
+                'website_id': str(grant.assignment_website_id) if grant.assignment_website_id else None,
+                'expires_at': grant.expires_at.isoformat() if grant.expires_at else None,
+            })
+
+    permissions_data = {
+        'global': list(global_codes),
+        'local': {website_id: list(codes) for website_id, codes in local_codes.items()},
+    }
+    return permissions_data, direct
+
+
+def granted_codenames(grants, include_direct=True):
+    """
+    All codenames granted through roles and (optionally) active direct grants.
+    Used by the admin permission backend, which does not apply denials.
+    """
+    now = timezone.now()
+    codenames = set()
+    for grant in grants:
+        if grant.source == 'role':
+            codenames.add(grant.codename)
+        elif include_direct and grant.granted and _is_active(grant, now):
+            codenames.add(grant.codename)
+    return codenames
@@ -0,0 +1,59 @@
+"""
+Signal handlers that keep the permission snapshot cache consistent.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_global_version, bump_user_version
+from .catalog import assign_slot
+from .models import Permission, Role, UserPermission, UserRole
+
+
+def _bump_users_after_commit(user_ids):
+    # Bump after commit so a concurrent rebuild cannot cache pre-commit data
+    # under the new version.
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: [bump_user_version(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def invalidate_assignment(sender, instance, **kwargs):
+    """Role or direct permission of a user changed."""
+    _bump_users_after_commit([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Permissions of a role changed - affects every user holding the role."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # permission.roles.add/remove/clear(...)
+        if pk_set is None:
+            transaction.on_commit(bump_global_version)
+            return
+        role_ids = pk_set
+    else:
+        role_ids = [instance.pk]
+
+    user_ids = UserRole.objects.filter(role_id__in=role_ids).values_list('user_id', flat=True)
+    _bump_users_after_commit(user_ids)
+
+
+@receiver(post_save, sender=Permission)
+def assign_permission_slot(sender, instance, created, raw=False, **kwargs):
+    """New permissions get their bit position in the permission catalog."""
+    if created and not raw:
+        assign_slot(instance)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission(sender, instance, **kwargs):
+    """Codename, scope or website of a permission changed."""
+    transaction.on_commit(bump_global_version)
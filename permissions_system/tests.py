@@ -0,0 +1,234 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Website
+from .catalog import PermissionCatalog, assign_missing_slots, reset_local_catalog
+from .models import Permission, PermissionSlot, Role, UserPermission, UserRole
+from .permissions import PermissionChecker
+from .resolver import fetch_permission_grants, resolve_effective_permissions
+
+User = get_user_model()
+
+
+def legacy_permissions(user, website=None):
+    """
+    Per-role resolution as it was done before the UNION query: one query for
+    the role assignments, one per role for its permissions and one for the
+    direct assignments. (The original filtered on role__scope, which never
+    existed; the assignment scope is what it meant.)
+    """
+    permissions = {
+        'global': set(),
+        'local': set(),
+    }
+
+    user_roles = UserRole.objects.filter(user=user).select_related('role')
+    if website:
+        user_roles = user_roles.filter(scope='global') | user_roles.filter(scope='local', website=website)
+
+    for user_role in user_roles:
+        for perm in user_role.role.permissions.all():
+            if perm.scope == 'global':
+                permissions['global'].add(perm.codename)
+            elif website and perm.website == website:
+                permissions['local'].add(perm.codename)
+
+    direct_perms = UserPermission.objects.filter(user=user).select_related('permission')
+    if website:
+        direct_perms = direct_perms.filter(
+            permission__scope='global'
+        ) | direct_perms.filter(
+            permission__scope='local',
+            website=website
+        )
+
+    for user_perm in direct_perms:
+        if not user_perm.is_active():
+            continue
+        perm = user_perm.permission
+        if not user_perm.granted:
+            permissions[perm.scope].discard(perm.codename)
+        elif perm.scope == 'global':
+            permissions['global'].add(perm.codename)
+        elif website and perm.website == website:
+            permissions['local'].add(perm.codename)
+
+    return permissions
+
+
+class PermissionFixtureMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.website = Website.objects.create(
+            name='Resolver Site', domain='resolver.test', callback_url='https://resolver.test/cb',
+        )
+        cls.other_website = Website.objects.create(
+            name='Other Site', domain='other.test', callback_url='https://other.test/cb',
+        )
+        cls.global_perms = [
+            Permission.objects.create(name=f'Global {i}', codename=f'resolver_global_{i}', scope='global')
+            for i in range(20)
+        ]
+        cls.local_perms = [
+            Permission.objects.create(
+                name=f'Local {i}', codename=f'resolver_local_{i}', scope='local',
+                website=cls.website if i % 2 else cls.other_website,
+            )
+            for i in range(6)
+        ]
+
+        cls.user_one_role = cls._create_user('one', roles=1)
+        cls.user_many_roles = cls._create_user('many', roles=15)
+
+        # Direct grants, a denial and an expired grant on top of the roles
+        now = timezone.now()
+        UserPermission.objects.create(user=cls.user_many_roles, permission=cls.global_perms[19])
+        UserPermission.objects.create(user=cls.user_many_roles, permission=cls.global_perms[0], granted=False)
+        UserPermission.objects.create(
+            user=cls.user_many_roles, permission=cls.global_perms[18], expires_at=now - timedelta(hours=1),
+        )
+        UserPermission.objects.create(
+            user=cls.user_many_roles, permission=cls.local_perms[5], website=cls.website,
+        )
+
+    @classmethod
+    def _create_user(cls, name, roles):
+        user = User.objects.create_user(
+            email=f'{name}@resolver.test', username=f'resolver_{name}', password='Resolver-Pass-123',
+        )
+        for i in range(roles):
+            role = Role.objects.create(name=f'Resolver {name} {i}')
+            role.permissions.set(cls.global_perms[i:i + 3] + [cls.local_perms[i % len(cls.local_perms)]])
+            if i % 3:
+                UserRole.objects.create(user=user, role=role, scope='global')
+            else:
+                UserRole.objects.create(
+                    user=user, role=role, scope='local',
+                    website=cls.website if i % 2 else cls.other_website,
+                )
+        return user
+
+
+class PermissionResolverTests(PermissionFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_local_catalog()
+
+    def test_query_count_does_not_depend_on_role_count(self):
+        for user in (self.user_one_role, self.user_many_roles):
+            for website in (None, self.website):
+                with self.subTest(user=user.username, website=website), self.assertNumQueries(1):
+                    fetch_permission_grants(user, website)
+
+    def test_matches_legacy_resolver(self):
+        for user in (self.user_one_role, self.user_many_roles):
+            for website in (None, self.website, self.other_website):
+                with self.subTest(user=user.username, website=website):
+                    permissions, _ = resolve_effective_permissions(fetch_permission_grants(user, website), website)
+                    self.assertEqual(permissions, legacy_permissions(user, website))
+                    self.assertEqual(
+                        PermissionChecker.get_user_permissions(user, website),
+                        legacy_permissions(user, website),
+                    )
+
+
+class PermissionCatalogTests(SimpleTestCase):
+
+    def test_local_permissions_of_different_websites_do_not_share_a_slot(self):
+        catalog = PermissionCatalog([
+            (0, 'view_reports', None),
+            (1, 'edit_article', 'site-a'),
+            (2, 'edit_article', 'site-b'),
+        ])
+
+        bitmap = catalog.encode({'view_reports'}) | catalog.encode({'edit_article'}, 'site-a')
+
+        self.assertEqual(bitmap, 0b011)
+        self.assertTrue(catalog.has(bitmap, 'edit_article', 'site-a'))
+        self.assertFalse(catalog.has(bitmap, 'edit_article', 'site-b'))
+        self.assertTrue(catalog.has(bitmap, 'view_reports', 'site-b'))
+        self.assertEqual(catalog.unknown({'edit_article'}, 'site-c'), {'edit_article'})
+
+
+class PermissionSlotTests(PermissionFixtureMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_local_catalog()
+
+    def test_resolution_does_not_assign_slots(self):
+        permission = Permission.objects.bulk_create([
+            Permission(name='Bulk', codename='resolver_bulk', scope='global'),
+        ])[0]
+        UserPermission.objects.create(user=self.user_one_role, permission=permission)
+        slots = PermissionSlot.objects.count()
+
+        with self.assertLogs('permissions_system.permissions', 'WARNING'):
+            permissions = PermissionChecker.get_user_permissions(self.user_one_role)
+
+        self.assertNotIn('resolver_bulk', permissions['global'])
+        self.assertEqual(PermissionSlot.objects.count(), slots)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(assign_missing_slots(), 1)
+        reset_local_catalog()
+        self.assertIn('resolver_bulk', PermissionChecker.get_user_permissions(self.user_one_role)['global'])
+
+
+class AdminPermissionBackendTests(TestCase):
+    """The admin asks has_perm dozens of times per page - one lookup per request."""
+
+    ADMIN_PERMISSIONS = [
+        f'{app_label}.{action}_{model}'
+        for app_label, model in (
+            ('accounts', 'user'), ('accounts', 'website'), ('accounts', 'usersession'),
+            ('permissions_system', 'permission'), ('permissions_system', 'role'),
+        )
+        for action in ('view', 'add', 'change', 'delete')
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        permissions = [
+            Permission.objects.create(name=codename, codename=codename, scope='global')
+            for codename in cls.ADMIN_PERMISSIONS
+        ]
+        cls.staff_one_role = cls._create_staff('one', permissions, roles=1)
+        cls.staff_many_roles = cls._create_staff('many', permissions, roles=15)
+
+    @classmethod
+    def _create_staff(cls, name, permissions, roles):
+        user = User.objects.create_user(
+            email=f'{name}@admin.test', username=f'admin_{name}', password='Admin-Pass-123', is_staff=True,
+        )
+        for i in range(roles):
+            role = Role.objects.create(name=f'Admin {name} {i}')
+            role.permissions.set(permissions[i::roles])
+            UserRole.objects.create(user=user, role=role, scope='global')
+        return user
+
+    def _count_queries(self, user, url):
+        self.client.force_login(user, backend='django.contrib.auth.backends.ModelBackend')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_role_count(self):
+        for url in (
+            '/admin/', '/admin/accounts/user/', '/admin/accounts/website/', '/admin/permissions_system/role/',
+        ):
+            with self.subTest(url=url):
+                expected = self._count_queries(self.staff_one_role, url)
+                self.client.force_login(self.staff_many_roles, backend='django.contrib.auth.backends.ModelBackend')
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
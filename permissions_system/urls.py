@@ -12,6 +12,8 @@ from .views import (
     revoke_permission_from_user,
     check_user_permissions,
     check_specific_permission,
+    check_bulk_permissions,
+    permission_catalog,
 )
 
 app_name = 'permissions_system'
@@ -39,4 +41,6 @@ urlpatterns = [
     path('check/<str:user_id>/', check_user_permissions, name='check_user_permissions'),
     path('check/me/', check_user_permissions, name='check_my_permissions'),
     path('check-permission/', check_specific_permission, name='check_specific_permission'),
+    path('check-bulk/', check_bulk_permissions, name='check_bulk_permissions'),
+    path('catalog/', permission_catalog, name='permission_catalog'),
 ]
@@ -1,10 +1,15 @@
+import uuid
+
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
+from accounts.authentication import READ_AUTHENTICATION_CLASSES
 from accounts.models import Website
+from accounts.permissions import HasValidAPIKeyAndSecret, HasValidAPIKeyOrIsAuthenticated
 from .models import Permission, Role, UserRole, UserPermission
 from .serializers import (
     PermissionSerializer,
@@ -17,6 +22,9 @@ from .permissions import PermissionChecker
 
 User = get_user_model()
 
+# RoleSerializer renders every permission including its website name
+ROLE_PERMISSIONS_PREFETCH = Prefetch('permissions', queryset=Permission.objects.select_related('website'))
+
 
 # Permission Views
 class PermissionListCreateView(generics.ListCreateAPIView):
@@ -68,7 +76,7 @@ class PermissionListCreateView(generics.ListCreateAPIView):
     
     **Berechtigung erforderlich:** Admin-Rechte
     """
-    queryset = Permission.objects.all()
+    queryset = Permission.objects.select_related('website')
     serializer_class = PermissionSerializer
     permission_classes = [permissions.IsAdminUser]
     
@@ -113,7 +121,7 @@ class PermissionDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     **Berechtigung erforderlich:** Admin-Rechte
     """
-    queryset = Permission.objects.all()
+    queryset = Permission.objects.select_related('website')
     serializer_class = PermissionSerializer
     permission_classes = [permissions.IsAdminUser]
 
@@ -182,7 +190,7 @@ class RoleListCreateView(generics.ListCreateAPIView):
     
     **Berechtigung erforderlich:** Admin-Rechte
     """
-    queryset = Role.objects.all()
+    queryset = Role.objects.prefetch_related(ROLE_PERMISSIONS_PREFETCH)
     serializer_class = RoleSerializer
     permission_classes = [permissions.IsAdminUser]
     
@@ -208,7 +216,7 @@ class RoleDetailView(generics.RetrieveUpdateDestroyAPIView):
     PUT /api/permissions/roles/{id}/
     DELETE /api/permissions/roles/{id}/
     """
-    queryset = Role.objects.all()
+    queryset = Role.objects.prefetch_related(ROLE_PERMISSIONS_PREFETCH)
     serializer_class = RoleSerializer
     permission_classes = [permissions.IsAdminUser]
 
@@ -220,7 +228,7 @@ class UserRoleListView(generics.ListAPIView):
     
     GET /api/permissions/user-roles/
     """
-    queryset = UserRole.objects.all()
+    queryset = UserRole.objects.select_related('user', 'role', 'website', 'assigned_by')
     serializer_class = UserRoleSerializer
     permission_classes = [permissions.IsAdminUser]
     
@@ -362,7 +370,7 @@ class RevokeRoleFromUserView(APIView):
             if website_id:
                 filters['website_id'] = website_id
             
-            user_role = UserRole.objects.get(**filters)
+            user_role = UserRole.objects.select_related('role', 'user').get(**filters)
             role_name = user_role.role.name
             user_email = user_role.user.email
             
@@ -385,7 +393,7 @@ class UserPermissionListView(generics.ListAPIView):
     
     GET /api/permissions/user-permissions/
     """
-    queryset = UserPermission.objects.all()
+    queryset = UserPermission.objects.select_related('user', 'permission', 'website', 'assigned_by')
     serializer_class = UserPermissionSerializer
     permission_classes = [permissions.IsAdminUser]
     
@@ -495,7 +503,7 @@ def revoke_permission_from_user(request):
         if website_id:
             filters['website_id'] = website_id
         
-        user_perm = UserPermission.objects.get(**filters)
+        user_perm = UserPermission.objects.select_related('permission', 'user').get(**filters)
         perm_name = user_perm.permission.name
         user_email = user_perm.user.email
         
@@ -512,6 +520,7 @@ def revoke_permission_from_user(request):
 
 
 @api_view(['GET'])
+@authentication_classes(READ_AUTHENTICATION_CLASSES)
 @permission_classes([permissions.IsAuthenticated])
 def check_user_permissions(request, user_id=None):
     """
@@ -617,6 +626,7 @@ def check_user_permissions(request, user_id=None):
 
 
 @api_view(['POST'])
+@authentication_classes(READ_AUTHENTICATION_CLASSES)
 @permission_classes([permissions.IsAuthenticated])
 def check_specific_permission(request):
     """
@@ -704,3 +714,241 @@ def check_specific_permission(request):
         'website_id': str(website.id) if website else None,
         'has_permission': has_permission
     }, status=status.HTTP_200_OK)
+
+
+# Limits for bulk permission checks
+BULK_CHECK_MAX_CODENAMES = 200
+BULK_CHECK_MAX_WEBSITES = 20
+BULK_CHECK_MAX_USERS = 50
+
+
+def _string_list(value):
+    """Return value as de-duplicated list of strings or None if invalid."""
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+        return None
+    return list(dict.fromkeys(value))
+
+
+def _uuid_list(values):
+    """Return the strings as de-duplicated list of UUIDs or None if one is invalid."""
+    try:
+        return list(dict.fromkeys(uuid.UUID(value) for value in values))
+    except ValueError:
+        return None
+
+
+@api_view(['POST'])
+@permission_classes([HasValidAPIKeyOrIsAuthenticated])
+def check_bulk_permissions(request):
+    """
+    📦 Mehrere Berechtigungen auf einmal prüfen
+    
+    Prüft eine Liste von Berechtigungen in einem Request - optional für
+    mehrere Websites und (für Admins oder Backend-Dienste mit API-Key und
+    API-Secret) mehrere Benutzer.
+    Pro Benutzer und Website wird die Berechtigung nur einmal aufgelöst,
+    unabhängig von der Anzahl der Codenames.
+    
+    ## Beispiel Request (eigene Berechtigungen):
+    ```json
+    POST /api/permissions/check-bulk/
+    Authorization: Bearer {access_token}
+    
+    {
+      "permission_codenames": ["create_article", "edit_article", "view_reports"],
+      "website_ids": ["website-uuid-1", "website-uuid-2"]
+    }
+    ```
+    
+    ## Beispiel Request (andere Benutzer, nur Admin oder API-Key + Secret):
+    ```json
+    POST /api/permissions/check-bulk/
+    X-API-Key: {api_key}
+    X-API-Secret: {api_secret}
+    
+    {
+      "permission_codenames": ["create_article"],
+      "user_ids": ["user-uuid-1", "user-uuid-2"]
+    }
+    ```
+    
+    Mit API-Key wird immer nur die Website des Keys geprüft; `website_ids`
+    wird dann ignoriert.
+    
+    **Response:**
+    ```json
+    {
+      "results": {
+        "user-uuid-1": {
+          "website-uuid-1": {
+            "create_article": true,
+            "edit_article": false
+          }
+        }
+      }
+    }
+    ```
+    
+    Ohne `website_ids` werden nur globale Berechtigungen geprüft; der
+    Schlüssel in `results` ist dann `"global"`.
+    
+    **Body Parameter:**
+    - `permission_codenames` (Liste, erforderlich): max. 200 Codenames
+    - `website_ids` (Liste, optional): max. 20 Websites
+    - `user_ids` (Liste, optional): max. 50 Benutzer (nur Admin oder API-Key + Secret)
+    
+    **Berechtigung erforderlich:** Angemeldet oder API-Key (andere Benutzer:
+    Admin oder API-Key + API-Secret)
+    """
+    codenames = _string_list(request.data.get('permission_codenames'))
+    website_ids = _string_list(request.data.get('website_ids'))
+    user_ids = _string_list(request.data.get('user_ids'))
+    
+    if codenames is None or website_ids is None or user_ids is None:
+        return Response({
+            'error': 'permission_codenames, website_ids und user_ids müssen Listen von Strings sein.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not codenames:
+        return Response({
+            'error': 'permission_codenames ist erforderlich.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if (len(codenames) > BULK_CHECK_MAX_CODENAMES
+            or len(website_ids) > BULK_CHECK_MAX_WEBSITES
+            or len(user_ids) > BULK_CHECK_MAX_USERS):
+        return Response({
+            'error': 'Zu viele Einträge in einer Anfrage.',
+            'limits': {
+                'permission_codenames': BULK_CHECK_MAX_CODENAMES,
+                'website_ids': BULK_CHECK_MAX_WEBSITES,
+                'user_ids': BULK_CHECK_MAX_USERS,
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    user_ids = _uuid_list(user_ids)
+    website_ids = _uuid_list(website_ids)
+    if user_ids is None:
+        return Response({'error': 'Ungültige user_ids.'},
+                      status=status.HTTP_400_BAD_REQUEST)
+    if website_ids is None:
+        return Response({'error': 'Ungültige website_ids.'},
+                      status=status.HTTP_400_BAD_REQUEST)
+    
+    is_authenticated = request.user and request.user.is_authenticated
+    is_staff = is_authenticated and request.user.is_staff
+    
+    # Determine the users to check
+    if user_ids:
+        # Only admins and backend services (API key + secret) may check other
+        # users - the API key alone is public (it ships in frontend code)
+        if not is_staff and not HasValidAPIKeyAndSecret().has_permission(request, None):
+            return Response({
+                'error': 'Sie haben keine Berechtigung, die Berechtigungen anderer Benutzer zu prüfen.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        # Backend services only see the website of their own API key
+        if not is_staff:
+            website_ids = [request.website.pk]
+        
+        users = User.objects.in_bulk(user_ids)
+        if len(users) != len(user_ids):
+            # Do not reveal which of the ids exist
+            return Response({'error': 'Mindestens ein Benutzer wurde nicht gefunden.'},
+                          status=status.HTTP_404_NOT_FOUND)
+        users = [users[user_id] for user_id in user_ids]
+    elif is_authenticated:
+        users = [request.user]
+    else:
+        return Response({
+            'error': 'user_ids ist bei Aufrufen mit API-Key erforderlich.'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Determine the websites to check (None = global only)
+    if website_ids:
+        websites = Website.objects.in_bulk(website_ids)
+        if len(websites) != len(website_ids):
+            return Response({'error': 'Mindestens eine Website wurde nicht gefunden.'},
+                          status=status.HTTP_404_NOT_FOUND)
+        websites = [websites[website_id] for website_id in website_ids]
+    else:
+        websites = [None]
+    
+    results = {}
+    for user in users:
+        user_results = results[str(user.id)] = {}
+        for website in websites:
+            key = str(website.id) if website else 'global'
+            
+            # Superusers have all permissions (same as PermissionChecker.has_permission)
+            if user.is_superuser:
+                user_results[key] = {codename: True for codename in codenames}
+                continue
+            
+            # One resolution per user and website, then bit lookups
+            bitmaps, catalog = PermissionChecker.get_user_permission_bitmaps(user, website)
+            granted = bitmaps['global'] | bitmaps['local']
+            user_results[key] = {codename: catalog.has(granted, codename, website) for codename in codenames}
+    
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([HasValidAPIKeyOrIsAuthenticated])
+def permission_catalog(request):
+    """
+    🗂️ Berechtigungs-Katalog
+    
+    Liefert die Zuordnung Bit-Position → Codename. Damit dekodieren Websites
+    die Berechtigungs-Bitmaps im `perms` Claim des Access Tokens
+    (Website-Einstellung "Berechtigungen im Access Token") lokal.
+    
+    Slots werden nie neu vergeben - ein neuerer Katalog dekodiert also auch
+    ältere Tokens. Websites können ihn cachen und erst neu laden, wenn ein
+    Token eine unbekannte Bit-Position oder höhere Version enthält.
+    
+    ## Beispiel Request:
+    ```
+    GET /api/permissions/catalog/
+    X-API-Key: your_api_key
+    ```
+    
+    **Response:**
+    ```json
+    {
+      "version": 17,
+      "slots": {
+        "0": "view_reports",
+        "1": "create_article"
+      }
+    }
+    ```
+    
+    ## Token auswerten (JavaScript):
+    ```javascript
+    const { slots } = await (await fetch('/api/permissions/catalog/', {
+      headers: { 'X-API-Key': apiKey }
+    })).json();
+    
+    const perms = jwtDecode(accessToken).perms;
+    const bitmap = BigInt('0x' + perms.g) | BigInt('0x' + perms.l);
+    const granted = Object.entries(slots)
+      .filter(([slot]) => (bitmap >> BigInt(slot)) & 1n)
+      .map(([, codename]) => codename);
+    ```
+    
+    **Berechtigung erforderlich:** API-Key oder Angemeldet
+    """
+    from django.core.cache import cache
+    from .cache import GLOBAL_VERSION_KEY
+    from .catalog import get_catalog
+    
+    version = cache.get(GLOBAL_VERSION_KEY)
+    catalog = get_catalog(version)
+    
+    return Response({
+        'version': version or 0,
+        'slots': catalog.as_dict(),
+    }, status=status.HTTP_200_OK)